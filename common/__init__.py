@@ -1,3 +1,5 @@
-from .decorators import rate_limit, retry
+from .decorators import RetryBudget, backoff_delay, rate_limit, retry, retry_after_seconds
+from .metrics import metrics
+from .ratelimit import AdaptiveRate, TokenBucket, host_limiter
 
-__all__ = ["rate_limit", "retry"]
+__all__ = ["rate_limit", "retry", "retry_after_seconds", "backoff_delay", "RetryBudget", "AdaptiveRate", "TokenBucket", "host_limiter", "metrics"]
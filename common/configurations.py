@@ -14,10 +14,14 @@ logging_config = {
         }
     },
     "loggers": {
-        "root": { "level": "INFO", "handlers": ["stdout"] }
+        "root": { "level": "INFO", "handlers": ["stdout"] },
+        "httpx": { "level": "WARNING" }
     }
 }
 
+# Staff harvested (or cases fetched) concurrently unless --workers says otherwise.
+DEFAULT_WORKERS = 4
+
 def get_default_spreadsheet_id():
     return os.getenv("SPREADSHEET_ID", "1D1jB-6fH1a9UXXH8elbK77CVUM-wEYKD8dhNQNxJw9s")
 
@@ -29,3 +33,62 @@ def get_case_ids_sheet_range():
 
 def get_default_credential_file():
     return os.getenv("SERVICE_ACCOUNT_FILE", "service_account_credential.json")
+
+def get_portal_rate_limit():
+    return float(os.getenv("TM_RATE_LIMIT", "1"))
+
+def get_portal_rate_burst():
+    return int(os.getenv("TM_RATE_BURST", "1"))
+
+def get_portal_rate_max():
+    """Highest per-endpoint rate adaptive control may probe up to (default: TM_RATE_LIMIT, i.e. never above it)."""
+    value = os.getenv("TM_RATE_MAX")
+    return float(value) if value else get_portal_rate_limit()
+
+def get_portal_rate_min():
+    value = os.getenv("TM_RATE_MIN")
+    return float(value) if value else get_portal_rate_limit() / 10
+
+def get_portal_retry_budget():
+    return int(os.getenv("TM_RETRY_BUDGET", "200"))
+
+def get_portal_retry_budget_period():
+    return float(os.getenv("TM_RETRY_BUDGET_PERIOD", "600"))
+
+def get_portal_host_rate_limit():
+    value = os.getenv("TM_HOST_RATE_LIMIT")
+    return float(value) if value else None
+
+def get_portal_pool_size():
+    return int(os.getenv("TM_POOL_SIZE", "10"))
+
+def get_portal_timeout():
+    return float(os.getenv("TM_TIMEOUT", "60"))
+
+def get_portal_page_workers():
+    return int(os.getenv("TM_PAGE_WORKERS", "4"))
+
+def get_order_cache_path():
+    return os.getenv("ORDER_CACHE_PATH", ".cache/order_details.sqlite3")
+
+def get_order_cache_max_entries():
+    return int(os.getenv("ORDER_CACHE_MAX_ENTRIES", "200000"))
+
+def get_order_cache_max_age_days():
+    return float(os.getenv("ORDER_CACHE_MAX_AGE_DAYS", "7"))
+
+def get_sync_state_path():
+    return os.getenv("SYNC_STATE_PATH", ".cache/sync_state.sqlite3")
+
+def get_journal_dir():
+    return os.getenv("RUN_JOURNAL_DIR", ".cache/journal")
+
+def get_case_terminal_statuses():
+    value = os.getenv("CASE_TERMINAL_STATUSES", "Closed,Resolved,Cancelled,Completed")
+    return {status.strip().lower() for status in value.split(",") if status.strip()}
+
+def get_order_store_path():
+    return os.getenv("ORDER_STORE_PATH", ".cache/orders.sqlite3")
+
+def get_metrics_path():
+    return os.getenv("METRICS_PATH") or None
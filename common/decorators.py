@@ -1,56 +1,200 @@
 import time
+import random
+import inspect
 import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import wraps
 
+from .metrics import metrics
+from .ratelimit import TokenBucket, monotonic_clock
+
 logger = logging.getLogger(__name__)
 
 
-def rate_limit(calls_per_second):
+def rate_limit(calls_per_second=None, burst=1, limiter=None):
     """Decorator to limit function calls to a specified rate.
+
+    Pass ``limiter`` to share one ``TokenBucket`` between several functions
+    (and threads). Otherwise each decorated function gets its own bucket.
+    Coroutine functions are awaited on the bucket instead of sleeping.
     
     Args:
         calls_per_second: Maximum number of calls allowed per second
+        burst: Number of calls allowed back to back before throttling (default: 1)
+        limiter: Shared TokenBucket to draw from instead of a private one
     """
-    min_interval = 1.0 / calls_per_second
+    if limiter is None and calls_per_second is None:
+        raise ValueError("Either calls_per_second or limiter is required")
 
     def decorator(func):
-        last_time_called = 0.0
+        bucket = limiter or TokenBucket(rate=calls_per_second, burst=burst, name=func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                waited = await bucket.acquire_async()
+                metrics.observe(f"ratelimit.{bucket.name}", waited)
+                if waited > 0:
+                    logger.debug(f"Rate limited {func.__name__} for {waited:.3f}s on {bucket.name}")
+                return await func(*args, **kwargs)
+
+            async_wrapper.limiter = bucket
+            return async_wrapper
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            nonlocal last_time_called
-            elapsed = time.perf_counter() - last_time_called
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kwargs)
-            last_time_called = time.perf_counter()
-            return ret
+            waited = bucket.acquire()
+            metrics.observe(f"ratelimit.{bucket.name}", waited)
+            if waited > 0:
+                logger.debug(f"Rate limited {func.__name__} for {waited:.3f}s on {bucket.name}")
+            return func(*args, **kwargs)
 
+        wrapper.limiter = bucket
         return wrapper
 
     return decorator
 
 
-def retry(exceptions, tries=3, delay=1):
+class RetryBudget:
+    """Caps how fast retries are spent, shared by every decorated function.
+
+    Nested or concurrent retries otherwise multiply: once the portal is
+    really down, failing fast beats sleeping through every attempt of
+    every call. The budget refills like a token bucket, so an early outage
+    doesn't leave the rest of a long run without retries.
+
+    Args:
+        retries: Retries that can be spent back to back
+        period: Seconds for a fully spent budget to refill
+    """
+
+    def __init__(self, retries, period=600.0, clock=None):
+        self.retries = retries
+        self.period = period
+        self._clock = clock or monotonic_clock
+        self._lock = threading.Lock()
+        self._available = float(retries)
+        self._updated_at = None
+        self.spent = 0
+
+    def spend(self):
+        """Takes one retry from the budget; False while it is spent."""
+        with self._lock:
+            now = self._clock()
+            if self._updated_at is not None:
+                refill = (now - self._updated_at) * self.retries / self.period
+                self._available = min(float(self.retries), self._available + refill)
+            self._updated_at = now
+            if self._available < 1:
+                return False
+            self._available -= 1
+            self.spent += 1
+            return True
+
+    def reset(self):
+        """Refills the budget and clears the count of retries spent."""
+        with self._lock:
+            self._available = float(self.retries)
+            self._updated_at = None
+            self.spent = 0
+
+
+def retry_after_seconds(source):
+    """Seconds asked for by the ``Retry-After`` header of a response, or of the error's response, if any.
+
+    Reads ``error.response`` (requests, httpx) and ``error.resp`` (the
+    httplib2 response of googleapiclient's ``HttpError``), in seconds or as
+    an HTTP date.
+    """
+    response = getattr(source, "response", None)
+    if response is None:
+        response = getattr(source, "resp", source)
+    headers = getattr(response, "headers", response)
+    try:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def backoff_delay(attempt, error=None, delay=1, backoff=1, max_delay=None, jitter=0.0):
+    """Seconds to wait before retry ``attempt`` (0-based), as ``retry`` waits.
+
+    The delay grows by ``backoff`` per attempt up to ``max_delay``, has a
+    ``jitter`` fraction randomised and is never shorter than the
+    ``Retry-After`` of ``error``.
+    """
+    wait = delay * backoff ** attempt
+    if max_delay is not None:
+        wait = min(wait, max_delay)
+    if jitter:
+        wait = wait * (1 - jitter) + random.uniform(0, wait * jitter)
+    retry_after = retry_after_seconds(error) if error is not None else None
+    return wait if retry_after is None else max(wait, retry_after)
+
+
+def retry(exceptions, tries=3, delay=1, backoff=1, max_delay=None, jitter=0.0, budget=None):
     """Decorator to retry a function on specific exceptions.
+
+    Coroutine functions are retried with ``asyncio.sleep`` between attempts.
+    When the exception carries a response with a ``Retry-After`` header, the
+    wait is at least that long.
     
     Args:
         exceptions: Exception or tuple of exceptions to catch
         tries: Number of attempts to make (default: 3)
-        delay: Delay in seconds between retries (default: 1)
+        delay: Delay in seconds before the first retry (default: 1)
+        backoff: Factor the delay grows by after every retry (default: 1, a fixed delay)
+        max_delay: Upper bound on a single delay
+        jitter: Fraction (0-1) of each delay that is randomised, so callers don't retry in lockstep
+        budget: Shared ``RetryBudget``; once it is spent, failures are raised without retrying
     """
     def decorator(func):
+        def next_wait(attempt, error):
+            """Seconds to sleep before the next attempt, or None to give up now."""
+            if budget is not None and not budget.spend():
+                logger.warning(f"Retry budget spent; not retrying {func.__name__}")
+                return None
+            wait = backoff_delay(attempt, error, delay, backoff, max_delay, jitter)
+            logger.info(f"Retrying {func.__name__} in {wait:.1f}s... {tries - 1 - attempt} tries left")
+            metrics.observe(f"retry.{func.__name__}", wait)
+            return wait
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                import asyncio  # already loaded by the running event loop
+
+                for attempt in range(tries - 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as e:
+                        wait = next_wait(attempt, e)
+                        if wait is None:
+                            raise
+                        await asyncio.sleep(wait)
+                return await func(*args, **kwargs)  # Last attempt
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            _tries = tries
-            while _tries > 1:
+            for attempt in range(tries - 1):
                 try:
                     return func(*args, **kwargs)
-                except exceptions:
-                    logger.info(f"Retrying... {_tries - 1} tries left")
-                    time.sleep(delay)
-                    _tries -= 1
+                except exceptions as e:
+                    wait = next_wait(attempt, e)
+                    if wait is None:
+                        raise
+                    time.sleep(wait)
             return func(*args, **kwargs)  # Last attempt
 
         return wrapper
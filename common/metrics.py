@@ -0,0 +1,184 @@
+"""Process-wide timers and counters for finding where a run spends its time.
+
+Every portal request, rate-limit wait, retry back-off, order parse and
+Sheets call is observed into a named series (``tm.getCeeOrderDetail``,
+``ratelimit.getCeeOrderDetail``, ``retry.get_order_detail``,
+``parse.flatten_batch``, ``sheets.append``, …). At the end of a command
+``report()`` logs one table of calls, errors, p50/p95 and total seconds
+and bytes per series, and writes it to METRICS_PATH when that is set:
+Prometheus text format (for node_exporter's textfile collector) or JSON
+when the path ends in ``.json``.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from .configurations import get_metrics_path
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per series for percentiles; beyond this a uniform sample is kept.
+MAX_SAMPLES = 10_000
+
+
+class Series:
+    """Counts, totals and a bounded latency sample for one operation."""
+
+    __slots__ = ("name", "calls", "errors", "seconds", "bytes", "samples", "_random")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.samples = []
+        self._random = random.Random(name)
+
+    def add(self, seconds, nbytes=0, error=False):
+        self.calls += 1
+        self.errors += bool(error)
+        self.seconds += seconds
+        self.bytes += nbytes
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            # Reservoir sampling keeps every call equally likely to be in the sample.
+            slot = self._random.randrange(self.calls)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of ``Series`` by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, seconds, nbytes=0, error=False):
+        """Records one call to ``name`` that took ``seconds``."""
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = Series(name)
+            series.add(seconds, nbytes, error)
+
+    @contextmanager
+    def timer(self, name):
+        """Times the block as one call to ``name``; an exception counts as an error."""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error=error)
+
+    def timed(self, name):
+        """Decorator form of ``timer``."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """One dict per series, sorted by name."""
+        with self._lock:
+            return [self._series[name].summary() for name in sorted(self._series)]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def format_table(self):
+        rows = self.summary()
+        if not rows:
+            return ""
+        width = max(len("series"), *(len(row["name"]) for row in rows))
+        lines = [
+            f"{'series':<{width}} {'calls':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'total s':>9} {'bytes':>12}"
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['name']:<{width}} {row['calls']:>8} {row['errors']:>6} {row['p50'] * 1000:>9.1f} "
+                f"{row['p95'] * 1000:>9.1f} {row['seconds']:>9.1f} {row['bytes']:>12}"
+            )
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """The summary in Prometheus text exposition format."""
+        lines = [
+            "# HELP tdcollector_seconds Time spent per call.",
+            "# TYPE tdcollector_seconds summary",
+        ]
+        rows = self.summary()
+        for row in rows:
+            label = f'name="{row["name"]}"'
+            lines.append(f'tdcollector_seconds{{{label},quantile="0.5"}} {row["p50"]}')
+            lines.append(f'tdcollector_seconds{{{label},quantile="0.95"}} {row["p95"]}')
+            lines.append(f"tdcollector_seconds_sum{{{label}}} {row['seconds']}")
+            lines.append(f"tdcollector_seconds_count{{{label}}} {row['calls']}")
+        for metric, field, help_text in (
+            ("tdcollector_errors_total", "errors", "Calls that failed."),
+            ("tdcollector_bytes_total", "bytes", "Response bytes received."),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{name="{row["name"]}"}} {row[field]}' for row in rows)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the summary to ``path`` (JSON for ``.json``, Prometheus text otherwise), atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if path.endswith(".json"):
+            content = json.dumps(self.summary(), indent=2)
+        else:
+            content = self.prometheus()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)  # the textfile collector must never see a half-written file
+
+
+metrics = Metrics()
+
+
+def report(path=None):
+    """Logs the end-of-run table and writes it to ``path`` (default: METRICS_PATH) if set."""
+    table = metrics.format_table()
+    if table:
+        logger.info(f"Run metrics:\n{table}")
+    path = path or get_metrics_path()
+    if path:
+        metrics.write(path)
+        logger.info(f"Wrote metrics to {path}")
@@ -0,0 +1,207 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# The default clock and sleep of the buckets and windows. They look ``time``
+# up on every call, so tests can patch time.monotonic / time.sleep.
+def monotonic_clock():
+    return time.monotonic()
+
+
+def blocking_sleep(seconds):
+    time.sleep(seconds)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by any number of callers.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``. A
+    caller reserves its tokens under a short lock and then sleeps outside
+    of it, so concurrent callers queue up fairly and the time spent inside
+    the request itself never counts against the interval. Threads use
+    ``acquire`` and coroutines ``acquire_async``; both draw from one budget.
+
+    Args:
+        rate: Tokens added per second (i.e. sustained calls per second)
+        burst: Maximum number of tokens that can be spent at once
+        parent: Optional bucket that is charged as well, e.g. a per-host budget
+        name: Label used in logs and stats
+    """
+
+    def __init__(self, rate, burst=1, parent=None, name=None, clock=None, sleep=None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.parent = parent
+        self.name = name or "bucket"
+        self._clock = clock or monotonic_clock
+        self._sleep = sleep or blocking_sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = None
+        self.calls = 0
+        self.waits = 0
+        self.total_wait = 0.0
+
+    def reserve(self, tokens=1):
+        """Takes ``tokens`` from the bucket and returns how long to wait before using them."""
+        with self._lock:
+            now = self._clock()
+            if self._updated_at is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if self.parent is not None:
+            wait = max(wait, self.parent.reserve(tokens))
+        return wait
+
+    def _record(self, wait):
+        with self._lock:
+            self.calls += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+
+    def acquire(self, tokens=1):
+        """Blocks until ``tokens`` are available and returns the seconds waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._sleep(wait)
+        self._record(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """Awaits until ``tokens`` are available without blocking the event loop."""
+        import asyncio  # already loaded by the running event loop
+
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record(wait)
+        return wait
+
+    def set_rate(self, rate):
+        """Changes the refill rate, keeping tokens already accrued at the old rate."""
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        with self._lock:
+            if self._updated_at is not None:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+            self.rate = float(rate)
+
+    def hold(self, seconds):
+        """Makes every caller wait at least ``seconds`` from now, e.g. for a ``Retry-After``."""
+        with self._lock:
+            now = self._clock()
+            if self._updated_at is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "rate": self.rate,
+                "burst": self.burst,
+                "calls": self.calls,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+            }
+
+
+class AdaptiveRate:
+    """AIMD control of a ``TokenBucket``'s rate from the responses it paces.
+
+    Every healthy response adds ``increase`` calls per second, spread over
+    roughly a second's worth of calls, until ``max_rate``. A throttle (429,
+    5xx, connection error) or a latency spike halves the rate, at most once
+    per ``cooldown`` seconds so a burst of failures from requests already in
+    flight counts as one signal, and never below ``min_rate``. A spike is a
+    response slower than ``spike_factor`` times the moving average latency.
+
+    Args:
+        bucket: TokenBucket whose rate is adjusted
+        min_rate: Lowest rate backed off to
+        max_rate: Highest rate probed up to (default: the bucket's starting rate)
+        increase: Calls per second added per second of healthy responses
+        decrease: Factor applied to the rate on a throttle
+        spike_factor: Latency over this multiple of the average counts as a throttle
+        cooldown: Seconds after a decrease during which further throttles are ignored
+    """
+
+    def __init__(self, bucket, min_rate, max_rate=None, increase=0.1, decrease=0.5, spike_factor=4.0,
+                 cooldown=1.0, clock=None):
+        self.bucket = bucket
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate if max_rate is not None else bucket.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self._clock = clock or monotonic_clock
+        self._lock = threading.Lock()
+        self._latency = None
+        self._samples = 0
+        self._decreased_at = None
+        self.decreases = 0
+
+    def on_response(self, latency, throttled=False, retry_after=None):
+        """Feeds one response: ``throttled`` for 429/5xx, ``retry_after`` seconds if the portal asked."""
+        with self._lock:
+            spike = (
+                self._samples >= 10
+                and latency > self.spike_factor * self._latency
+            )
+            if not throttled:
+                # The average only learns from healthy responses, so a slow patch can't become normal.
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+                self._samples += 1
+            if throttled or spike:
+                self._decrease()
+            else:
+                self._increase()
+        if retry_after:
+            self.bucket.hold(retry_after)  # after any rate change, so the hold is in seconds at the new rate
+
+    def on_error(self):
+        """Feeds a request that failed without a response (timeout, connection reset)."""
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self):
+        now = self._clock()
+        if self._decreased_at is not None and now - self._decreased_at < self.cooldown:
+            return
+        self._decreased_at = now
+        rate = max(self.min_rate, self.bucket.rate * self.decrease)
+        if rate < self.bucket.rate:
+            self.decreases += 1
+            logger.info(f"Backing off {self.bucket.name} to {rate:.2f} calls/s")
+            self.bucket.set_rate(rate)
+
+    def _increase(self):
+        rate = self.bucket.rate
+        if rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, rate + self.increase / rate))
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def host_limiter(host, rate, burst=1):
+    """Returns the process-wide bucket for ``host``, creating it on first use."""
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = TokenBucket(rate=rate, burst=burst, name=host)
+        return _host_limiters[host]
@@ -0,0 +1,161 @@
+"""Streaming writers for harvested rows.
+
+Each sink takes rows in chunks (e.g. one staff at a time) and writes them
+straight to disk, so memory stays flat however many rows a month has.
+The columns are fixed by the first chunk; later rows missing a column get
+an empty cell and extra keys are dropped.
+
+Rows go to ``{path}.tmp`` first; the file is moved into place only when
+the sink closes cleanly, so a run that fails half way never leaves a
+truncated file under the real name.
+"""
+import csv
+import logging
+import os
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class Format(str, Enum):
+    xlsx = "xlsx"
+    csv = "csv"
+    parquet = "parquet"
+
+
+class RowSink:
+    """Base class: subclasses implement ``_open(columns)``, ``_write(values)`` and ``_close()``.
+
+    Subclasses write to ``self.tmp_path``; ``close`` moves it to ``path``
+    and ``discard`` deletes it.
+
+    Args:
+        path: Output file
+        index: Column written first, as ``DataFrame.to_excel`` did with the index
+    """
+
+    def __init__(self, path, index="order_id"):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.index = index
+        self.columns = None
+        self.rows_written = 0
+
+    def write(self, rows):
+        """Appends ``rows`` (a list of dicts) to the file."""
+        if not rows:
+            return
+        if self.columns is None:
+            columns = list(rows[0])
+            if self.index in columns:
+                columns.remove(self.index)
+                columns.insert(0, self.index)
+            self.columns = columns
+            self._open(columns)
+        self._write([[row.get(column) for column in self.columns] for row in rows])
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.columns is not None:
+            self._close()
+            os.replace(self.tmp_path, self.path)
+        logger.info(f"Wrote {self.rows_written} rows to {self.path}")
+
+    def discard(self):
+        """Closes the sink without finishing the file, and deletes what was written."""
+        if self.columns is not None:
+            self._close()
+            os.remove(self.tmp_path)
+        logger.warning(f"Discarded {self.rows_written} rows meant for {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _open(self, columns):
+        raise NotImplementedError
+
+    def _write(self, values):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CsvSink(RowSink):
+    def _open(self, columns):
+        self._file = open(self.tmp_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def _write(self, values):
+        self._writer.writerows(values)
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class XlsxSink(RowSink):
+    """Excel through openpyxl's write-only mode, which streams rows instead of building the sheet in memory."""
+
+    def _open(self, columns):
+        from openpyxl import Workbook
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+        self._sheet.append(columns)
+
+    def _write(self, values):
+        for row in values:
+            self._sheet.append(row)
+
+    def _close(self):
+        self._workbook.save(self.tmp_path)
+
+
+class ParquetSink(RowSink):
+    """Parquet through pyarrow (optional: ``pip install tdcollector[parquet]``).
+
+    Every column is stored as a nullable string, matching what the sheet holds.
+    """
+
+    def __init__(self, path, index="order_id"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow: pip install 'tdcollector[parquet]'") from e
+        super().__init__(path, index)
+
+    def _open(self, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._schema = pa.schema([(column, pa.string()) for column in columns])
+        self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+
+    def _write(self, values):
+        import pyarrow as pa
+
+        arrays = [
+            pa.array([None if row[i] is None else str(row[i]) for row in values], type=pa.string())
+            for i in range(len(self.columns))
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _close(self):
+        self._writer.close()
+
+
+SINKS = {Format.xlsx: XlsxSink, Format.csv: CsvSink, Format.parquet: ParquetSink}
+
+
+def open_sink(format, stem, index="order_id"):
+    """Opens the sink for ``format`` writing to ``{stem}.{format}``."""
+    format = Format(format)
+    return SINKS[format](f"{stem}.{format.value}", index=index)
@@ -0,0 +1,54 @@
+"""The SQLite plumbing shared by the local caches and stores.
+
+Each store is one SQLite file opened in autocommit mode, so transactions
+are explicit, with WAL journaling so readers don't block the writer. A
+single connection is shared between harvest threads behind a lock.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteFile:
+    """Base class: a thread-safe SQLite connection to ``path``, closed on exit.
+
+    Subclasses create their tables in ``__init__`` after calling
+    ``super().__init__(path)``, and hold ``self._lock`` around every use of
+    ``self._conn`` (``transaction`` does so itself).
+
+    Args:
+        path: SQLite file; its directory is created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block in one transaction under the lock; rolls it back if the block raises."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -4,8 +4,13 @@ from googleapiclient.discovery import build
 import pandas as pd
 import logging
 import os
+import re
+import threading
+import time
 from collections import defaultdict
 from common import retry
+from gsheet.quota import get_scheduler
+from gsheet.planner import apply_plan, batch_chunks, column_letter, parse_cell, plan_upsert, snapshot_array
 from common.configurations import (
     get_default_credential_file,
     get_default_spreadsheet_id,
@@ -17,20 +22,69 @@ logger = logging.getLogger(__name__)
 # If you restrict to readonly, writing will fail.
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
+_credentials = {}  # {credential file: Credentials}, shared by every thread
+_services = threading.local()  # per-thread {credential file: service}
+_credentials_lock = threading.Lock()
+
+
+def _load_credentials(credential_file):
+    """Reads a service account file once per process; the token it mints is shared by every service."""
+    with _credentials_lock:
+        creds = _credentials.get(credential_file)
+        if creds is None:
+            creds = Credentials.from_service_account_file(credential_file, scopes=SCOPES)
+            _credentials[credential_file] = creds
+        return creds
+
+
 def _get_sheets_service(credential_file=None):
-    """Internal helper to build the Google Sheets service with error handling."""
+    """Internal helper returning a cached Google Sheets service, built on first use.
+
+    Managers on one thread share a service, and with it one authorised,
+    keep-alive HTTP connection. The service's httplib2 transport isn't
+    thread-safe, so each thread builds its own from the shared credentials.
+    """
     if credential_file is None:
         credential_file = get_default_credential_file()
         
     if not os.path.exists(credential_file):
         raise FileNotFoundError(f"Credential file not found at: {credential_file}. Please check your .env or the file path.")
-        
+
+    cache = getattr(_services, "cache", None)
+    if cache is None:
+        cache = _services.cache = {}
+    key = os.path.abspath(credential_file)
+    if key in cache:
+        return cache[key]
     try:
-        creds = Credentials.from_service_account_file(credential_file, scopes=SCOPES)
-        return build("sheets", "v4", credentials=creds, cache_discovery=False).spreadsheets()
+        creds = _load_credentials(key)
+        service = build("sheets", "v4", credentials=creds, cache_discovery=False).spreadsheets()
     except Exception as e:
         logger.error(f"Failed to initialize Google Sheets service: {e}")
         raise
+    cache[key] = service
+    return service
+
+
+def clear_service_cache():
+    """Forgets cached credentials and this thread's services, e.g. after rotating the key file."""
+    with _credentials_lock:
+        _credentials.clear()
+    _services.cache = {}
+
+
+def _reads_whole_columns(sheet_range):
+    """True when ``sheet_range`` is a bare sheet name or spans whole columns from A, e.g. ``CASE ID!A:D``."""
+    cells = sheet_range.split("!", 1)[1] if "!" in sheet_range else ""
+    return not cells or re.fullmatch(r"A1?:[A-Z]+", cells) is not None
+
+
+def _match_column(header_map, target_name):
+    target_lower = target_name.lower()
+    for actual_name in header_map.keys():
+        if actual_name.lower() == target_lower:
+            return actual_name
+    return None
 
 
 class GSheetManager:
@@ -43,16 +97,41 @@ class GSheetManager:
         self.key_column = key_column
         self.credential_file = credential_file
 
-        # Maps to be populated by _refresh_metadata
-        self.header_map = {}  # {col_name: index}
-        self.row_map = {}     # {key_value: row_number_1_indexed}
+        # Maps populated by _refresh_metadata on first use
+        self._header_map = {}  # {col_name: index}
+        self._row_map = {}     # {key_value: row_number_1_indexed}
+        self._loaded = False
+        self._snapshot = None  # current sheet values, loaded by changed-only upserts (or seeded by read)
+        self._last_row = 0     # last row holding a key
+        self._last_key = []    # key column value of _last_row
+        self._checked_at = None  # monotonic time the maps were last known to match the sheet
         self.sheet_name = ""
         if "!" in sheet_range:
             self.sheet_name = sheet_range.split("!")[0]
 
         self.sheet = _get_sheets_service(self.credential_file)
-        self._refresh_metadata()
 
+    @property
+    def header_map(self):
+        """``{col_name: index}`` of the header row; the first access reads the sheet."""
+        if not self._loaded:
+            self._refresh_metadata()
+        return self._header_map
+
+    @header_map.setter
+    def header_map(self, value):
+        self._header_map = value
+
+    @property
+    def row_map(self):
+        """``{key_value: [row numbers]}`` of the key column; the first access reads the sheet."""
+        if not self._loaded:
+            self._refresh_metadata()
+        return self._row_map
+
+    @row_map.setter
+    def row_map(self, value):
+        self._row_map = value
 
     @property
     def sheet_prefix(self):
@@ -61,36 +140,40 @@ class GSheetManager:
     def _refresh_metadata(self):
         """Fetches header and key column to build maps."""
         # 1. Get headers (Row 1)
-        header_result = self.sheet.values().get(
+        header_result = self._execute("get", self.sheet.values().get(
             spreadsheetId=self.spreadsheet_id, 
             range=f"{self.sheet_prefix}1:1"
-        ).execute()
+        ))
         headers = header_result.get("values", [[]])[0]
-        self.header_map = {name: i for i, name in enumerate(headers)}
+        self._header_map = {name: i for i, name in enumerate(headers)}
         
         # Use case-insensitive matching for the key_column
-        actual_key_column = self._get_column_name_case_insensitive(self.key_column)
+        actual_key_column = _match_column(self._header_map, self.key_column)
         if not actual_key_column:
             raise ValueError(f"Key column '{self.key_column}' not found in sheet headers")
         
         self.key_column = actual_key_column  # Update to the actual case in the sheet
             
         # 2. Get key column values
-        key_col_letter = self._get_column_letter(self.header_map[self.key_column])
-        key_result = self.sheet.values().get(
+        key_col_letter = self._get_column_letter(self._header_map[self.key_column])
+        key_result = self._execute("get", self.sheet.values().get(
             spreadsheetId=self.spreadsheet_id,
             range=f"{self.sheet_prefix}{key_col_letter}:{key_col_letter}"
-        ).execute()
+        ))
         key_values = key_result.get("values", [])
         
         # 3. Build row map (skipping header at index 0)
         # Assuming key_values[0] is the header
         # Track all rows for each key; warn when duplicates are found
-        self.row_map = defaultdict(list)
+        self._row_map = defaultdict(list)
         for i, val in enumerate(key_values[1:]):
             if val:
-                self.row_map[str(val[0])].append(i + 2)
-        duplicates = {k: v for k, v in self.row_map.items() if len(v) > 1}
+                self._row_map[str(val[0])].append(i + 2)
+        self._last_row = len(key_values)
+        self._last_key = key_values[-1] if key_values else []
+        self._checked_at = time.monotonic()
+        self._loaded = True
+        duplicates = {k: v for k, v in self._row_map.items() if len(v) > 1}
         if duplicates:
             logger.warning(
                 "Found %d duplicate key(s) in sheet '%s'. "
@@ -98,28 +181,80 @@ class GSheetManager:
                 len(duplicates), self.key_column, list(duplicates.keys())[:10]
             )
 
+    def _sheet_unchanged(self):
+        """Cheap probe: our last keyed row still holds its key and nothing follows it."""
+        key_col_letter = self._get_column_letter(self.header_map[self.key_column])
+        result = self._execute("get", self.sheet.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{self.sheet_prefix}{key_col_letter}{self._last_row}:{key_col_letter}{self._last_row + 1}"
+        ))
+        return result.get("values", []) == [self._last_key]
+
+    def _ensure_metadata(self):
+        """Brings header_map/row_map up to date, re-reading the key column only when needed.
+
+        A full refresh happens after a failed write (the retry must see rows a
+        partial attempt appended) or when the probe shows the sheet changed
+        outside this process. Within GSHEET_METADATA_TTL seconds of the last
+        check the maps are trusted as they are.
+        """
+        if self._checked_at is None:
+            self._refresh_metadata()
+            return
+        ttl = float(os.getenv("GSHEET_METADATA_TTL", "300"))
+        if time.monotonic() - self._checked_at < ttl:
+            return
+        if self._sheet_unchanged():
+            self._checked_at = time.monotonic()
+            return
+        logger.info("Sheet changed outside this process; reloading key column.")
+        self._refresh_metadata()
+        self._snapshot = None
+
+    def _record_append(self, response, keys):
+        """Maps appended keys to the rows the append response says they landed in.
+
+        Returns False when the response carries no ``updatedRange``.
+        """
+        updated_range = response.get("updates", {}).get("updatedRange") if isinstance(response, dict) else None
+        if not isinstance(updated_range, str):
+            return False
+        first_row, _ = parse_cell(updated_range.split(":")[0])
+        for offset, key in enumerate(keys):
+            self.row_map.setdefault(key, []).append(first_row + offset)
+        if keys:
+            self._last_row = max(self._last_row, first_row + len(keys) - 1)
+            self._last_key = [keys[-1]]
+        return True
+
+    def _execute(self, operation, request):
+        """Runs a Sheets API request through the shared quota scheduler; the call itself is timed as ``sheets.{operation}``."""
+        return get_scheduler().execute("read" if operation == "get" else "write", request, f"sheets.{operation}")
+
     def _get_column_letter(self, index):
-        letter = ""
-        while index >= 0:
-            letter = chr(index % 26 + 65) + letter
-            index = index // 26 - 1
-        return letter
+        return column_letter(index)
 
     def _get_column_name_case_insensitive(self, target_name):
         """Finds the actual column name in the sheet that matches the target name (case-insensitive)."""
-        target_lower = target_name.lower()
-        for actual_name in self.header_map.keys():
-            if actual_name.lower() == target_lower:
-                return actual_name
-        return None
+        return _match_column(self.header_map, target_name)
+
+    def _load_snapshot(self):
+        """Reads every cell under the known headers, for diffing upserts against."""
+        width = len(self.header_map)
+        last_col_letter = self._get_column_letter(width - 1)
+        result = self._execute("get", self.sheet.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{self.sheet_prefix}A:{last_col_letter}"
+        ))
+        return snapshot_array(result.get("values", []), width)
 
     @retry(exceptions=TimeoutError, tries=5, delay=10)
     def read(self):
         """Reads the entire sheet range and returns a DataFrame."""
-        result = self.sheet.values().get(
+        result = self._execute("get", self.sheet.values().get(
             spreadsheetId=self.spreadsheet_id, 
             range=self.sheet_range
-        ).execute()
+        ))
         values = result.get("values", [])
 
         if not values:
@@ -128,7 +263,10 @@ class GSheetManager:
         
         header = values[0]
         data = values[1:]
-        
+        if _reads_whole_columns(self.sheet_range):
+            # The cells _load_snapshot would fetch, so the next changed-only upsert needn't read them again.
+            self._snapshot = snapshot_array(values, len(header))
+
         # Pad rows that are shorter than the header
         num_columns = len(header)
         for row in data:
@@ -136,108 +274,69 @@ class GSheetManager:
     
         return pd.DataFrame(data, columns=header)
 
-    def _build_update_requests(self, row_idx, df_row):
-        """
-        Builds surgical update requests by grouping adjacent columns into 
-        contiguous ranges to minimize payload size and request count.
-        """
-        requests = []
-        
-        # 1. Get all columns we want to update that exist in the sheet
-        valid_cols = []
-        for col_name, value in df_row.items():
-            if col_name in self.header_map and col_name != self.key_column:
-                valid_cols.append((self.header_map[col_name], value))
-        
-        # 2. Sort columns by their index to find neighbors
-        valid_cols.sort(key=lambda x: x[0])
-        
-        if not valid_cols:
-            return requests
-
-        # 3. Group contiguous columns
-        # Example: if we have col indices 2, 3, 5, 6, 7
-        # We want groups: [[2, 3], [5, 6, 7]]
-        groups = []
-        if valid_cols:
-            current_group = [valid_cols[0]]
-            for i in range(1, len(valid_cols)):
-                # If this column is immediately after the previous one
-                if valid_cols[i][0] == valid_cols[i-1][0] + 1:
-                    current_group.append(valid_cols[i])
-                else:
-                    groups.append(current_group)
-                    current_group = [valid_cols[i]]
-            groups.append(current_group)
-
-        # 4. Create one ValueRange per group
-        for group in groups:
-            start_col_idx = group[0][0]
-            end_col_idx = group[-1][0]
-            
-            start_col_letter = self._get_column_letter(start_col_idx)
-            end_col_letter = self._get_column_letter(end_col_idx)
-            
-            # Format: Sheet1!B5:D5
-            if start_col_idx == end_col_idx:
-                cell_range = f"{self.sheet_prefix}{start_col_letter}{row_idx}"
-            else:
-                cell_range = f"{self.sheet_prefix}{start_col_letter}{row_idx}:{end_col_letter}{row_idx}"
-            
-            # Extract values in order
-            values = [[str(item[1]) if pd.notnull(item[1]) else "" for item in group]]
-            
-            requests.append({
-                "range": cell_range,
-                "values": values
-            })
-            
-        return requests
+    @retry(exceptions=(TimeoutError, ConnectionError, OSError), tries=5, delay=10)
+    def upsert(self, df: pd.DataFrame, changed_only=False, dry_run=False):
+        """Updates rows whose key is already in the sheet and appends the rest.
 
-    def _format_for_append(self, df_row):
-        formatted = [""] * len(self.header_map)
-        for col_name, value in df_row.items():
-            if col_name in self.header_map:
-                formatted[self.header_map[col_name]] = str(value) if pd.notnull(value) else ""
-        return formatted
+        Args:
+            df: Rows to write, keyed by ``key_column`` (a column or the index)
+            changed_only: Diff against the sheet's current values and write only cells that
+                differ. The values are read once and then kept up to date locally.
+            dry_run: Log what would be written without writing it
 
-    @retry(exceptions=(TimeoutError, ConnectionError, OSError), tries=5, delay=10)
-    def upsert(self, df: pd.DataFrame):
+        Returns:
+            The ``UpsertPlan`` that was (or, for a dry run, would have been) sent.
+        """
         if df.empty:
-            return
-        
-        # Refresh metadata at the start to fetch any successfully appended rows
-        # from a previous failed attempt, ensuring idempotency on retry.
-        self._refresh_metadata()
+            return None
         
-        update_data = []
-        append_data = []
+        # Re-reads the key column after a failed attempt, so rows it managed
+        # to append are updated rather than appended twice on retry.
+        self._ensure_metadata()
         
         # If key_column is index, move it back to columns
-        working_df = df.reset_index() if self.key_column in df.index.names else df.copy()
-        
-        for _, row in working_df.iterrows():
-            key_val = str(row[self.key_column])
-            if key_val in self.row_map:
-                for row_idx in self.row_map[key_val]:
-                    update_data.extend(self._build_update_requests(row_idx, row))
-            else:
-                append_data.append(self._format_for_append(row))
+        working_df = df.reset_index() if self.key_column in df.index.names else df
+
+        snapshot = None
+        if changed_only:
+            # A snapshot seeded by read() is only usable when it spans the same header columns.
+            if self._snapshot is None or self._snapshot.shape[1] != len(self.header_map):
+                self._snapshot = self._load_snapshot()
+            snapshot = self._snapshot
+
+        # Google recommends keeping payloads under 2MB; GSHEET_BATCH_CELLS bounds
+        # the cells per batchUpdate (and so the height of merged row ranges).
+        max_ranges = int(os.getenv("GSHEET_BATCH_SIZE", "5000"))
+        max_cells = int(os.getenv("GSHEET_BATCH_CELLS", "100000"))
+        plan = plan_upsert(
+            working_df, self.header_map, self.row_map, self.key_column, self.sheet_prefix,
+            snapshot=snapshot, max_cells=max_cells,
+        )
+        summary = plan.summary()
+        logger.info(
+            f"{'Dry run: ' if dry_run else ''}{summary['rows_updated']} rows to update "
+            f"({summary['cells_updated']} cells in {summary['requests']} ranges), "
+            f"{summary['rows_unchanged']} rows unchanged, {summary['rows_appended']} rows to append"
+        )
+        if dry_run:
+            return plan
+
+        # Until the writes succeed the sheet's state is uncertain, so a retry re-reads it.
+        self._snapshot = None
+        self._checked_at = None
+        row_map_current = True
+        update_data = plan.updates
+        append_data = plan.appends
         
         # 1. Execute Batch Updates in chunks to avoid payload limits
         if update_data:
-            # We chunk by the number of individual cell updates. 
-            # Google recommends keeping payloads under 2MB. 
-            # 5,000 cells is a safe default for typical string sizes.
-            MAX_BATCH_SIZE = int(os.getenv("GSHEET_BATCH_SIZE", "5000"))
-            
-            for i in range(0, len(update_data), MAX_BATCH_SIZE):
-                chunk = update_data[i:i + MAX_BATCH_SIZE]
+            # Chunked by ranges (GSHEET_BATCH_SIZE) and cells (GSHEET_BATCH_CELLS).
+            for n, chunk in enumerate(batch_chunks(update_data, max_ranges, max_cells), start=1):
                 body = {"data": chunk, "valueInputOption": "RAW"}
-                logger.info(f"Sending batch update chunk {i//MAX_BATCH_SIZE + 1} ({len(chunk)} cells)...")
-                self.sheet.values().batchUpdate(
+                logger.info(f"Sending batch update chunk {n} ({len(chunk)} ranges)...")
+                self._execute("batchUpdate", self.sheet.values().batchUpdate(
                     spreadsheetId=self.spreadsheet_id, body=body
-                ).execute()
+                ))
             
         # 2. Execute Appends in chunks
         if append_data:
@@ -249,13 +348,21 @@ class GSheetManager:
                 chunk = append_data[i:i + MAX_APPEND_ROWS]
                 body = {"values": chunk}
                 logger.info(f"Sending append chunk {i//MAX_APPEND_ROWS + 1} ({len(chunk)} rows)...")
-                self.sheet.values().append(
+                response = self._execute("append", self.sheet.values().append(
                     spreadsheetId=self.spreadsheet_id,
                     range=f"{self.sheet_prefix}A1",
                     valueInputOption="RAW",
                     body=body
-                ).execute()
-        
-        # Refresh metadata to include new rows
-        self._refresh_metadata()
+                ))
+                if row_map_current:
+                    row_map_current = self._record_append(response, plan.append_keys[i:i + MAX_APPEND_ROWS])
+
+        if row_map_current:
+            self._checked_at = time.monotonic()
+        else:
+            # Without an updatedRange we can't tell where the rows landed.
+            self._refresh_metadata()
+        if snapshot is not None:
+            self._snapshot = apply_plan(snapshot, plan, self.row_map)
+        return plan
 
@@ -0,0 +1,256 @@
+"""Column-wise planning of GSheetManager.upsert writes.
+
+The planner turns a DataFrame into the ``batchUpdate`` value ranges and
+``append`` rows that ``upsert`` sends, without iterating the frame row by
+row: keys are matched against ``row_map`` in one pass, every cell is
+stringified at once, and contiguous column runs (with their A1 letters)
+are worked out once for the frame instead of once per row.
+
+Given a snapshot of the sheet's current values, only cells that actually
+change are written. Runs of consecutive sheet rows that write the same
+column span are merged into one rectangular range (``B5:Z900``), so a
+re-sync of many adjacent rows costs a handful of ValueRanges.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+_CELL = re.compile(r"([A-Z]+)(\d+)")
+
+
+def column_letter(index):
+    """0-based column index -> A1 letters (0 -> A, 26 -> AA)."""
+    letter = ""
+    while index >= 0:
+        letter = chr(index % 26 + 65) + letter
+        index = index // 26 - 1
+    return letter
+
+
+def stringify(frame):
+    """``str()`` of every cell, with nulls as ``""``, for the whole frame at once."""
+    as_text = frame.astype(object).astype(str)
+    return as_text.mask(frame.isna(), "")
+
+
+def snapshot_array(values, width):
+    """``values().get`` rows -> 2D object array (row 1 first), short rows padded with ``""``."""
+    snapshot = np.full((len(values), width), "", dtype=object)
+    for i, row in enumerate(values):
+        row = row[:width]
+        snapshot[i, :len(row)] = row
+    return snapshot
+
+
+def parse_cell(a1):
+    """``"Sheet1!B5"`` -> ``(5, 1)``: 1-based row, 0-based column."""
+    match = _CELL.match(a1.rsplit("!", 1)[-1])
+    column = 0
+    for char in match.group(1):
+        column = column * 26 + ord(char) - 64
+    return int(match.group(2)), column - 1
+
+
+def apply_plan(snapshot, plan, row_map):
+    """Returns ``snapshot`` with the plan's writes applied, so the next upsert needn't re-read the sheet.
+
+    Appended rows are placed by ``row_map``, which must already include them.
+    """
+    rows = [parse_cell(update["range"].split(":")[0])[0] + len(update["values"]) - 1 for update in plan.updates]
+    rows += [row for key in plan.append_keys for row in row_map.get(key, ())]
+    if rows and max(rows) > snapshot.shape[0]:
+        grown = np.full((max(rows), snapshot.shape[1]), "", dtype=object)
+        grown[:snapshot.shape[0]] = snapshot
+        snapshot = grown
+    for update in plan.updates:
+        row, column = parse_cell(update["range"].split(":")[0])
+        for offset, values in enumerate(update["values"]):
+            values = values[:max(snapshot.shape[1] - column, 0)]
+            snapshot[row - 1 + offset, column:column + len(values)] = values
+    for key, values in zip(plan.append_keys, plan.appends):
+        for row in row_map.get(key, ()):
+            values = values[:snapshot.shape[1]]
+            snapshot[row - 1, :len(values)] = values
+    return snapshot
+
+
+def _current_cells(snapshot, rows, columns):
+    """Snapshot cells at 1-based ``rows`` x 0-based ``columns``; cells outside it read as ``""``."""
+    cells = np.full((len(rows), len(columns)), "", dtype=object)
+    rows = np.asarray(rows, dtype=np.int64) - 1
+    columns = np.asarray(columns, dtype=np.int64)
+    in_rows = rows < snapshot.shape[0]
+    in_columns = columns < snapshot.shape[1]
+    cells[np.ix_(in_rows, in_columns)] = snapshot[np.ix_(rows[in_rows], columns[in_columns])]
+    return cells
+
+
+def batch_chunks(updates, max_ranges, max_cells):
+    """Splits ValueRanges into ``batchUpdate`` bodies of at most ``max_ranges`` ranges and ~``max_cells`` cells."""
+    chunk, cells = [], 0
+    for update in updates:
+        size = sum(len(values) for values in update["values"])
+        if chunk and (len(chunk) >= max_ranges or cells + size > max_cells):
+            yield chunk
+            chunk, cells = [], 0
+        chunk.append(update)
+        cells += size
+    if chunk:
+        yield chunk
+
+
+def _rectangles(blocks, value_range, max_cells=None):
+    """Merges ``(first, last, row, values)`` runs on consecutive rows with the same span into ValueRanges."""
+    blocks.sort(key=lambda block: block[:3])
+    merged = []
+    span = top = rows = None
+    for first, last, row_idx, values in blocks:
+        height = max(1, max_cells // (last - first)) if max_cells else None
+        if (
+            rows is not None
+            and (first, last) == span
+            and row_idx == top + len(rows)
+            and (height is None or len(rows) < height)
+        ):
+            rows.append(values)
+            continue
+        if rows is not None:
+            merged.append((top, span, rows))
+        span, top, rows = (first, last), row_idx, [values]
+    if rows is not None:
+        merged.append((top, span, rows))
+    merged.sort(key=lambda rectangle: rectangle[:2])
+    return [value_range(first, last, top, rows) for top, (first, last), rows in merged]
+
+
+class UpsertPlan:
+    """What an upsert will send.
+
+    Attributes:
+        updates: ``batchUpdate`` ValueRanges, one per contiguous column run, spanning consecutive rows
+        appends: Full-width rows for keys not yet in the sheet
+        append_keys: Key of each row in ``appends``
+        rows_updated: Target rows with at least one cell written
+        rows_unchanged: Target rows skipped because the sheet already matches
+        cells_unchanged: Cells skipped because the sheet already matches
+    """
+
+    __slots__ = ("updates", "appends", "append_keys", "rows_updated", "rows_unchanged", "cells_unchanged")
+
+    def __init__(self, updates, appends, append_keys, rows_updated=0, rows_unchanged=0, cells_unchanged=0):
+        self.updates = updates
+        self.appends = appends
+        self.append_keys = append_keys
+        self.rows_updated = rows_updated
+        self.rows_unchanged = rows_unchanged
+        self.cells_unchanged = cells_unchanged
+
+    def summary(self):
+        """Change counts, e.g. for a dry-run report."""
+        return {
+            "rows_updated": self.rows_updated,
+            "rows_unchanged": self.rows_unchanged,
+            "rows_appended": len(self.appends),
+            "cells_updated": sum(len(values) for update in self.updates for values in update["values"]),
+            "cells_unchanged": self.cells_unchanged,
+            "requests": len(self.updates),
+        }
+
+
+def plan_upsert(df, header_map, row_map, key_column, sheet_prefix="", snapshot=None, max_cells=None):
+    """Plans the writes that bring the sheet in line with ``df``.
+
+    Rows whose key is in ``row_map`` update every sheet row holding that key
+    (duplicates included); all other rows are appended. Given a ``snapshot``
+    of the sheet's current values, only the cells that differ are written.
+
+    Consecutive sheet rows writing the same column span are merged into one
+    rectangle of at most ``max_cells`` cells. A key that appears more than
+    once in ``df`` updates the sheet from its last row only, so the last
+    write still wins and is diffed against the snapshot on its own; keys
+    held in several sheet rows are left as one range per row.
+
+    Args:
+        df: Rows to write; must contain ``key_column``
+        header_map: ``{column_name: 0-based sheet column}``
+        row_map: ``{key: [1-based sheet rows]}``
+        key_column: Column matched against ``row_map``; never overwritten
+        sheet_prefix: ``"Sheet1!"`` or ``""``
+        snapshot: Current sheet values from ``snapshot_array`` (default: write every cell)
+        max_cells: Largest merged rectangle (default: unbounded)
+    """
+    keys = df[key_column].astype(object).astype(str).tolist()
+    targets = [row_map.get(key) for key in keys]
+    last = {key: i for i, key in enumerate(keys)}
+    update_positions = [i for i, rows in enumerate(targets) if rows and last[keys[i]] == i]
+    append_positions = [i for i, rows in enumerate(targets) if not rows]
+
+    columns = [c for c in df.columns if c in header_map]
+    text = stringify(df[columns])
+
+    updates = []
+    rows_updated = rows_unchanged = cells_unchanged = 0
+    update_columns = sorted(header_map[c] for c in columns if c != key_column)
+    if update_positions and update_columns:
+        by_index = {header_map[c]: c for c in columns}
+        new = text.iloc[update_positions][[by_index[i] for i in update_columns]].to_numpy()
+        letters = [column_letter(i) for i in update_columns]
+
+        def runs(positions):
+            # ``positions`` index ``update_columns``; neighbours in the sheet form one run.
+            start = 0
+            for end in range(1, len(positions) + 1):
+                if end == len(positions) or update_columns[positions[end]] != update_columns[positions[end - 1]] + 1:
+                    yield positions[start], positions[end - 1] + 1
+                    start = end
+
+        def value_range(first, last, top, rows):
+            if last - first == 1 and len(rows) == 1:
+                cell_range = f"{sheet_prefix}{letters[first]}{top}"
+            else:
+                cell_range = f"{sheet_prefix}{letters[first]}{top}:{letters[last - 1]}{top + len(rows) - 1}"
+            return {"range": cell_range, "values": [values[first:last].tolist() for values in rows]}
+
+        full_runs = list(runs(list(range(len(update_columns)))))
+        pairs = [(n, row_idx) for n, position in enumerate(update_positions) for row_idx in targets[position]]
+        if snapshot is not None:
+            current = _current_cells(snapshot, [row_idx for _, row_idx in pairs], update_columns)
+            changed = new[[n for n, _ in pairs]] != current
+            cells_unchanged = int(changed.size - changed.sum())
+
+        # Only rows written exactly once, by a key held in exactly one sheet row, may be merged.
+        writes = Counter(row_idx for _, row_idx in pairs)
+        single = [len(targets[position]) == 1 for position in update_positions]
+        blocks = []  # (first, last, row_idx, values) of mergeable row runs
+
+        for p, (n, row_idx) in enumerate(pairs):
+            values = new[n]
+            if snapshot is None or changed[p].all():
+                row_runs = full_runs
+            elif changed[p].any():
+                row_runs = runs(np.flatnonzero(changed[p]).tolist())
+            else:
+                rows_unchanged += 1
+                continue
+            rows_updated += 1
+            if single[n] and writes[row_idx] == 1:
+                blocks.extend((first, last, row_idx, values) for first, last in row_runs)
+            else:
+                updates.extend(value_range(first, last, row_idx, [values]) for first, last in row_runs)
+
+        updates[:0] = _rectangles(blocks, value_range, max_cells)
+
+    appends = []
+    if append_positions:
+        layout = sorted(header_map, key=header_map.get)
+        appends = (
+            text.iloc[append_positions]
+            .reindex(columns=layout, fill_value="")
+            .to_numpy()
+            .tolist()
+        )
+
+    return UpsertPlan(
+        updates, appends, [keys[i] for i in append_positions], rows_updated, rows_unchanged, cells_unchanged
+    )
@@ -0,0 +1,175 @@
+"""Process-wide pacing of Sheets API calls within the per-minute quotas.
+
+Google counts read and write requests against separate per-minute quotas
+(``GSHEET_READS_PER_MINUTE`` / ``GSHEET_WRITES_PER_MINUTE``, default 60
+each, the per-user limit). Every ``GSheetManager`` sends its requests
+through one ``SheetsScheduler``, which queues each call into a free slot
+of a sliding 60 second window and retries ``429``/``503`` answers with
+truncated exponential back-off, so large upserts and several managers in
+one run stay inside quota instead of failing half way.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+from googleapiclient.errors import HttpError
+
+from common import backoff_delay, metrics
+from common.ratelimit import blocking_sleep, monotonic_clock
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 503)
+
+
+class QuotaWindow:
+    """At most ``limit`` calls in any ``period`` seconds, handed out in arrival order.
+
+    Args:
+        limit: Calls allowed per window
+        period: Window length in seconds
+        name: Label used in logs and stats
+    """
+
+    def __init__(self, limit, period=60.0, name=None, clock=None, sleep=None):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = int(limit)
+        self.period = period
+        self.name = name or "quota"
+        self._clock = clock or monotonic_clock
+        self._sleep = sleep or blocking_sleep
+        self._lock = threading.Lock()
+        self._slots = deque(maxlen=self.limit)  # start times of the last ``limit`` calls
+        self.calls = 0
+        self.waits = 0
+        self.total_wait = 0.0
+
+    def reserve(self):
+        """Books the next free slot and returns how long to wait for it."""
+        with self._lock:
+            now = self._clock()
+            start = now
+            if len(self._slots) == self.limit:
+                start = max(now, self._slots[0] + self.period)
+            self._slots.append(start)
+            wait = start - now
+            self.calls += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+            return wait
+
+    def acquire(self):
+        """Blocks until a slot is free and returns the seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            logger.debug(f"Waiting {wait:.1f}s for {self.name} quota")
+            self._sleep(wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "limit": self.limit,
+                "calls": self.calls,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+            }
+
+
+class SheetsScheduler:
+    """Runs Sheets requests within the read and write quota windows.
+
+    Args:
+        reads_per_minute: Read quota (default: GSHEET_READS_PER_MINUTE or 60)
+        writes_per_minute: Write quota (default: GSHEET_WRITES_PER_MINUTE or 60)
+        tries: Attempts per request when the API answers 429/503
+        delay: First back-off in seconds; doubles per retry up to ``max_delay``, half of it jittered
+    """
+
+    def __init__(self, reads_per_minute=None, writes_per_minute=None, tries=6, delay=2.0, max_delay=64.0,
+                 clock=None, sleep=None):
+        reads_per_minute = reads_per_minute or int(os.getenv("GSHEET_READS_PER_MINUTE", "60"))
+        writes_per_minute = writes_per_minute or int(os.getenv("GSHEET_WRITES_PER_MINUTE", "60"))
+        self.windows = {
+            "read": QuotaWindow(reads_per_minute, name="read", clock=clock, sleep=sleep),
+            "write": QuotaWindow(writes_per_minute, name="write", clock=clock, sleep=sleep),
+        }
+        self.tries = tries
+        self.delay = delay
+        self.max_delay = max_delay
+        self._sleep = sleep or blocking_sleep
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.backoff_wait = 0.0
+
+    def execute(self, kind, request, name=None):
+        """Runs ``request.execute()`` as a ``"read"`` or ``"write"``, pacing and retrying as needed.
+
+        Given a ``name``, each ``request.execute()`` is timed as that metric;
+        quota waits and back-off are recorded separately.
+        """
+        window = self.windows[kind]
+        for attempt in range(self.tries):
+            metrics.observe(f"sheets.quota.{kind}", window.acquire())
+            try:
+                with metrics.timer(name) if name else nullcontext():
+                    return request.execute()
+            except HttpError as e:
+                if e.resp.status not in RETRY_STATUSES or attempt == self.tries - 1:
+                    raise
+                wait = backoff_delay(attempt, e, self.delay, backoff=2, max_delay=self.max_delay, jitter=0.5)
+                with self._lock:
+                    self.retries += 1
+                    self.backoff_wait += wait
+                logger.warning(f"Sheets {kind} answered {e.resp.status}; retrying in {wait:.1f}s")
+                metrics.observe(f"retry.sheets_{kind}", wait)
+                self._sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            retries, backoff_wait = self.retries, self.backoff_wait
+        return {
+            "windows": [window.stats() for window in self.windows.values()],
+            "retries": retries,
+            "backoff_wait": backoff_wait,
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide SheetsScheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SheetsScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replaces the process-wide SheetsScheduler (e.g. with unlimited quotas in tests)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+def log_quota_stats():
+    """Logs how long Sheets calls waited on quota and on 429/503 back-off."""
+    if _scheduler is None:
+        return
+    stats = _scheduler.stats()
+    for window in stats["windows"]:
+        if window["calls"]:
+            logger.info(
+                f"Sheets {window['name']} quota ({window['limit']}/min): {window['calls']} calls, "
+                f"{window['waits']} waited, {window['total_wait']:.1f}s total wait"
+            )
+    if stats["retries"]:
+        logger.info(f"Sheets retries: {stats['retries']}, {stats['backoff_wait']:.1f}s backing off")
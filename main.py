@@ -1,33 +1,50 @@
+"""TM order and case collector CLI.
+
+Heavy dependencies (pandas, the Google API client, the portal client and
+everything built on them) are imported inside the commands that use them,
+so ``--help`` and start-up stay fast; ``.env`` and logging are set up by the
+app callback once a command actually runs.
+"""
 import calendar
 import logging
-import logging.config
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import datetime
 from enum import Enum
+from functools import wraps
 from time import sleep
 
-import pandas as pd
 import typer
-from dotenv import load_dotenv
 from typing_extensions import Annotated
 
 from common.configurations import (
+    DEFAULT_WORKERS,
     logging_config,
     get_orders_sheet_range,
-    get_case_ids_sheet_range
+    get_case_ids_sheet_range,
+    get_case_terminal_statuses,
 )
-from gsheet.main import GSheetManager
-from tm.api import get_all_order_list, get_all_staff, get_case_detail
-from tm.utils import process_order
-
-load_dotenv()
+from common.metrics import report as report_metrics
+from common.sinks import Format, open_sink
+from tm.cache import OrderDetailCache
+from tm.journal import RunJournal
+from tm.sync import WatermarkStore, collect_marks
 
-logging.config.dictConfig(config=logging_config)
 logger = logging.getLogger(__name__)
 
-app = typer.Typer()
+app = typer.Typer(rich_markup_mode=None)  # plain click help: rendering with rich costs ~100 ms at start-up
+
+@app.callback()
+def _configure():
+    import logging.config
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.config.dictConfig(config=logging_config)
 
 @app.command()
 def testing_loop():
+    from tm.api import get_all_staff
+
     while True:
         try:
             staffs = get_all_staff()
@@ -40,6 +57,9 @@ def testing_loop():
 
 @app.command()
 def testing_write():
+    import pandas as pd
+    from gsheet.main import GSheetManager
+
     manager = GSheetManager(sheet_range=get_orders_sheet_range())
     new_row_data = {
         "order_id": "2506000073552841",
@@ -54,7 +74,150 @@ class Source(str, Enum):
     ongoing = "ongoing"
     historical = "historical"
 
+class Engine(str, Enum):
+    threads = "threads"
+    asyncio = "asyncio"
+
+def _harvest(engine, staffs, on_way_flag, created_date_from, created_date_to, workers, cache=None, journal=None, resume=False):
+    """Harvests rows for ``staffs``, checkpointing each finished staff to ``journal``.
+
+    When resuming, staff already in the journal are skipped and their stored
+    rows are replayed ahead of the newly harvested ones.
+    """
+    replayed = []
+    on_staff = None
+    if journal is not None:
+        done = journal.start(resume=resume)
+        staffs = [staff for staff in staffs if str(staff["staffId"]) not in done]
+        replayed = [row for rows in done.values() for row in rows]
+        on_staff = journal.record
+    if engine == Engine.asyncio:
+        from tm.aio import run_harvest
+        data = run_harvest(
+            staffs, on_way_flag, created_date_from, created_date_to,
+            concurrency=workers, cache=cache, on_staff=on_staff,
+        )
+    else:
+        from tm.harvest import harvest_orders
+        data = harvest_orders(
+            staffs, on_way_flag, created_date_from, created_date_to,
+            workers=workers, cache=cache, on_staff=on_staff,
+        )
+    return replayed + data
+
+def _stream_harvest(engine, staffs, on_way_flag, created_date_from, created_date_to, workers, sink, cache=None, journal=None, resume=False, store=None):
+    """Like ``_harvest``, but hands each finished staff's rows to ``sink`` (and ``store``) instead of collecting them."""
+    def write(rows):
+        if store is not None:
+            store.upsert_orders(rows)
+        sink.write(rows)
+
+    done = journal.start(resume=resume) if journal is not None else {}
+    for rows in done.values():
+        write(rows)
+    staffs = [staff for staff in staffs if str(staff["staffId"]) not in done]
+
+    def on_staff(staff, rows):
+        if journal is not None:
+            journal.record(staff, rows)
+        write(rows)
+
+    if engine == Engine.asyncio:
+        from tm.aio import run_harvest
+        run_harvest(
+            staffs, on_way_flag, created_date_from, created_date_to,
+            concurrency=workers, cache=cache, on_staff=on_staff, collect=False,
+        )
+    else:
+        from tm.harvest import iter_harvest
+        # Checkpoints land as each staff finishes; the sink still gets the staff in order.
+        for _, rows in iter_harvest(
+            staffs, on_way_flag, created_date_from, created_date_to,
+            workers=workers, cache=cache, on_staff=journal.record if journal is not None else None,
+        ):
+            write(rows)
+
+def _harvest_month(engine, staffs, source, month, workers, cache=None, resume=False):
+    """Harvests one source for one calendar month, journaled as ``download-{source}-{YYYYMM}``.
+
+    Returns the rows and the journal, which the caller clears once the rows are stored.
+    """
+    created_date_from, created_date_to = _created_date_range(month, month)
+    on_way_flag = "Y" if source == Source.ongoing else "N"
+    journal = RunJournal(f"download-{source.value}-{month.strftime('%Y%m')}")
+    rows = _harvest(
+        engine, staffs, on_way_flag, created_date_from, created_date_to, workers,
+        cache=cache, journal=journal, resume=resume,
+    )
+    return rows, journal
+
+def _store_rows(store, rows, dry_run=False):
+    """Mirrors ``rows`` into the store and returns them from it as the upsert frame.
+
+    The store keeps the newest row per order_id (by updated_date), so the
+    frame has one row per order. A dry run merges into a scratch copy of the
+    affected stored rows instead, leaving the store untouched.
+    """
+    order_ids = [row["order_id"] for row in rows]
+    if dry_run:
+        from tm.store import OrderStore
+
+        with OrderStore(":memory:") as scratch:
+            scratch.upsert_orders(store.orders_frame(order_ids=order_ids).to_dict("records"))
+            scratch.upsert_orders(rows)
+            return scratch.orders_frame(order_ids=order_ids)
+    store.upsert_orders(rows)
+    return store.orders_frame(order_ids=order_ids)
+
+def _log_run_stats():
+    from gsheet.quota import log_quota_stats
+    from tm.api import log_rate_limit_stats
+
+    log_rate_limit_stats()
+    log_quota_stats()
+    report_metrics()
+
+
+def _reports_run_stats(command):
+    """Logs the run stats and metrics when ``command`` ends, whether it finished or failed."""
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        try:
+            return command(*args, **kwargs)
+        finally:
+            _log_run_stats()
+    return wrapper
+
+
+def _recent_months(count, today=None):
+    """Calendar months as ``datetime``s, newest → oldest, including the current month."""
+    today = today or datetime.now()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append(datetime(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months
+
+def _created_date_range(start, end):
+    """Portal createdDate bounds covering the whole months of ``start`` to ``end``."""
+    last_day = calendar.monthrange(end.year, end.month)[1]
+    return start.strftime("%Y%m") + "01000000", end.strftime("%Y%m") + str(last_day) + "235959"
+
+@contextmanager
+def _order_cache(enabled):
+    """Opens the order detail cache (or yields None) and logs its stats on exit."""
+    if not enabled:
+        yield None
+        return
+    with OrderDetailCache() as cache:
+        try:
+            yield cache
+        finally:
+            cache.log_stats()
+
 @app.command()
+@_reports_run_stats
 def download_data(
     source: Annotated[
         Source,
@@ -67,6 +230,35 @@ def download_data(
         str, typer.Option(help="Year and month. Example: 202506")
     ] = f"{datetime.now().strftime("%Y%m")}",
     gsheet: Annotated[bool, typer.Option(help="Use gsheet.")] = False,
+    output_format: Annotated[
+        Format,
+        typer.Option("--format", help="File format written when not using gsheet.", case_sensitive=False),
+    ] = Format.xlsx,
+    workers: Annotated[
+        int,
+        typer.Option(
+            help="Staff harvested concurrently (threads) or requests in flight (asyncio)."
+        ),
+    ] = DEFAULT_WORKERS,
+    engine: Annotated[
+        Engine,
+        typer.Option(
+            help="Harvest with a thread pool or a single asyncio event loop.",
+            case_sensitive=False
+        ),
+    ] = Engine.threads,
+    cache: Annotated[
+        bool,
+        typer.Option(help="Skip detail requests for orders whose state hasn't changed since the last run."),
+    ] = True,
+    resume: Annotated[
+        bool,
+        typer.Option(help="Continue an interrupted run, skipping staff it already finished."),
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Report how many rows and cells the sheet upsert would change, without writing."),
+    ] = False,
 ):
     if len(yearmonth) != 6:
         raise Exception("Year month must be in YYYYMM format")
@@ -76,95 +268,131 @@ def download_data(
         raise Exception("Year must be in between 2025 and 2100")
     if month < 1 or month > 12:
         raise Exception("Month must be in between 1 and 12")
+    if workers < 1:
+        raise Exception("Workers must be at least 1")
+    from gsheet.main import GSheetManager
+    from tm.api import get_all_staff
+    from tm.store import OrderStore
+
     target = datetime(year, month, 1)
-    month_range = calendar.monthrange(year, month)
-    created_date_from = target.strftime("%Y%m") + "01000000"
-    created_date_to = target.strftime("%Y%m") + str(month_range[1]) + "235959"
+    created_date_from, created_date_to = _created_date_range(target, target)
 
-    logger.info(f"Downloading data for {source.value} from {created_date_from} to {created_date_to}")
-    staffs = get_all_staff()
-    on_way_flag = "Y" if source == source.ongoing else "N"
+    with _order_cache(cache) as order_cache, OrderStore() as store:
+        logger.info(f"Downloading data for {source.value} from {created_date_from} to {created_date_to} with {workers} workers")
+        staffs = get_all_staff()
 
-    if gsheet:
-        manager = GSheetManager(sheet_range=get_orders_sheet_range())
-        all_new_data = []
-        for idx, staff in enumerate(staffs):
-            all_order = get_all_order_list(
-                staff["staffId"], on_way_flag, created_date_from, created_date_to
+        if gsheet:
+            manager = GSheetManager(sheet_range=get_orders_sheet_range())
+            all_new_data, journal = _harvest_month(
+                engine, staffs, source, target, workers, cache=order_cache, resume=resume,
             )
-            logger.info(f"Progress {idx+1}/{len(staffs)}: [{staff["staffId"]}] {staff["staffName"]} with order {len(all_order)} counts")
-            for order in all_order:
-                new_row_data = process_order(staff=staff, order=order)
-                all_new_data.append(new_row_data)
         
-        if all_new_data:
-            df_to_upsert = pd.DataFrame(all_new_data)
-            # Deduplicate by order_id, keeping the newest one if there are duplicates in the fetched data
-            if "updated_date" in df_to_upsert.columns:
-                df_to_upsert["updated_date"] = pd.to_datetime(df_to_upsert["updated_date"])
-                df_to_upsert = df_to_upsert.sort_values("updated_date").drop_duplicates("order_id", keep="last")
-            else:
-                df_to_upsert = df_to_upsert.drop_duplicates("order_id", keep="last")
-            
-            manager.upsert(df_to_upsert)
-    else:
-        data = []
-        for idx, staff in enumerate(staffs):
-            all_order = get_all_order_list(
-                staff["staffId"], on_way_flag, created_date_from, created_date_to
-            )
-            logger.info(f"Progress {idx+1}/{len(staffs)}: [{staff["staffId"]}] {staff["staffName"]} with order {len(all_order)} counts")
-            for order in all_order:
-                new_row_data = process_order(staff=staff, order=order)
-                data.append(new_row_data)
-        if len(data) == 0:
-            raise Exception("No data to copy.")
-        logger.info(f"Total Orders: {len(data)}")
-        df = pd.DataFrame(data)
-        df = df.set_index("order_id")
-        df.to_excel(f"{source.value}-{yearmonth}.xlsx")
+            if all_new_data:
+                manager.upsert(_store_rows(store, all_new_data, dry_run), changed_only=True, dry_run=dry_run)
+            if not dry_run:
+                journal.clear()
+        else:
+            on_way_flag = "Y" if source == Source.ongoing else "N"
+            journal = RunJournal(f"download-{source.value}-{yearmonth}")
+            with open_sink(output_format, f"{source.value}-{yearmonth}") as sink:
+                _stream_harvest(
+                    engine, staffs, on_way_flag, created_date_from, created_date_to, workers, sink,
+                    cache=order_cache, journal=journal, resume=resume, store=store,
+                )
+            if sink.rows_written == 0:
+                raise Exception("No data to copy.")
+            logger.info(f"Total Orders: {sink.rows_written}")
+            journal.clear()
 
 
 @app.command()
-def ongoing():
+def ongoing(
+    output_format: Annotated[
+        Format,
+        typer.Option("--format", help="File format written when not using gsheet.", case_sensitive=False),
+    ] = Format.xlsx,
+):
+    from tm.api import get_all_order_list, get_all_staff
+    from tm.utils import process_order
+
     logger.info("-------------RESULT----------------")
-    data = []
     staffs = get_all_staff()
     # staffs = filter(lambda x: x["staffId"] in [621433, 621414, 621576], staffs)
-    for idx, staff in enumerate(staffs):
-        all_order = get_all_order_list(staff["staffId"], "Y")
-
-        logger.info(idx, staff["staffId"], staff["staffName"], len(all_order))
-        for order in all_order:
-            datapoint = process_order(staff=staff, order=order)
-            data.append(datapoint)
+    with open_sink(output_format, "ongoing") as sink:
+        for idx, staff in enumerate(staffs):
+            all_order = get_all_order_list(staff["staffId"], "Y")
 
-    df = pd.DataFrame(data)
-    df = df.set_index("order_id")
-    df.to_excel("ongoing.xlsx")
+            logger.info(f"{idx}, {staff["staffId"]}, {staff["staffName"]}, {len(all_order)}")
+            sink.write([process_order(staff=staff, order=order) for order in all_order])
 
 
 @app.command()
-def run_all():
-    """Run download-data for the past 3 months (including current month) for both historical and ongoing sources with gsheet."""
+@_reports_run_stats
+def run_all(
+    workers: Annotated[
+        int,
+        typer.Option(
+            help="Staff harvested concurrently (threads) or requests in flight (asyncio)."
+        ),
+    ] = DEFAULT_WORKERS,
+    engine: Annotated[
+        Engine,
+        typer.Option(
+            help="Harvest with a thread pool or a single asyncio event loop.",
+            case_sensitive=False
+        ),
+    ] = Engine.threads,
+    cache: Annotated[
+        bool,
+        typer.Option(help="Skip detail requests for orders whose state hasn't changed since the last run."),
+    ] = True,
+    resume: Annotated[
+        bool,
+        typer.Option(help="Continue an interrupted run, skipping staff it already finished."),
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Report how many rows and cells the sheet upsert would change, without writing."),
+    ] = False,
+):
+    """Download the past 3 months (including current month) for both historical and ongoing sources into gsheet.
+
+    Runs as one pipeline: the staff list is fetched once, every month/source
+    is harvested, rows are deduplicated across all of them, and the sheet is
+    written by a single upsert.
+    """
+    from gsheet.main import GSheetManager
+    from tm.api import get_all_staff
+    from tm.store import OrderStore
+
     logger.info("Starting run_all process...")
+    if workers < 1:
+        raise Exception("Workers must be at least 1")
     
     # Generate months newest → oldest (including current month)
-    months = []
-    for i in range(3):
-        months.append(datetime.now() - timedelta(days=30*i))
+    months = _recent_months(3)
     
     try:
-        for date in months:
-            year_month = date.strftime("%Y%m")
-            
-            # Run HISTORICAL
-            logger.info(f"Running HISTORICAL for {year_month}...")
-            download_data(source=Source.historical, yearmonth=year_month, gsheet=True)
-            
-            # Run ONGOING
-            logger.info(f"Running ONGOING for {year_month}...")
-            download_data(source=Source.ongoing, yearmonth=year_month, gsheet=True)
+        with _order_cache(cache) as order_cache, OrderStore() as store:
+            staffs = get_all_staff()
+            rows = []
+            journals = []
+            for date in months:
+                for source in (Source.historical, Source.ongoing):
+                    logger.info(f"Harvesting {source.value.upper()} for {date.strftime('%Y%m')}...")
+                    month_rows, journal = _harvest_month(
+                        engine, staffs, source, date, workers, cache=order_cache, resume=resume,
+                    )
+                    rows.extend(month_rows)
+                    journals.append(journal)
+
+            logger.info(f"Harvested {len(rows)} rows across {len(journals)} month/source runs")
+            if rows:
+                manager = GSheetManager(sheet_range=get_orders_sheet_range())
+                manager.upsert(_store_rows(store, rows, dry_run), changed_only=True, dry_run=dry_run)
+            if not dry_run:
+                for journal in journals:
+                    journal.clear()
         
         logger.info("All months completed successfully.")
     except Exception as ex:
@@ -173,8 +401,89 @@ def run_all():
 
 
 @app.command()
-def sync_cases():
+@_reports_run_stats
+def sync(
+    months: Annotated[
+        int, typer.Option(help="Number of calendar months (including the current one) to watch.")
+    ] = 3,
+    workers: Annotated[
+        int, typer.Option(help="Number of staff harvested concurrently.")
+    ] = DEFAULT_WORKERS,
+    cache: Annotated[
+        bool,
+        typer.Option(help="Skip detail requests for orders whose state hasn't changed since the last run."),
+    ] = True,
+    full: Annotated[
+        bool, typer.Option(help="Ignore stored high-water marks and re-sync every order.")
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Report how many rows and cells the sheet upsert would change, without writing."),
+    ] = False,
+):
+    """Incrementally sync orders whose stateDate moved since the last sync to the orders sheet."""
+    from gsheet.main import GSheetManager
+    from tm.api import get_all_staff
+    from tm.harvest import iter_harvest
+    from tm.store import OrderStore
+
+    if months < 1:
+        raise Exception("Months must be at least 1")
+    window = _recent_months(months)
+    created_date_from, created_date_to = _created_date_range(window[-1], window[0])
+    logger.info(f"Syncing changed orders created from {created_date_from} to {created_date_to}")
+
+    staffs = get_all_staff()
+    with WatermarkStore() as watermarks, _order_cache(cache) as order_cache, OrderStore() as store:
+        if full and not dry_run:
+            watermarks.reset()
+        changed_rows = []
+        pending_marks = {}
+        for source in (Source.historical, Source.ongoing):
+            on_way_flag = "Y" if source == Source.ongoing else "N"
+            since = {} if full else watermarks.get_all(source.value)
+            for staff, rows in iter_harvest(
+                staffs, on_way_flag, created_date_from, created_date_to,
+                workers=workers, cache=order_cache, since=since,
+            ):
+                changed_rows.extend(rows)
+                collect_marks(source.value, staff, rows, pending_marks)
+            logger.info(f"{source.value}: {len(changed_rows)} changed orders so far")
+
+        if changed_rows:
+            manager = GSheetManager(sheet_range=get_orders_sheet_range())
+            manager.upsert(_store_rows(store, changed_rows, dry_run), changed_only=True, dry_run=dry_run)
+        else:
+            logger.info("No changed orders since the last sync.")
+        # Only advance once the rows are safely in the sheet.
+        if not dry_run:
+            watermarks.advance(pending_marks)
+
+
+@app.command()
+@_reports_run_stats
+def sync_cases(
+    workers: Annotated[
+        int, typer.Option(help="Number of cases fetched concurrently.")
+    ] = DEFAULT_WORKERS,
+    batch_size: Annotated[
+        int, typer.Option(help="Write progress to the sheet every N fetched cases.")
+    ] = 100,
+    include_terminal: Annotated[
+        bool,
+        typer.Option(help="Also refetch cases whose status is already terminal (CASE_TERMINAL_STATUSES)."),
+    ] = False,
+):
     """Sync case status and troika id from TM API to 'CASE ID' sheet."""
+    import pandas as pd
+    from gsheet.main import GSheetManager
+    from tm.cases import is_terminal, iter_case_updates
+    from tm.store import OrderStore
+
+    if workers < 1:
+        raise Exception("Workers must be at least 1")
+    if batch_size < 1:
+        raise Exception("Batch size must be at least 1")
     manager = GSheetManager(
         sheet_range=get_case_ids_sheet_range(),
         key_column="case id"
@@ -195,40 +504,112 @@ def sync_cases():
         logger.error("Column 'case id' not found in sheet.")
         return
 
-    # 3. Process each row
-    updated_rows = []
-    for _, row in df.iterrows():
-        case_id = str(row[case_id_col]).strip()
-        if not case_id or case_id.lower() == "nan" or case_id == "":
-            continue
-            
-        try:
-            logger.info(f"Syncing case ID: {case_id}")
-            response = get_case_detail({"caseId": case_id})
-            case_data = response.json().get("data", {}).get("caseDto", {})
-            
-            row_update = {
-                case_id_col: case_id,
-                status_col: case_data.get("caseStateName", ""),
-                troika_id_col: case_data.get("extMap", {}).get("troikaId", "")
-            }
-            updated_rows.append(row_update)
-            
-        except Exception as e:
-            logger.error(f"Failed to sync case {case_id}: {e}")
-            continue
-
-    # 4. Upsert updates
-    if updated_rows:
-        df_updates = pd.DataFrame(updated_rows)
-        manager.upsert(df_updates)
-        logger.info(f"Successfully synced {len(updated_rows)} cases.")
+    # 3. Pick the cases to fetch
+    case_ids = df[case_id_col].astype(str).str.strip()
+    wanted = case_ids.ne("") & case_ids.str.lower().ne("nan")
+    if not include_terminal and status_col in df.columns:
+        terminal_statuses = get_case_terminal_statuses()
+        terminal = df[status_col].map(lambda status: is_terminal(status, terminal_statuses))
+        logger.info(f"Skipping {int((wanted & terminal).sum())} cases with a terminal status.")
+        wanted &= ~terminal
+    case_ids = list(dict.fromkeys(case_ids[wanted]))
+    logger.info(f"Syncing {len(case_ids)} cases with {workers} workers")
+
+    # 4. Fetch concurrently, upserting every batch_size cases so a late failure keeps earlier progress
+    def flush(batch):
+        store.record_cases(batch)
+        manager.upsert(
+            pd.DataFrame(batch, columns=[case_id_col, status_col, troika_id_col]), changed_only=True
+        )
+
+    batch = []
+    synced = 0
+    with OrderStore() as store:
+        for update in iter_case_updates(case_ids, workers=workers):
+            batch.append(update)
+            if len(batch) >= batch_size:
+                flush(batch)
+                synced += len(batch)
+                batch = []
+        if batch:
+            flush(batch)
+            synced += len(batch)
+
+    if synced:
+        logger.info(f"Successfully synced {synced} cases.")
     else:
         logger.info("No updates to perform.")
 
 
 @app.command()
-def historical(year: int, month: int):
+@_reports_run_stats
+def export(
+    yearmonth: Annotated[
+        str, typer.Option(help="Only orders created in this month (YYYYMM). Default: every stored order.")
+    ] = "",
+    output_format: Annotated[
+        Format,
+        typer.Option("--format", help="File format written when not using gsheet.", case_sensitive=False),
+    ] = Format.xlsx,
+    gsheet: Annotated[bool, typer.Option(help="Upsert the stored orders to gsheet instead of a file.")] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Report how many rows and cells the sheet upsert would change, without writing."),
+    ] = False,
+):
+    """Export orders from the local store to a file or the orders sheet, without touching the portal."""
+    from tm.store import OrderStore
+
+    created_date_from = created_date_to = None
+    if yearmonth:
+        if len(yearmonth) != 6:
+            raise Exception("Year month must be in YYYYMM format")
+        target = datetime(int(yearmonth[0:4]), int(yearmonth[4:6]), 1)
+        last_day = calendar.monthrange(target.year, target.month)[1]
+        created_date_from = target.strftime("%Y-%m-01 00:00:00")
+        created_date_to = target.strftime(f"%Y-%m-{last_day:02d} 23:59:59")
+
+    with OrderStore() as store:
+        if gsheet:
+            df = store.orders_frame(created_from=created_date_from, created_to=created_date_to)
+            if df.empty:
+                raise Exception("No stored orders to export.")
+            from gsheet.main import GSheetManager
+            manager = GSheetManager(sheet_range=get_orders_sheet_range())
+            manager.upsert(df, changed_only=True, dry_run=dry_run)
+            return
+        with open_sink(output_format, f"orders-{yearmonth or 'all'}") as sink:
+            for rows in store.iter_orders(created_from=created_date_from, created_to=created_date_to):
+                sink.write(rows)
+    if sink.rows_written == 0:
+        raise Exception("No stored orders to export.")
+
+
+@app.command()
+def report():
+    """Print stored order counts per staff per created month."""
+    from tm.store import OrderStore
+
+    with OrderStore() as store:
+        df = store.orders_per_staff_month()
+    if df.empty:
+        logger.info("No stored orders yet.")
+        return
+    typer.echo(df.to_string(index=False))
+
+
+@app.command()
+def historical(
+    year: int,
+    month: int,
+    output_format: Annotated[
+        Format,
+        typer.Option("--format", help="File format written when not using gsheet.", case_sensitive=False),
+    ] = Format.xlsx,
+):
+    from tm.api import get_all_order_list, get_all_staff
+    from tm.utils import process_order
+
     logger.info("-------------RESULT----------------")
     if year < 2025 or year > 2100:
         raise Exception("Year must be in between 2025 and 2100")
@@ -240,26 +621,19 @@ def historical(year: int, month: int):
     # createdDateTo = datetime.today().strftime("%Y%m%d%H%M%S")
     createdDateTo = target.strftime("%Y%m") + str(month_range[1]) + "235959"
     logger.info(f"{createdDateFrom} -> {createdDateTo}")
-    data = []
     staffs = get_all_staff()
     # staffs = filter(lambda x: x["staffId"] in [621394], staffs)
-    for idx, staff in enumerate(staffs):
-        # if staff["staffId"] != 634795:
-        #     continue
-
-        all_order = get_all_order_list(
-            staff["staffId"], "N", createdDateFrom, createdDateTo
-        )
-
-        logger.info(f"{idx}, {staff["staffId"]}, {staff["staffName"]}, {len(all_order)}")
+    with open_sink(output_format, "historical") as sink:
+        for idx, staff in enumerate(staffs):
+            # if staff["staffId"] != 634795:
+            #     continue
 
-        for order in all_order:
-            datapoint = process_order(staff=staff, order=order)
-            data.append(datapoint)
+            all_order = get_all_order_list(
+                staff["staffId"], "N", createdDateFrom, createdDateTo
+            )
 
-    df = pd.DataFrame(data)
-    df = df.set_index("order_id")
-    df.to_excel("historical.xlsx")
+            logger.info(f"{idx}, {staff["staffId"]}, {staff["staffName"]}, {len(all_order)}")
+            sink.write([process_order(staff=staff, order=order) for order in all_order])
 
 
 if __name__ == "__main__":
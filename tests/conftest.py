@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def fast_limits():
+    """Lifts the shared portal rate limits so tests don't wait on them, with a fresh retry budget."""
+    from tm import api
+
+    limiters = [api.staff_limiter, api.order_list_limiter, api.order_detail_limiter, api.case_detail_limiter]
+    rates = [limiter.rate for limiter in limiters]
+    for limiter in limiters:
+        limiter.set_rate(100_000)
+    api.retry_budget.reset()
+    yield
+    for limiter, rate in zip(limiters, rates):
+        limiter.set_rate(rate)
+    api.retry_budget.reset()
+
+
+@pytest.fixture(autouse=True)
+def sheets_scheduler():
+    """A fresh Sheets quota scheduler per test, so calls from earlier tests don't use up its window."""
+    from gsheet.quota import SheetsScheduler, set_scheduler
+
+    scheduler = SheetsScheduler(reads_per_minute=100_000, writes_per_minute=100_000)
+    set_scheduler(scheduler)
+    yield scheduler
+    set_scheduler(None)
@@ -0,0 +1,133 @@
+"""In-memory stand-in for the Sheets ``spreadsheets()`` resource used by tests and benchmarks.
+
+Implements the slice of the values API that ``GSheetManager`` calls:
+``values().get``, ``values().batchUpdate`` and ``values().append``, each
+returning a request object with ``execute()``. Ranges are A1 notation with
+an optional ``Sheet!`` prefix (``1:1``, ``A:A``, ``A2:A3``, ``B5:D5``, ``A:Z``
+or a bare sheet name). Like the real API, ``get`` drops trailing empty
+cells and rows, and ``append`` answers with ``updates.updatedRange``.
+"""
+import re
+import threading
+
+from gsheet.planner import column_letter
+
+_CELL = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _column_index(letters):
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
+
+
+def parse_range(a1):
+    """``"Sheet!B2:D5"`` -> ``("Sheet", row0, col0, row1, col1)``, 0-based and inclusive; None is open-ended."""
+    sheet, _, cells = a1.rpartition("!") if "!" in a1 else ("", "", a1)
+    if not _CELL.match(cells.split(":")[0]) or not cells:
+        return a1, 0, 0, None, None  # a bare sheet name
+    start, _, end = cells.partition(":")
+    end = end or start
+    (c0, r0), (c1, r1) = _CELL.match(start).groups(), _CELL.match(end).groups()
+    return (
+        sheet,
+        int(r0) - 1 if r0 else 0,
+        _column_index(c0) if c0 else 0,
+        int(r1) - 1 if r1 else None,
+        _column_index(c1) if c1 else None,
+    )
+
+
+class _Request:
+    def __init__(self, call):
+        self._call = call
+
+    def execute(self):
+        return self._call()
+
+
+class FakeSheets:
+    """Holds every sheet as a list of rows and counts the calls made to it.
+
+    Args:
+        sheets: Initial ``{sheet name: rows}``
+    """
+
+    def __init__(self, sheets=None):
+        self.sheets = {name: [list(row) for row in rows] for name, rows in (sheets or {}).items()}
+        self.calls = {"get": 0, "batchUpdate": 0, "append": 0}
+        self.cells_written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def values(self):
+        return self
+
+    def rows(self, sheet):
+        return self.sheets.setdefault(sheet, [])
+
+    def get(self, spreadsheetId, range):
+        return _Request(lambda: self._get(range))
+
+    def batchUpdate(self, spreadsheetId, body):
+        return _Request(lambda: self._batch_update(body))
+
+    def append(self, spreadsheetId, range, valueInputOption, body):
+        return _Request(lambda: self._append(range, body))
+
+    def _get(self, a1):
+        with self._lock:
+            self.calls["get"] += 1
+            sheet, r0, c0, r1, c1 = parse_range(a1)
+            rows = self.rows(sheet)
+            values = []
+            for row in rows[r0:None if r1 is None else r1 + 1]:
+                cells = row[c0:None if c1 is None else c1 + 1]
+                while cells and cells[-1] == "":
+                    cells = cells[:-1]
+                values.append(cells)
+            while values and not values[-1]:
+                values.pop()
+        return {"range": a1, "values": values} if values else {"range": a1}
+
+    def _write(self, sheet, r0, c0, values):
+        rows = self.rows(sheet)
+        for offset, cells in enumerate(values):
+            while len(rows) <= r0 + offset:
+                rows.append([])
+            row = rows[r0 + offset]
+            if len(row) < c0 + len(cells):
+                row.extend([""] * (c0 + len(cells) - len(row)))
+            row[c0:c0 + len(cells)] = [str(cell) for cell in cells]
+            self.cells_written += len(cells)
+
+    def _batch_update(self, body):
+        with self._lock:
+            self.calls["batchUpdate"] += 1
+            for data in body["data"]:
+                sheet, r0, c0, _, _ = parse_range(data["range"])
+                self._write(sheet, r0, c0, data["values"])
+        return {"totalUpdatedCells": sum(len(cells) for d in body["data"] for cells in d["values"])}
+
+    def _append(self, a1, body):
+        with self._lock:
+            self.calls["append"] += 1
+            sheet, _, _, _, _ = parse_range(a1)
+            rows = self.rows(sheet)
+            while rows and not any(rows[-1]):
+                rows.pop()
+            first = len(rows)
+            values = body["values"]
+            self._write(sheet, first, 0, values)
+            width = max((len(cells) for cells in values), default=1)
+        prefix = f"{sheet}!" if sheet else ""
+        return {
+            "updates": {
+                "updatedRange": f"{prefix}A{first + 1}:{column_letter(width - 1)}{first + len(values)}",
+                "updatedRows": len(values),
+            }
+        }
@@ -0,0 +1,200 @@
+"""Local stand-in for the TM portal used by tests and benchmarks.
+
+Serves ``qryStaffList``, ``getCeeOrderList``, ``getCeeOrderDetail`` and
+``getCaseDetail`` over real HTTP on 127.0.0.1, with response bodies built
+from the samples in ``docs/``. Latency, a portal-side rate limit (answered
+with 429) and random 500s can be switched on to exercise client back-off.
+"""
+import copy
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
+API_PREFIX = "/portal/esales/api"
+
+
+def load_sample(name):
+    with open(DOCS_DIR / f"{name}.response.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 stalls concurrent clients
+
+
+class StubPortal:
+    """Threaded HTTP server that answers like the TM portal.
+
+    Args:
+        staff_count: Number of staff returned by qryStaffList
+        orders_per_staff: Number of orders returned for each staff
+        latency: Seconds slept before answering every request
+        rate_limit: Requests per second accepted before answering 429 (default: unlimited)
+        error_rate: Fraction of requests answered with a 500
+        fault_paths: Paths the rate limit and errors apply to (default: all)
+        retry_after: Seconds sent in the ``Retry-After`` header of 429 answers (default: none)
+        case_states: caseStateName values handed out to cases in turn
+        seed: Seed for the error injection
+    """
+
+    def __init__(self, staff_count=3, orders_per_staff=5, latency=0.0, rate_limit=None, error_rate=0.0,
+                 fault_paths=None, retry_after=None, case_states=("In Progress",), seed=0):
+        self.staff_count = staff_count
+        self.orders_per_staff = orders_per_staff
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.fault_paths = fault_paths
+        self.retry_after = retry_after
+        self.case_states = case_states
+        self.calls = {}
+        self.throttled = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._tokens = rate_limit or 0.0
+        self._refilled_at = time.monotonic()
+        self._staff_template = load_sample("qryStaffList")["data"][0]
+        self._order_template = load_sample("getCeeOrderList")["data"][0]
+        self._detail = load_sample("getCeeOrderDetail")
+        self._case = load_sample("getCaseDetail")
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real portal
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body = portal.handle(self.path.removeprefix(API_PREFIX), payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if status == 429 and portal.retry_after is not None:
+                    self.send_header("Retry-After", str(portal.retry_after))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with portal._lock:
+                    portal.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- request handling ---
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def _admit(self):
+        """Token bucket of ``rate_limit`` requests per second (burst of one second's worth)."""
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def handle(self, path, payload):
+        with self._lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+            faulty = self.fault_paths is None or path in self.fault_paths
+            if faulty and self.rate_limit and not self._admit():
+                self.throttled += 1
+                return 429, b'{"code": "429", "message": "Too Many Requests"}'
+            if faulty and self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 500, b'{"code": "500", "message": "Injected error"}'
+        if self.latency:
+            time.sleep(self.latency)
+        if path == "/saleschannel/qryStaffList":
+            return 200, self._page(self._staff_rows(), payload)
+        if path == "/cee/order/v2/getCeeOrderList":
+            return 200, self._page(self._order_rows(payload.get("partyCodes")), payload)
+        if path == "/cee/order/v2/getCeeOrderDetail":
+            return 200, self._order_detail(payload.get("custOrderId"))
+        if path == "/csc/getCaseDetail":
+            return 200, self._case_detail(payload.get("caseId"))
+        return 404, b'{"code": "404"}'
+
+    def _staff_rows(self):
+        rows = []
+        for i in range(self.staff_count):
+            staff = dict(self._staff_template)
+            staff.update({
+                "staffId": 600000 + i,
+                "partyId": 600000 + i,
+                "staffCode": f"TMRA{i:05d}",
+                "staffName": f"STAFF {i}",
+            })
+            rows.append(staff)
+        return rows
+
+    def _order_rows(self, staff_id):
+        rows = []
+        for n in range(self.orders_per_staff):
+            order = dict(self._order_template)
+            order_id = int(f"{staff_id}{n:06d}")
+            order.update({"orderId": order_id, "orderNbr": str(order_id)})
+            rows.append(order)
+        return rows
+
+    def _order_detail(self, order_id):
+        detail = copy.copy(self._detail)
+        detail["data"] = dict(detail["data"], orderId=order_id, orderNbr=str(order_id))
+        return json.dumps(detail).encode("utf-8")
+
+    def _case_detail(self, case_id):
+        case = copy.copy(self._case)
+        state = self.case_states[int(case_id) % len(self.case_states)] if str(case_id).isdigit() else self.case_states[0]
+        case_dto = dict(case["data"]["caseDto"], caseId=case_id, caseCode=str(case_id), caseStateName=state)
+        case_dto["extMap"] = dict(case_dto.get("extMap") or {}, troikaId=f"NJ-1-{case_id}")
+        case["data"] = dict(case["data"], caseDto=case_dto)
+        return json.dumps(case).encode("utf-8")
+
+    def _page(self, rows, payload):
+        page_size = int(payload.get("pageSize", 10))
+        page_num = int(payload.get("pageNum", 1))
+        start = (page_num - 1) * page_size
+        return json.dumps({
+            "code": "200",
+            "message": "Success",
+            "total": len(rows),
+            "pageSize": page_size,
+            "pageNum": page_num,
+            "data": rows[start:start + page_size],
+        }).encode("utf-8")
@@ -0,0 +1,299 @@
+"""Throughput of the CLI commands against the stub portal and the fake Sheets API.
+
+Each benchmark logs orders (or cases, or rows) per second, portal calls per
+order and Sheets calls per run. Sizes come from BENCH_ORDERS, a comma
+separated list (default "1000"); e.g. ``BENCH_ORDERS=1000,10000,100000
+pytest -m benchmark tests/test_benchmarks.py --log-cli-level=INFO``.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from tests.fake_sheets import FakeSheets, parse_range
+from tests.stub_portal import StubPortal
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+STAFF_LIST = "/saleschannel/qryStaffList"
+ORDER_LIST = "/cee/order/v2/getCeeOrderList"
+ORDER_DETAIL = "/cee/order/v2/getCeeOrderDetail"
+CASE_DETAIL = "/csc/getCaseDetail"
+DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
+
+
+def _sizes():
+    return [int(size) for size in os.getenv("BENCH_ORDERS", "1000").split(",") if size.strip()]
+
+
+# --- helpers ---
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    """Keeps the caches, store and journals of a run inside tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    monkeypatch.setenv("ORDER_CACHE_PATH", str(tmp_path / "order_details.sqlite3"))
+    monkeypatch.setenv("SYNC_STATE_PATH", str(tmp_path / "sync_state.sqlite3"))
+    monkeypatch.setenv("RUN_JOURNAL_DIR", str(tmp_path / "journal"))
+    return tmp_path
+
+
+@contextmanager
+def _serving(portal, sheets):
+    """Points the TM client at ``portal`` and every GSheetManager at ``sheets``; retries don't sleep."""
+    from tm import api
+    from tm.api import TMClient
+
+    previous = api._client
+    client = TMClient(cookie="c", base_url=portal.base_url)
+    api.set_client(client)
+    try:
+        with patch("gsheet.main._get_sheets_service", return_value=sheets), \
+             patch("common.decorators.time.sleep"):
+            yield
+    finally:
+        api.set_client(previous)
+        client.close()
+
+
+def _order_sheet():
+    from tm.flatten import COLUMNS
+
+    return FakeSheets({"COPYORDER_CONT": [list(COLUMNS)]})
+
+
+def _case_sheet(n):
+    rows = [["Case ID", "Status", "Troika ID"]] + [[str(100000 + i), "", ""] for i in range(n)]
+    return FakeSheets({"CASE ID": rows})
+
+
+def _portal_for(orders, **kwargs):
+    staff_count = max(1, orders // 100)
+    return StubPortal(staff_count=staff_count, orders_per_staff=orders // staff_count, **kwargs)
+
+
+def _report(name, count, unit, elapsed, portal=None, sheets=None):
+    parts = [f"{name}: {count} {unit} in {elapsed:.3f}s ({count / elapsed:.0f} {unit}/s)"]
+    if portal is not None:
+        parts.append(f"{portal.total_calls / count:.2f} portal calls per {unit[:-1]}")
+    if sheets is not None:
+        parts.append(f"{sheets.total_calls} sheets calls ({sheets.calls})")
+    logger.info(", ".join(parts))
+
+
+def _download(**kwargs):
+    from common.sinks import Format
+    from main import DEFAULT_WORKERS, Engine, Source, download_data
+
+    options = dict(
+        source=Source.ongoing, yearmonth="202601", gsheet=True, output_format=Format.csv,
+        workers=DEFAULT_WORKERS, engine=Engine.threads, cache=True, resume=False, dry_run=False,
+    )
+    options.update(kwargs)
+    download_data(**options)
+
+
+# --- the fakes themselves ---
+
+
+def test_parse_range():
+    assert parse_range("Sheet!1:1") == ("Sheet", 0, 0, 0, None)
+    assert parse_range("CASE ID!A:D") == ("CASE ID", 0, 0, None, 3)
+    assert parse_range("B5:D6") == ("", 4, 1, 5, 3)
+    assert parse_range("Sheet!A1") == ("Sheet", 0, 0, 0, 0)
+
+
+def test_fake_sheets_round_trip():
+    sheets = FakeSheets({"Orders": [["id", "a", "b"], ["1", "x", ""]]})
+
+    response = sheets.values().append(
+        spreadsheetId="id", range="Orders!A1", valueInputOption="RAW", body={"values": [["2", "y"]]}
+    ).execute()
+    sheets.values().batchUpdate(
+        spreadsheetId="id", body={"data": [{"range": "Orders!B2:C2", "values": [["X", "Z"]]}], "valueInputOption": "RAW"}
+    ).execute()
+
+    assert response["updates"]["updatedRange"] == "Orders!A3:B3"
+    assert sheets.values().get(spreadsheetId="id", range="Orders!A:A").execute()["values"] == [["id"], ["1"], ["2"]]
+    assert sheets.values().get(spreadsheetId="id", range="Orders").execute()["values"] == [
+        ["id", "a", "b"], ["1", "X", "Z"], ["2", "y"],
+    ]
+    assert "values" not in sheets.values().get(spreadsheetId="id", range="Orders!A4:A5").execute()
+    assert sheets.calls == {"get": 3, "batchUpdate": 1, "append": 1}
+
+
+def test_stub_portal_throttles_and_injects_errors():
+    import requests
+
+    with StubPortal(rate_limit=2, error_rate=0.5, fault_paths={CASE_DETAIL}) as portal:
+        statuses = [
+            requests.post(f"{portal.base_url}{CASE_DETAIL}", json={"caseId": "1"}).status_code
+            for _ in range(10)
+        ]
+        staff = requests.post(f"{portal.base_url}/saleschannel/qryStaffList", json={})
+
+    assert staff.status_code == 200
+    assert statuses.count(429) == portal.throttled >= 7
+    assert 500 in statuses or portal.errors == 0
+    assert statuses.count(200) + portal.throttled + portal.errors == 10
+
+
+def test_download_data_survives_portal_errors(isolated, fast_limits):
+    sheets = _order_sheet()
+    with _portal_for(50, error_rate=0.2, fault_paths={ORDER_DETAIL}) as portal, _serving(portal, sheets):
+        _download()
+
+    assert portal.errors > 0
+    assert len(sheets.rows("COPYORDER_CONT")) == 51
+
+
+def test_download_data_retries_staff_and_order_list_pages(isolated, fast_limits):
+    sheets = _order_sheet()
+    with _portal_for(300, error_rate=0.3, fault_paths={STAFF_LIST, ORDER_LIST}) as portal, _serving(portal, sheets):
+        _download()
+
+    assert portal.errors > 0
+    assert len(sheets.rows("COPYORDER_CONT")) == 301
+
+
+def test_sync_cases_survives_portal_throttling(isolated, fast_limits):
+    from main import sync_cases
+
+    sheets = _case_sheet(20)
+    with StubPortal(rate_limit=50, fault_paths={CASE_DETAIL}, case_states=("In Progress", "Closed")) as portal, \
+         _serving(portal, sheets):
+        sync_cases(workers=8, batch_size=5, include_terminal=False)
+
+    rows = sheets.rows("CASE ID")[1:]
+    assert all(status for _, status, _ in rows)
+    assert rows[0] == ["100000", "In Progress", "NJ-1-100000"]
+
+
+def test_portal_throttling_backs_off_the_detail_rate(isolated, fast_limits):
+    from tm import api
+
+    sheets = _order_sheet()
+    with _portal_for(300, rate_limit=100, retry_after=0, fault_paths={ORDER_DETAIL}) as portal, \
+         _serving(portal, sheets):
+        _download(workers=8)
+
+    assert portal.throttled > 0
+    assert api.adaptive_rates["getCeeOrderDetail"].decreases > 0
+    assert api.order_detail_limiter.rate < 100_000
+    assert len(sheets.rows("COPYORDER_CONT")) == 301
+
+
+# --- benchmarks ---
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("orders", _sizes())
+def test_benchmark_download_data(orders, isolated, fast_limits):
+    sheets = _order_sheet()
+    with _portal_for(orders) as portal, _serving(portal, sheets):
+        started = time.perf_counter()
+        _download()
+        _report("download-data (cold)", orders, "orders", time.perf_counter() - started, portal, sheets)
+
+        portal.calls.clear()
+        sheets.calls = dict.fromkeys(sheets.calls, 0)
+        started = time.perf_counter()
+        _download()
+        _report("download-data (warm cache)", orders, "orders", time.perf_counter() - started, portal, sheets)
+
+    assert len(sheets.rows("COPYORDER_CONT")) == orders + 1
+    assert ORDER_DETAIL not in portal.calls  # nothing changed, so the cache answered every detail
+    assert sheets.calls["batchUpdate"] == sheets.calls["append"] == 0
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("cases", _sizes())
+def test_benchmark_sync_cases(cases, isolated, fast_limits):
+    from main import sync_cases
+
+    sheets = _case_sheet(cases)
+    with StubPortal(case_states=("In Progress", "Closed")) as portal, _serving(portal, sheets):
+        started = time.perf_counter()
+        sync_cases(workers=16, batch_size=max(100, cases // 10), include_terminal=False)
+        _report("sync-cases", cases, "cases", time.perf_counter() - started, portal, sheets)
+
+        portal.calls.clear()
+        started = time.perf_counter()
+        sync_cases(workers=16, batch_size=max(100, cases // 10), include_terminal=False)
+        _report("sync-cases (again)", cases, "cases", time.perf_counter() - started, portal)
+
+    assert portal.calls[CASE_DETAIL] == (cases + 1) // 2  # closed cases are skipped the second time
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("orders", _sizes())
+def test_benchmark_upsert(orders):
+    from gsheet.main import GSheetManager
+    from tm.flatten import COLUMNS
+
+    def frame(status):
+        return pd.DataFrame([
+            {column: f"{column} {i}" for column in COLUMNS} | {"order_id": str(i), "status": status}
+            for i in range(orders)
+        ])
+
+    existing = frame("Pending").iloc[: orders // 2].values.tolist()
+    sheets = FakeSheets({"COPYORDER_CONT": [list(COLUMNS)] + existing})
+    df = frame("Completed")
+    df.loc[df.index % 10 != 0, "status"] = "Pending"  # one existing row in ten changes
+
+    with patch("gsheet.main._get_sheets_service", return_value=sheets):
+        manager = GSheetManager(sheet_range="COPYORDER_CONT!A:Z", spreadsheet_id="id")
+        started = time.perf_counter()
+        plan = manager.upsert(df, changed_only=True)
+        _report("upsert", orders, "rows", time.perf_counter() - started, sheets=sheets)
+
+        sheets.calls = dict.fromkeys(sheets.calls, 0)
+        started = time.perf_counter()
+        again = manager.upsert(df, changed_only=True)
+        _report("upsert (unchanged)", orders, "rows", time.perf_counter() - started, sheets=sheets)
+
+    assert plan.rows_updated == len(existing[::10])
+    assert plan.summary()["rows_appended"] == orders - len(existing)
+    assert again.updates == again.appends == []
+    assert sheets.total_calls == 0
+    assert len(sheets.rows("COPYORDER_CONT")) == orders + 1
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("orders", _sizes())
+def test_benchmark_decode_order_detail(orders):
+    import tracemalloc
+    from tm.models import OrderDetailResponse, decode
+
+    body = (DOCS_DIR / "getCeeOrderDetail.response.json").read_bytes()
+    decoders = {
+        "full json()": lambda: json.loads(body)["data"],
+        "typed": lambda: decode(OrderDetailResponse, body)["data"],
+    }
+
+    retained = {}
+    for name, decode_one in decoders.items():
+        started = time.process_time()
+        for _ in range(orders):
+            decode_one()
+        cpu = (time.process_time() - started) / orders
+        tracemalloc.start()
+        kept = [decode_one() for _ in range(100)]
+        retained[name] = tracemalloc.get_traced_memory()[0] / len(kept)
+        tracemalloc.stop()
+        logger.info(
+            f"decode getCeeOrderDetail ({name}): {cpu * 1e6:.0f} us CPU, {retained[name] / 1024:.1f} KB kept per order"
+        )
+
+    assert retained["typed"] < retained["full json()"] / 4
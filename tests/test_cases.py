@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _case_response(state, troika_id="NJ-1"):
+    response = MagicMock()
+    response.content = json.dumps(
+        {"data": {"caseDto": {"caseStateName": state, "extMap": {"troikaId": troika_id}}}}
+    ).encode()
+    return response
+
+
+# --- is_terminal ---
+
+
+def test_is_terminal_is_case_insensitive():
+    from tm.cases import is_terminal
+
+    assert is_terminal("Closed", {"closed"})
+    assert is_terminal(" CANCELLED ", {"cancelled"})
+    assert not is_terminal("In Progress", {"closed"})
+    assert not is_terminal(None, {"closed"})
+
+
+def test_is_terminal_reads_statuses_from_env(monkeypatch):
+    from tm.cases import is_terminal
+
+    monkeypatch.setenv("CASE_TERMINAL_STATUSES", "Done, Rejected")
+
+    assert is_terminal("rejected")
+    assert not is_terminal("Closed")
+
+
+# --- iter_case_updates ---
+
+
+def test_iter_case_updates_yields_in_input_order():
+    from tm.cases import iter_case_updates
+
+    def fake_detail(data):
+        return _case_response(f"STATE {data['caseId']}", f"T{data['caseId']}")
+
+    with patch("tm.cases.get_case_detail", side_effect=fake_detail):
+        updates = list(iter_case_updates([str(i) for i in range(20)], workers=5))
+
+    assert updates == [(str(i), f"STATE {i}", f"T{i}") for i in range(20)]
+
+
+def test_iter_case_updates_skips_failed_cases(caplog):
+    from tm.cases import iter_case_updates
+
+    def fake_detail(data):
+        if data["caseId"] == "2":
+            raise RuntimeError("boom")
+        return _case_response("Open")
+
+    with patch("tm.cases.get_case_detail", side_effect=fake_detail):
+        updates = list(iter_case_updates(["1", "2", "3"], workers=2))
+
+    assert [case_id for case_id, _, _ in updates] == ["1", "3"]
+    assert "Failed to sync case 2" in caplog.text
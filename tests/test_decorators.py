@@ -10,10 +10,10 @@ def _make_retry(exceptions, tries=3, delay=0.01):
     return _retry(exceptions=exceptions, tries=tries, delay=delay)
 
 
-def _make_rate_limit(calls_per_second):
+def _make_rate_limit(calls_per_second=None, **kwargs):
     """Helper: late-import the rate_limit decorator and apply it."""
     from common.decorators import rate_limit as _rate_limit
-    return _rate_limit(calls_per_second=calls_per_second)
+    return _rate_limit(calls_per_second=calls_per_second, **kwargs)
 
 
 # --- retry decorator ---
@@ -129,12 +129,12 @@ def test_rate_limit_first_call_does_not_sleep(mock_sleep):
     mock_sleep.assert_not_called()
 
 
-@patch("common.decorators.time.perf_counter")
+@patch("common.ratelimit.time.monotonic")
 @patch("common.decorators.time.sleep")
-def test_rate_limit_rapid_second_call_sleeps(mock_sleep, mock_perf_counter):
+def test_rate_limit_rapid_second_call_sleeps(mock_sleep, mock_monotonic):
     """Second call within the rate window should sleep for the remaining interval."""
-    # Large baseline so first call sees elapsed >> min_interval and does not sleep.
-    mock_perf_counter.side_effect = [1000.0, 1000.0, 1000.05, 1000.05]
+    # One clock read per call: the first call spends the only token.
+    mock_monotonic.side_effect = [1000.0, 1000.05]
 
     func = _make_rate_limit(calls_per_second=10)(lambda: "ok")
     func()
@@ -144,14 +144,173 @@ def test_rate_limit_rapid_second_call_sleeps(mock_sleep, mock_perf_counter):
     assert mock_sleep.call_args[0][0] == pytest.approx(0.05)
 
 
-@patch("common.decorators.time.perf_counter")
+@patch("common.ratelimit.time.monotonic")
 @patch("common.decorators.time.sleep")
-def test_rate_limit_slow_second_call_does_not_sleep(mock_sleep, mock_perf_counter):
+def test_rate_limit_slow_second_call_does_not_sleep(mock_sleep, mock_monotonic):
     """Second call after the rate window has passed should not sleep."""
-    mock_perf_counter.side_effect = [1000.0, 1000.0, 1001.0, 1001.0]
+    mock_monotonic.side_effect = [1000.0, 1001.0]
 
     func = _make_rate_limit(calls_per_second=2)(lambda: "ok")
     func()
     func()  # elapsed ~ 1.0s > 0.5s → no sleep
 
     mock_sleep.assert_not_called()
+
+
+def test_rate_limit_is_shared_across_threads():
+    """Concurrent callers must still be spaced by the minimum interval."""
+    import threading
+    import time
+
+    starts = []
+    lock = threading.Lock()
+
+    def record():
+        with lock:
+            starts.append(time.perf_counter())
+
+    func = _make_rate_limit(calls_per_second=20)(record)
+    threads = [threading.Thread(target=func) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    starts.sort()
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert len(starts) == 5
+    assert min(gaps) >= 0.05 * 0.9
+
+
+def test_rate_limit_shares_an_explicit_limiter_between_functions():
+    """Functions decorated with the same limiter draw from one budget."""
+    from common.ratelimit import TokenBucket
+
+    sleeps = []
+    bucket = TokenBucket(rate=1, burst=1, clock=lambda: 1000.0, sleep=sleeps.append)
+    first = _make_rate_limit(limiter=bucket)(lambda: "a")
+    second = _make_rate_limit(limiter=bucket)(lambda: "b")
+
+    assert first() == "a"
+    assert second() == "b"
+    assert sleeps == [pytest.approx(1.0)]
+    assert first.limiter is second.limiter is bucket
+
+
+# --- retry back-off, Retry-After and budget ---
+
+
+def _failing(times, error):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= times:
+            raise error
+        return "ok"
+
+    return func, calls
+
+
+@patch("common.decorators.time.sleep")
+def test_retry_backs_off_exponentially_up_to_max_delay(mock_sleep):
+    from common.decorators import retry
+
+    func, _ = _failing(4, ValueError())
+    assert retry(ValueError, tries=5, delay=1, backoff=2, max_delay=5)(func)() == "ok"
+
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [1, 2, 4, 5]
+
+
+@patch("common.decorators.time.sleep")
+def test_retry_jitter_stays_within_fraction(mock_sleep):
+    from common.decorators import retry
+
+    func, _ = _failing(4, ValueError())
+    retry(ValueError, tries=5, delay=8, backoff=1, jitter=0.5)(func)()
+
+    waits = [c.args[0] for c in mock_sleep.call_args_list]
+    assert all(4 <= wait <= 8 for wait in waits)
+    assert len(set(waits)) > 1
+
+
+@patch("common.decorators.time.sleep")
+def test_retry_honours_retry_after(mock_sleep):
+    from email.utils import format_datetime
+    from datetime import datetime, timedelta, timezone
+    from common.decorators import retry
+
+    error = ValueError()
+    error.response = MagicMock(headers={"Retry-After": "7"})
+    func, _ = _failing(1, error)
+    retry(ValueError, tries=2, delay=1)(func)()
+    assert mock_sleep.call_args.args[0] == 7
+
+    error.response = MagicMock(headers={
+        "Retry-After": format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    })
+    func, _ = _failing(1, error)
+    retry(ValueError, tries=2, delay=1)(func)()
+    assert 25 < mock_sleep.call_args.args[0] <= 30
+
+
+@patch("common.decorators.time.sleep")
+def test_retry_budget_stops_nested_retries_multiplying(mock_sleep):
+    from common.decorators import RetryBudget, retry
+
+    budget = RetryBudget(3)
+    calls = []
+
+    @retry(ValueError, tries=5, delay=1, budget=budget)
+    def outer():
+        return inner()
+
+    @retry(ValueError, tries=5, delay=1, budget=budget)
+    def inner():
+        calls.append(1)
+        raise ValueError("down")
+
+    with pytest.raises(ValueError):
+        outer()
+
+    assert mock_sleep.call_count == 3
+    assert len(calls) == 4  # without the budget: 5 x 5 = 25
+    assert budget.spent == 3
+
+
+def test_retry_budget_refills_after_it_is_spent():
+    from common.decorators import RetryBudget
+
+    now = [0.0]
+    budget = RetryBudget(2, period=60, clock=lambda: now[0])
+
+    assert [budget.spend() for _ in range(3)] == [True, True, False]
+    now[0] += 29
+    assert not budget.spend()  # under one retry refilled yet
+    now[0] += 1
+    assert budget.spend()
+    now[0] += 600
+    assert [budget.spend() for _ in range(3)] == [True, True, False]  # refills only up to the cap
+    assert budget.spent == 5
+
+
+def test_async_retry_backs_off_and_respects_budget():
+    import asyncio
+    from common.decorators import RetryBudget, retry
+
+    sleeps = []
+    calls = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    @retry(ValueError, tries=4, delay=1, backoff=3, budget=RetryBudget(2))
+    async def func():
+        calls.append(1)
+        raise ValueError
+
+    with patch("asyncio.sleep", fake_sleep), pytest.raises(ValueError):
+        asyncio.run(func())
+
+    assert sleeps == [1, 3]
+    assert len(calls) == 3
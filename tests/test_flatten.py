@@ -0,0 +1,219 @@
+import copy
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
+
+
+# --- helpers ---
+
+
+def _make_staff(name="TEST STAFF", code="TS123", org="TEST CHANNEL"):
+    return {"staffName": name, "staffCode": code, "orgName": org}
+
+
+def _sample_detail():
+    with open(DOCS_DIR / "getCeeOrderDetail.response.json", encoding="utf-8") as f:
+        return json.load(f)["data"]
+
+
+def _rich_detail():
+    """The docs sample plus DMS, cloud storage, UNI5G items and a Premium Value TV agreement."""
+    detail = _sample_detail()
+    items = detail["orderItemList"]
+    internet = next(x for x in items if x["serviceType"] == 79)
+    internet["agreementList"] = [
+        {"agreementName": None},
+        {"agreementName": "Basic Agreement"},
+        {"agreementName": "Premium Value Sports TV"},
+    ]
+    items.append({"serviceType": 924, "feeList": [{"priceName": "DMS Basic"}]})
+    items.append({
+        "serviceType": 888,
+        "offerInstList": [
+            {"offerType": "1", "offerName": "Not this"},
+            {"offerType": "4", "offerName": "Cloud 1TB"},
+        ],
+    })
+    items.append({"serviceType": 15, "mainOfferName": "UNI5G Postpaid 99"})
+    return detail
+
+
+def _legacy_residential_number(item):
+    if "prefix" in item and "accNbr" in item:
+        return item["prefix"] + item["accNbr"]
+    return None
+
+
+def _legacy_build_datapoint(staff, order_detail):
+    """The per-row implementation flatten_detail replaced, kept for parity checks."""
+    order_items = order_detail["orderItemList"]
+    installation_info_list = order_detail["installationInfoList"]
+    installation_info = installation_info_list[0] if len(installation_info_list) > 0 else None
+    bundle_items = next((x for x in order_items if x["serviceType"] == 51), None)
+    internet_items = next((x for x in order_items if x["serviceType"] == 79), None)
+    residential_voice_items = next((x for x in order_items if x["serviceType"] == 80), None)
+    dms_items = next((x for x in order_items if x["serviceType"] == 924), None)
+    cloud_storage_item = next((x for x in order_items if x["serviceType"] == 888), None)
+    uni5g_items = next((x for x in order_items if x["serviceType"] == 15), None)
+    contact = installation_info.get("custContactDto", {}) if installation_info else {}
+    appointment = installation_info.get("appointmentInfo", {}) if installation_info else {}
+
+    return {
+        "order_id": str(order_detail.get("orderId")),
+        "staffName": staff.get("staffName"),
+        "staff_code": staff.get("staffCode"),
+        "channel_name": staff.get("orgName"),
+        "status": order_detail.get("stateName"),
+        "created_date": order_detail.get("acceptDate"),
+        "updated_date": order_detail.get("stateDate"),
+        "installation_contact_name": contact.get("contactName"),
+        "installation_contact_email": contact.get("email"),
+        "installation_contact_phone": contact.get("contactNbr"),
+        "installation_start_time": appointment.get("appointmentStartTime"),
+        "installation_end_time": appointment.get("appointmentEndTime"),
+        "installation_address": installation_info.get("displayAddress") if installation_info else None,
+        "customer_name": order_detail.get("custInfo", {}).get("custName"),
+        "customer_id_type": order_detail.get("custInfo", {}).get("certTypeName"),
+        "customer_id": order_detail.get("custInfo", {}).get("certNbr"),
+        "bundle_name": bundle_items.get("mainOfferName") if bundle_items else None,
+        "tm_account_id": internet_items.get("accNbr") if internet_items else None,
+        "account_nbr": internet_items.get("acctNbr") if internet_items else None,
+        "residential_number": (
+            _legacy_residential_number(residential_voice_items) if residential_voice_items else None
+        ),
+        "event_type_name": order_detail.get("eventTypeName"),
+        "dms_item": dms_items.get("feeList")[0].get("priceName") if dms_items else None,
+        "cloud_storage_item": (
+            next((x for x in cloud_storage_item.get("offerInstList") if x["offerType"] == "4"), {}).get("offerName")
+            if cloud_storage_item and cloud_storage_item.get("offerInstList")
+            else None
+        ),
+        "uni5g_items": uni5g_items.get("mainOfferName") if uni5g_items else None,
+        "premium_value_tv": next(
+            (
+                agreement.get("agreementName")
+                for agreement in (internet_items.get("agreementList") or [])
+                if agreement.get("agreementName")
+                and re.match(r"Premium Value .*TV", agreement.get("agreementName"))
+            ),
+            None,
+        )
+        if internet_items
+        else None,
+    }
+
+
+# --- parity with the per-row implementation ---
+
+
+def test_flatten_detail_matches_legacy_on_docs_sample():
+    from tm.flatten import flatten_detail
+
+    staff = _make_staff()
+    detail = _sample_detail()
+    assert flatten_detail(staff, detail) == _legacy_build_datapoint(staff, detail)
+
+
+def test_flatten_detail_matches_legacy_on_rich_detail():
+    from tm.flatten import flatten_detail
+
+    staff = _make_staff()
+    detail = _rich_detail()
+    row = flatten_detail(staff, detail)
+
+    assert row == _legacy_build_datapoint(staff, detail)
+    assert row["dms_item"] == "DMS Basic"
+    assert row["cloud_storage_item"] == "Cloud 1TB"
+    assert row["uni5g_items"] == "UNI5G Postpaid 99"
+    assert row["premium_value_tv"] == "Premium Value Sports TV"
+
+
+def test_flatten_detail_matches_legacy_without_installation():
+    from tm.flatten import flatten_detail
+
+    staff = _make_staff()
+    detail = _sample_detail()
+    detail["installationInfoList"] = []
+    assert flatten_detail(staff, detail) == _legacy_build_datapoint(staff, detail)
+
+
+def test_flatten_detail_keeps_first_item_per_service_type():
+    from tm.flatten import flatten_detail
+
+    detail = _sample_detail()
+    detail["orderItemList"].append({"serviceType": 51, "mainOfferName": "SECOND BUNDLE"})
+    row = flatten_detail(_make_staff(), detail)
+    assert row["bundle_name"] == _legacy_build_datapoint(_make_staff(), detail)["bundle_name"]
+    assert row["bundle_name"] != "SECOND BUNDLE"
+
+
+def test_flatten_detail_tolerates_missing_sections():
+    from tm.flatten import COLUMNS, flatten_detail
+
+    row = flatten_detail(_make_staff(), {"orderId": 1, "custInfo": None, "installationInfoList": None})
+    assert list(row) == COLUMNS
+    assert row["order_id"] == "1"
+    assert row["customer_name"] is None
+    assert row["installation_address"] is None
+
+
+def test_flatten_batch_matches_flatten_detail_row_by_row():
+    from tm.flatten import flatten_batch, flatten_detail
+
+    staff = _make_staff()
+    details = [_sample_detail(), _rich_detail(), {"orderId": 3, "custInfo": None}]
+
+    assert flatten_batch(staff, details) == [flatten_detail(staff, detail) for detail in details]
+    assert flatten_batch(staff, []) == []
+
+
+def test_flattened_rows_follow_columns():
+    from tm.flatten import COLUMNS, flatten_batch, flatten_detail
+
+    assert list(flatten_detail(_make_staff(), _sample_detail())) == COLUMNS
+    assert list(flatten_batch(_make_staff(), [_sample_detail()])[0]) == COLUMNS
+
+
+# --- benchmark: per-row dicts vs the field spec ---
+
+
+@pytest.mark.benchmark
+def test_benchmark_flatten_vs_legacy():
+    from tm.flatten import flatten_batch, flatten_detail
+
+    staff = _make_staff()
+    template = _rich_detail()
+    details = []
+    for i in range(2000):
+        detail = copy.deepcopy(template)
+        detail["orderId"] = i
+        details.append(detail)
+
+    started = time.perf_counter()
+    legacy = [_legacy_build_datapoint(staff, detail) for detail in details]
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = [flatten_detail(staff, detail) for detail in details]
+    spec_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = flatten_batch(staff, details)
+    batch_elapsed = time.perf_counter() - started
+
+    logger.info(
+        f"{len(details)} orders: legacy {legacy_elapsed * 1000:.1f}ms, "
+        f"flatten_detail {spec_elapsed * 1000:.1f}ms, flatten_batch {batch_elapsed * 1000:.1f}ms"
+    )
+    assert rows == legacy
+    assert batch == legacy
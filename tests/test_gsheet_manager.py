@@ -16,13 +16,15 @@ def _make_target():
 
 
 def _make_manager(sheets_mock, sheet_range="Sheet1!A:Z", key_column="order_id"):
-    """Create a GSheetManager with the sheets service mocked."""
+    """Create a GSheetManager with the sheets service mocked and its metadata loaded."""
     with patch("gsheet.main._get_sheets_service", return_value=sheets_mock):
-        return _make_target()(
+        manager = _make_target()(
             sheet_range=sheet_range,
             spreadsheet_id="mock_id",
             key_column=key_column,
         )
+        manager._ensure_metadata()  # metadata is lazy; load it now, as the tests expect
+        return manager
 
 
 def _mock_header_and_key_values(sheets_mock, headers, key_values):
@@ -203,6 +205,185 @@ def test_upsert_appends_new_key():
     sheets.values().append.assert_called_once()
 
 
+# ---------------------------------------------------------------------------
+# upsert — changed-only / dry run
+# ---------------------------------------------------------------------------
+
+
+def test_upsert_changed_only_writes_only_differing_cells():
+    """With changed_only, cells already holding the new value are not sent."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "status", "note"],
+        key_values=[["order_id"], ["ID_1"], ["ID_2"]],
+    )
+    manager = _make_manager(sheets)
+
+    sheets.values().get().execute.side_effect = [
+        {"values": [["order_id", "status", "note"], ["ID_1", "Open", "a"], ["ID_2", "Open", "b"]]},
+    ]
+    with patch.object(manager, "_refresh_metadata"):
+        df = pd.DataFrame([
+            {"order_id": "ID_1", "status": "Open", "note": "a"},
+            {"order_id": "ID_2", "status": "Closed", "note": "b"},
+        ])
+        plan = manager.upsert(df, changed_only=True)
+
+    body = sheets.values().batchUpdate.call_args[1]["body"]
+    assert body["data"] == [{"range": "Sheet1!B3", "values": [["Closed"]]}]
+    assert plan.rows_unchanged == 1
+
+
+def test_upsert_changed_only_reuses_snapshot_between_upserts():
+    """The snapshot is read once and kept current, so a repeat upsert sends nothing."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "status"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+
+    sheets.values().get().execute.side_effect = [
+        {"values": [["order_id", "status"], ["ID_1", "Open"]]},
+    ]
+    with patch.object(manager, "_refresh_metadata"):
+        df = pd.DataFrame([{"order_id": "ID_1", "status": "Closed"}])
+        manager.upsert(df, changed_only=True)
+        plan = manager.upsert(df, changed_only=True)
+
+    assert sheets.values().batchUpdate.call_count == 1
+    assert plan.updates == []
+
+
+def test_upsert_dry_run_writes_nothing(caplog):
+    """A dry run logs the change counts and sends no writes."""
+    import logging
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "status"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+
+    with patch.object(manager, "_refresh_metadata"), caplog.at_level(logging.INFO):
+        df = pd.DataFrame([{"order_id": "ID_1", "status": "x"}, {"order_id": "ID_NEW", "status": "y"}])
+        plan = manager.upsert(df, dry_run=True)
+
+    sheets.values().batchUpdate.assert_not_called()
+    sheets.values().append.assert_not_called()
+    assert plan.summary()["rows_appended"] == 1
+    assert "Dry run: 1 rows to update" in caplog.text
+
+
+# ---------------------------------------------------------------------------
+# upsert — metadata cache
+# ---------------------------------------------------------------------------
+
+
+def _get_ranges(sheets):
+    """Ranges requested through values().get, ignoring the mock set-up calls."""
+    return [c.kwargs["range"] for c in sheets.values().get.call_args_list if "range" in c.kwargs]
+
+
+def test_upsert_does_not_reload_metadata_within_ttl():
+    """Right after init the maps are trusted; upsert issues no further reads."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+    reads_after_init = len(_get_ranges(sheets))
+
+    manager.upsert(pd.DataFrame([{"order_id": "ID_1", "col_1": "a"}]))
+    manager.upsert(pd.DataFrame([{"order_id": "ID_1", "col_1": "b"}]))
+
+    assert len(_get_ranges(sheets)) == reads_after_init
+    assert sheets.values().batchUpdate.call_count == 2
+
+
+def test_upsert_maps_appended_rows_from_updated_range():
+    """Appended keys get their rows from the append response instead of a refresh."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+    sheets.values().append().execute.return_value = {
+        "updates": {"updatedRange": "Sheet1!A3:B4", "updatedRows": 2}
+    }
+
+    manager.upsert(pd.DataFrame([{"order_id": "ID_2", "col_1": "a"}, {"order_id": "ID_3", "col_1": "b"}]))
+
+    assert manager.row_map["ID_2"] == [3]
+    assert manager.row_map["ID_3"] == [4]
+    assert manager._last_row == 4
+
+    manager.upsert(pd.DataFrame([{"order_id": "ID_3", "col_1": "c"}]))
+    body = sheets.values().batchUpdate.call_args[1]["body"]
+    assert body["data"] == [{"range": "Sheet1!B4", "values": [["c"]]}]
+
+
+def test_upsert_probes_after_ttl_and_skips_refresh_when_unchanged():
+    """Past the TTL a two-cell probe decides whether the key column is re-read."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+    manager._checked_at -= 10_000
+
+    sheets.values().get().execute.side_effect = [{"values": [["ID_1"]]}]
+    with patch.object(manager, "_refresh_metadata") as refresh:
+        manager.upsert(pd.DataFrame([{"order_id": "ID_1", "col_1": "a"}]))
+
+    refresh.assert_not_called()
+    assert _get_ranges(sheets)[-1] == "Sheet1!A2:A3"
+
+
+def test_upsert_refreshes_when_probe_sees_outside_rows():
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+    manager._checked_at -= 10_000
+
+    sheets.values().get().execute.side_effect = [{"values": [["ID_1"], ["SOMEONE_ELSE"]]}]
+    with patch.object(manager, "_refresh_metadata") as refresh:
+        manager.upsert(pd.DataFrame([{"order_id": "ID_1", "col_1": "a"}]))
+
+    refresh.assert_called_once()
+
+
+@patch("common.decorators.time.sleep")
+def test_upsert_retry_reloads_metadata(mock_sleep):
+    """A failed write invalidates the maps, so the retry re-reads the key column."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], ["ID_1"]],
+    )
+    manager = _make_manager(sheets)
+    sheets.values().batchUpdate().execute.side_effect = [ConnectionError("aborted"), {}]
+
+    with patch.object(manager, "_refresh_metadata") as refresh:
+        manager.upsert(pd.DataFrame([{"order_id": "ID_1", "col_1": "a"}]))
+
+    refresh.assert_called_once()
+
+
 # ---------------------------------------------------------------------------
 # upsert — retry
 # ---------------------------------------------------------------------------
@@ -251,8 +432,8 @@ def test_upsert_chunks_large_update_into_multiple_api_calls():
 
     with patch.object(manager, "_refresh_metadata"):
         manager.header_map = {"order_id": 0, "col_1": 1}
-        # 500 existing rows, chunk size forced to 100
-        manager.row_map = {f"ID_{i}": [i + 2] for i in range(500)}
+        # 500 existing, non-adjacent rows (so nothing merges), chunk size forced to 100
+        manager.row_map = {f"ID_{i}": [2 * i + 2] for i in range(500)}
         df = pd.DataFrame([{"order_id": f"ID_{i}", "col_1": "val"} for i in range(500)])
 
         with patch("gsheet.main.os.getenv", side_effect=lambda k, d: "100" if k == "GSHEET_BATCH_SIZE" else d):
@@ -262,6 +443,30 @@ def test_upsert_chunks_large_update_into_multiple_api_calls():
     assert sheets.values().batchUpdate.call_count == 5
 
 
+def test_upsert_merges_adjacent_rows_and_chunks_by_cells():
+    """Adjacent rows become rectangles; GSHEET_BATCH_CELLS bounds each rectangle and request."""
+    sheets = MagicMock()
+    _mock_header_and_key_values(
+        sheets,
+        headers=["order_id", "col_1"],
+        key_values=[["order_id"], *[[f"ID_{i}"] for i in range(500)]],
+    )
+    manager = _make_manager(sheets)
+
+    with patch.object(manager, "_refresh_metadata"):
+        manager.header_map = {"order_id": 0, "col_1": 1}
+        manager.row_map = {f"ID_{i}": [i + 2] for i in range(500)}
+        df = pd.DataFrame([{"order_id": f"ID_{i}", "col_1": "val"} for i in range(500)])
+
+        with patch("gsheet.main.os.getenv", side_effect=lambda k, d: "100" if k == "GSHEET_BATCH_CELLS" else d):
+            manager.upsert(df)
+
+    bodies = [c.kwargs["body"]["data"] for c in sheets.values().batchUpdate.call_args_list]
+    assert [[d["range"] for d in data] for data in bodies] == [
+        [f"Sheet1!B{top}:B{top + 99}"] for top in range(2, 502, 100)
+    ]
+
+
 # ---------------------------------------------------------------------------
 # read
 # ---------------------------------------------------------------------------
@@ -292,6 +497,28 @@ def test_read_returns_dataframe_with_padded_short_rows():
     assert df.iloc[1]["status"] == ""
 
 
+def test_read_seeds_the_snapshot_of_the_next_changed_only_upsert():
+    from tests.fake_sheets import FakeSheets
+
+    sheets = FakeSheets({"CASES": [["Case ID", "Status"], ["1", "Open"], ["2", "Open"]]})
+    with patch("gsheet.main._get_sheets_service", return_value=sheets):
+        manager = _make_target()(sheet_range="CASES!A:D", spreadsheet_id="id", key_column="case id")
+        manager.read()
+        manager.upsert(pd.DataFrame([{"Case ID": "2", "Status": "Closed"}]), changed_only=True)
+
+    assert sheets.calls == {"get": 3, "batchUpdate": 1, "append": 0}  # read + header + key column; no snapshot read
+    assert sheets.cells_written == 1
+    assert sheets.rows("CASES")[2] == ["2", "Closed"]
+
+
+def test_read_of_part_of_the_columns_does_not_seed_the_snapshot():
+    from gsheet.main import _reads_whole_columns
+
+    assert _reads_whole_columns("CASES!A:D") and _reads_whole_columns("CASES") and _reads_whole_columns("A1:Z")
+    assert not _reads_whole_columns("CASES!B:D")
+    assert not _reads_whole_columns("CASES!A1:D100")
+
+
 # ---------------------------------------------------------------------------
 # performance / scale
 # ---------------------------------------------------------------------------
@@ -311,3 +538,48 @@ def test_row_map_handles_one_million_rows():
 
     assert len(manager.row_map) == 1_000_000
     assert manager.row_map["ID_1"] == [2]
+
+
+# ---------------------------------------------------------------------------
+# lazy metadata and the cached service
+# ---------------------------------------------------------------------------
+
+
+def test_metadata_is_loaded_on_first_use():
+    sheets = MagicMock()
+    _mock_header_and_key_values(sheets, headers=["Order_ID", "status"], key_values=[["Order_ID"], ["ID_1"]])
+
+    with patch("gsheet.main._get_sheets_service", return_value=sheets):
+        manager = _make_target()(sheet_range="Sheet1!A:Z", spreadsheet_id="mock_id")
+
+    sheets.values().get().execute.assert_not_called()
+    assert manager._get_column_name_case_insensitive("status") == "status"
+    assert manager.key_column == "Order_ID"
+    assert manager.row_map == {"ID_1": [2]}
+    assert sheets.values().get().execute.call_count == 2
+
+
+def test_sheets_service_is_built_once_per_thread_from_shared_credentials(tmp_path):
+    import threading
+    from gsheet.main import _get_sheets_service, clear_service_cache
+
+    credential_file = tmp_path / "credential.json"
+    credential_file.write_text("{}")
+    clear_service_cache()
+    try:
+        with patch("gsheet.main.Credentials.from_service_account_file") as load, \
+             patch("gsheet.main.build") as build:
+            build.side_effect = lambda *args, **kwargs: MagicMock()
+            first = _get_sheets_service(str(credential_file))
+            again = _get_sheets_service(str(credential_file))
+            other_thread = []
+            thread = threading.Thread(target=lambda: other_thread.append(_get_sheets_service(str(credential_file))))
+            thread.start()
+            thread.join()
+
+        assert first is again
+        assert other_thread[0] is not first
+        assert build.call_count == 2
+        load.assert_called_once()
+    finally:
+        clear_service_cache()
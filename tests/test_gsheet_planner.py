@@ -0,0 +1,348 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+HEADER_MAP = {"order_id": 0, "status": 1, "customer": 2, "remarks": 3, "notes": 4, "amount": 5}
+
+
+# ---------------------------------------------------------------------------
+# helpers
+# ---------------------------------------------------------------------------
+
+
+def _legacy_plan(df, header_map, row_map, key_column, sheet_prefix="Sheet1!"):
+    """The iterrows-based planning upsert used before the planner, kept for parity checks."""
+    from gsheet.planner import column_letter
+
+    def build_update_requests(row_idx, df_row):
+        valid_cols = sorted(
+            (header_map[c], v) for c, v in df_row.items() if c in header_map and c != key_column
+        )
+        groups = []
+        for col in valid_cols:
+            if groups and col[0] == groups[-1][-1][0] + 1:
+                groups[-1].append(col)
+            else:
+                groups.append([col])
+        requests = []
+        for group in groups:
+            start, end = group[0][0], group[-1][0]
+            if start == end:
+                cell_range = f"{sheet_prefix}{column_letter(start)}{row_idx}"
+            else:
+                cell_range = f"{sheet_prefix}{column_letter(start)}{row_idx}:{column_letter(end)}{row_idx}"
+            requests.append({
+                "range": cell_range,
+                "values": [[str(v) if pd.notnull(v) else "" for _, v in group]],
+            })
+        return requests
+
+    def format_for_append(df_row):
+        formatted = [""] * len(header_map)
+        for col_name, value in df_row.items():
+            if col_name in header_map:
+                formatted[header_map[col_name]] = str(value) if pd.notnull(value) else ""
+        return formatted
+
+    update_data, append_data = [], []
+    for _, row in df.iterrows():
+        key_val = str(row[key_column])
+        if key_val in row_map:
+            for row_idx in row_map[key_val]:
+                update_data.extend(build_update_requests(row_idx, row))
+        else:
+            append_data.append(format_for_append(row))
+    return update_data, append_data
+
+
+def _cells(updates):
+    """ValueRanges -> ``{(row, column): value}`` after applying them in order."""
+    from gsheet.planner import parse_cell
+
+    cells = {}
+    for update in updates:
+        row, column = parse_cell(update["range"].split(":")[0])
+        for r, values in enumerate(update["values"]):
+            for c, value in enumerate(values):
+                cells[row + r, column + c] = value
+    return cells
+
+
+def _make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    statuses = np.array(["Pending", "Completed", None, "Cancelled"], dtype=object)
+    return pd.DataFrame({
+        "order_id": [f"ID_{i}" for i in range(n)],
+        "status": statuses[rng.integers(0, len(statuses), n)],
+        "customer": [f"CUSTOMER {i % 97}" for i in range(n)],
+        "not_in_sheet": ["ignored"] * n,
+        "notes": [None if i % 5 == 0 else f"note {i}" for i in range(n)],
+        "amount": [float("nan") if i % 7 == 0 else i * 1.5 for i in range(n)],
+    })
+
+
+def _make_row_map(n, every=2):
+    """Every ``every``-th key exists in the sheet; ID_0 is duplicated."""
+    row_map = {f"ID_{i}": [i + 2] for i in range(0, n, every)}
+    row_map["ID_0"] = [2, n + 5]
+    return row_map
+
+
+# ---------------------------------------------------------------------------
+# helpers of the planner
+# ---------------------------------------------------------------------------
+
+
+def test_column_letter():
+    from gsheet.planner import column_letter
+
+    assert [column_letter(i) for i in (0, 25, 26, 51, 52, 701, 702)] == ["A", "Z", "AA", "AZ", "BA", "ZZ", "AAA"]
+
+
+def test_stringify_blanks_nulls():
+    from gsheet.planner import stringify
+
+    frame = pd.DataFrame({"a": [1, None], "b": ["x", float("nan")], "c": [1.5, 2.0]})
+    assert stringify(frame).to_numpy().tolist() == [["1.0", "x", "1.5"], ["", "", "2.0"]]
+
+
+# ---------------------------------------------------------------------------
+# parity with the iterrows implementation
+# ---------------------------------------------------------------------------
+
+
+def test_plan_matches_legacy_updates_and_appends():
+    from gsheet.planner import plan_upsert
+
+    df = _make_frame(200)
+    row_map = _make_row_map(200)
+
+    plan = plan_upsert(df, HEADER_MAP, row_map, "order_id", "Sheet1!")
+    updates, appends = _legacy_plan(df, HEADER_MAP, row_map, "order_id")
+
+    assert _cells(plan.updates) == _cells(updates)
+    assert plan.appends == appends
+    assert plan.append_keys == [f"ID_{i}" for i in range(1, 200, 2)]
+
+
+def test_plan_matches_legacy_cells_with_consecutive_rows_and_duplicates():
+    from gsheet.planner import plan_upsert
+
+    df = _make_frame(300)
+    row_map = _make_row_map(300, every=1)
+    df = pd.concat([df, df.iloc[[5]].assign(status="LATER")])  # ID_5 written twice; the last write wins
+
+    plan = plan_upsert(df, HEADER_MAP, row_map, "order_id", "Sheet1!")
+    updates, _ = _legacy_plan(df, HEADER_MAP, row_map, "order_id")
+
+    assert _cells(plan.updates) == _cells(updates)
+    assert _cells(plan.updates)[7, 1] == "LATER"
+    assert len(plan.updates) < len(updates) / 50
+
+
+def test_plan_merges_consecutive_rows_into_rectangles():
+    from gsheet.planner import plan_upsert
+
+    header_map = {"order_id": 0, "a": 1, "b": 2, "c": 3}
+    df = pd.DataFrame([{"order_id": f"ID_{i}", "a": f"a{i}", "b": f"b{i}", "c": f"c{i}"} for i in range(6)])
+    row_map = {"ID_0": [5], "ID_1": [6], "ID_2": [7], "ID_3": [9], "ID_4": [10], "ID_5": [3, 4]}
+
+    plan = plan_upsert(df, header_map, row_map, "order_id", "Sheet1!")
+
+    assert plan.updates == [
+        {"range": "Sheet1!B5:D7", "values": [["a0", "b0", "c0"], ["a1", "b1", "c1"], ["a2", "b2", "c2"]]},
+        {"range": "Sheet1!B9:D10", "values": [["a3", "b3", "c3"], ["a4", "b4", "c4"]]},
+        # ID_5 is a duplicate key: one range per sheet row, as before
+        {"range": "Sheet1!B3:D3", "values": [["a5", "b5", "c5"]]},
+        {"range": "Sheet1!B4:D4", "values": [["a5", "b5", "c5"]]},
+    ]
+    assert plan.summary()["cells_updated"] == 21
+
+
+def test_plan_caps_rectangles_at_max_cells():
+    from gsheet.planner import plan_upsert
+
+    df = pd.DataFrame([{"order_id": f"ID_{i}", "a": "x", "b": "y"} for i in range(10)])
+    row_map = {f"ID_{i}": [i + 2] for i in range(10)}
+
+    plan = plan_upsert(df, {"order_id": 0, "a": 1, "b": 2}, row_map, "order_id", max_cells=8)
+
+    assert [u["range"] for u in plan.updates] == ["B2:C5", "B6:C9", "B10:C11"]
+
+
+def test_batch_chunks_limit_ranges_and_cells():
+    from gsheet.planner import batch_chunks
+
+    updates = [{"range": f"B{i}", "values": [["x"]] * size} for i, size in enumerate([3, 3, 1, 1, 1, 5])]
+
+    chunks = list(batch_chunks(updates, max_ranges=2, max_cells=6))
+
+    assert [[len(u["values"]) for u in chunk] for chunk in chunks] == [[3, 3], [1, 1], [1, 5]]
+
+
+def test_plan_updates_every_duplicate_row():
+    from gsheet.planner import plan_upsert
+
+    df = pd.DataFrame([{"order_id": "ID_1", "status": "Updated"}])
+    plan = plan_upsert(df, {"order_id": 0, "status": 1}, {"ID_1": [2, 4]}, "order_id", "Sheet1!")
+
+    assert [u["range"] for u in plan.updates] == ["Sheet1!B2", "Sheet1!B4"]
+    assert plan.appends == []
+
+
+def test_plan_matches_non_string_keys_as_strings():
+    from gsheet.planner import plan_upsert
+
+    df = pd.DataFrame([{"order_id": 123, "status": "A"}, {"order_id": 456, "status": "B"}])
+    plan = plan_upsert(df, {"order_id": 0, "status": 1}, {"123": [2]}, "order_id")
+
+    assert plan.updates == [{"range": "B2", "values": [["A"]]}]
+    assert plan.appends == [["456", "B"]]
+
+
+def test_plan_without_updatable_columns_only_appends():
+    from gsheet.planner import plan_upsert
+
+    df = pd.DataFrame([{"order_id": "ID_1"}, {"order_id": "ID_2"}])
+    plan = plan_upsert(df, {"order_id": 0, "status": 1}, {"ID_1": [2]}, "order_id")
+
+    assert plan.updates == []
+    assert plan.appends == [["ID_2", ""]]
+
+
+# ---------------------------------------------------------------------------
+# change-only planning against a snapshot
+# ---------------------------------------------------------------------------
+
+
+def _snapshot(rows):
+    from gsheet.planner import snapshot_array
+
+    return snapshot_array(rows, 4)
+
+
+def test_plan_with_snapshot_writes_only_changed_cells():
+    from gsheet.planner import plan_upsert
+
+    header_map = {"order_id": 0, "a": 1, "b": 2, "c": 3}
+    snapshot = _snapshot([
+        ["order_id", "a", "b", "c"],
+        ["ID_1", "x", "y", "z"],
+        ["ID_2", "x", "y", "z"],
+        ["ID_3", "x"],
+    ])
+    df = pd.DataFrame([
+        {"order_id": "ID_1", "a": "x", "b": "y", "c": "z"},   # unchanged
+        {"order_id": "ID_2", "a": "NEW", "b": "y", "c": "NEW"},
+        {"order_id": "ID_3", "a": "x", "b": None, "c": "z"},   # missing trailing cells read as ""
+    ])
+    row_map = {"ID_1": [2], "ID_2": [3], "ID_3": [4]}
+
+    plan = plan_upsert(df, header_map, row_map, "order_id", "Sheet1!", snapshot=snapshot)
+
+    assert plan.updates == [
+        {"range": "Sheet1!B3", "values": [["NEW"]]},
+        {"range": "Sheet1!D3:D4", "values": [["NEW"], ["z"]]},
+    ]
+    assert plan.summary() == {
+        "rows_updated": 2,
+        "rows_unchanged": 1,
+        "rows_appended": 0,
+        "cells_updated": 3,
+        "cells_unchanged": 6,
+        "requests": 2,
+    }
+
+
+def test_plan_with_snapshot_writes_rows_beyond_it_in_full():
+    from gsheet.planner import plan_upsert
+
+    header_map = {"order_id": 0, "a": 1, "b": 2}
+    df = pd.DataFrame([{"order_id": "ID_9", "a": "1", "b": "2"}])
+    plan = plan_upsert(df, header_map, {"ID_9": [9]}, "order_id", snapshot=_snapshot([["order_id", "a", "b"]]))
+
+    assert plan.updates == [{"range": "B9:C9", "values": [["1", "2"]]}]
+
+
+def test_apply_plan_brings_snapshot_up_to_date():
+    from gsheet.planner import apply_plan, plan_upsert
+
+    header_map = {"order_id": 0, "a": 1, "b": 2, "c": 3}
+    snapshot = _snapshot([["order_id", "a", "b", "c"], ["ID_1", "x", "y", "z"]])
+    df = pd.DataFrame([
+        {"order_id": "ID_1", "a": "x", "b": "NEW", "c": "z"},
+        {"order_id": "ID_2", "a": "p", "b": "q", "c": "r"},
+    ])
+    plan = plan_upsert(df, header_map, {"ID_1": [2]}, "order_id", "Sheet1!", snapshot=snapshot)
+
+    updated = apply_plan(snapshot, plan, {"ID_1": [2], "ID_2": [3]})
+
+    assert updated.tolist() == [
+        ["order_id", "a", "b", "c"],
+        ["ID_1", "x", "NEW", "z"],
+        ["ID_2", "p", "q", "r"],
+    ]
+    again = plan_upsert(df, header_map, {"ID_1": [2], "ID_2": [3]}, "order_id", snapshot=updated)
+    assert again.updates == []
+    assert again.rows_unchanged == 2
+
+
+def test_plan_with_snapshot_lets_the_last_duplicate_win():
+    from gsheet.planner import apply_plan, plan_upsert
+
+    header_map = {"order_id": 0, "a": 1}
+    snapshot = _snapshot([["order_id", "a"], ["ID_1", "x"]])
+    df = pd.DataFrame([{"order_id": "ID_1", "a": "NEW"}, {"order_id": "ID_1", "a": "x"}])
+
+    plan = plan_upsert(df, header_map, {"ID_1": [2]}, "order_id", snapshot=snapshot)
+
+    assert plan.updates == []
+    assert apply_plan(snapshot, plan, {"ID_1": [2]})[1, 1] == "x"
+
+    df = df.iloc[::-1]
+    plan = plan_upsert(df, header_map, {"ID_1": [2]}, "order_id", snapshot=snapshot)
+
+    assert plan.updates == [{"range": "B2", "values": [["NEW"]]}]
+
+
+def test_parse_cell():
+    from gsheet.planner import parse_cell
+
+    assert parse_cell("Sheet1!B5") == (5, 1)
+    assert parse_cell("AA10") == (10, 26)
+
+
+# ---------------------------------------------------------------------------
+# benchmark: iterrows vs column-wise planning
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.benchmark
+def test_benchmark_plan_upsert_50k_rows():
+    from gsheet.planner import plan_upsert
+
+    df = _make_frame(50_000)
+    row_map = _make_row_map(50_000)
+
+    started = time.perf_counter()
+    updates, appends = _legacy_plan(df, HEADER_MAP, row_map, "order_id")
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plan = plan_upsert(df, HEADER_MAP, row_map, "order_id", "Sheet1!")
+    plan_elapsed = time.perf_counter() - started
+
+    logger.info(
+        f"50k rows: iterrows {legacy_elapsed:.3f}s, plan_upsert {plan_elapsed:.3f}s "
+        f"({legacy_elapsed / plan_elapsed:.1f}x), {len(updates)} ranges -> {len(plan.updates)}"
+    )
+    assert _cells(plan.updates) == _cells(updates)
+    assert plan.appends == appends
+    assert plan_elapsed < legacy_elapsed
@@ -0,0 +1,189 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _http_error(status, retry_after=None):
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    headers = {"status": str(status)}
+    if retry_after is not None:
+        headers["retry-after"] = str(retry_after)
+    return HttpError(httplib2.Response(headers), b"{}")
+
+
+def _request(*outcomes):
+    request = MagicMock()
+    request.execute.side_effect = list(outcomes)
+    return request
+
+
+def _scheduler(clock, **kwargs):
+    from gsheet.quota import SheetsScheduler
+
+    return SheetsScheduler(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+# --- QuotaWindow ---
+
+
+def test_window_allows_limit_per_period_then_waits_for_the_oldest_slot():
+    from gsheet.quota import QuotaWindow
+
+    clock = FakeClock()
+    window = QuotaWindow(3, period=60, clock=clock, sleep=clock.sleep)
+
+    waits = [window.acquire() for _ in range(3)]
+    clock.now += 10
+    waits.append(window.acquire())
+
+    assert waits == [0, 0, 0, 50]
+    assert window.stats()["total_wait"] == 50
+
+
+def test_window_queues_callers_in_order():
+    from gsheet.quota import QuotaWindow
+
+    window = QuotaWindow(2, period=60, clock=lambda: 0.0)
+
+    assert [window.reserve() for _ in range(6)] == [0, 0, 60, 60, 120, 120]
+
+
+# --- SheetsScheduler ---
+
+
+def test_reads_and_writes_have_separate_windows():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, reads_per_minute=1, writes_per_minute=1)
+
+    scheduler.execute("read", _request({}))
+    scheduler.execute("write", _request({}))
+    assert clock.sleeps == []
+
+    scheduler.execute("read", _request({}))
+    assert clock.sleeps == [60]
+
+
+def test_429_and_503_are_retried_with_backoff():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, delay=2)
+    request = _request(_http_error(429), _http_error(503), {"ok": True})
+
+    with patch("common.decorators.random.uniform", side_effect=lambda low, high: high):
+        assert scheduler.execute("write", request) == {"ok": True}
+
+    assert clock.sleeps == [2, 4]
+    assert scheduler.stats()["retries"] == 2
+    assert scheduler.stats()["backoff_wait"] == 6
+
+
+def test_retry_after_is_honoured():
+    clock = FakeClock()
+    scheduler = _scheduler(clock, delay=2)
+
+    scheduler.execute("read", _request(_http_error(429, retry_after=30), {}))
+
+    assert clock.sleeps == [30]
+
+
+def test_retry_after_http_date_is_honoured():
+    from datetime import datetime, timedelta, timezone
+    from email.utils import format_datetime
+
+    clock = FakeClock()
+    scheduler = _scheduler(clock, delay=2)
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+    scheduler.execute("read", _request(_http_error(429, retry_after=retry_at), {}))
+
+    assert 25 < clock.sleeps[0] <= 30
+
+
+def test_only_the_request_itself_is_timed():
+    from common.metrics import metrics
+    from gsheet.quota import SheetsScheduler
+
+    metrics.reset()
+    scheduler = SheetsScheduler(delay=0.1, sleep=time.sleep)
+    scheduler.execute("write", _request(_http_error(429), {}), "sheets.append")
+
+    timed = next(row for row in metrics.summary() if row["name"] == "sheets.append")
+    assert (timed["calls"], timed["errors"]) == (2, 1)
+    assert timed["seconds"] < 0.05
+    metrics.reset()
+
+
+def test_other_errors_and_exhausted_retries_raise():
+    from googleapiclient.errors import HttpError
+
+    clock = FakeClock()
+    scheduler = _scheduler(clock, tries=3)
+
+    with pytest.raises(HttpError):
+        scheduler.execute("write", _request(_http_error(400)))
+    assert clock.sleeps == []
+
+    request = _request(*[_http_error(429)] * 3)
+    with pytest.raises(HttpError):
+        scheduler.execute("write", request)
+    assert request.execute.call_count == 3
+
+
+# --- GSheetManager ---
+
+
+def test_managers_share_the_scheduler_quota():
+    from gsheet.main import GSheetManager
+    from gsheet.quota import set_scheduler
+    from tests.fake_sheets import FakeSheets
+
+    clock = FakeClock()
+    scheduler = _scheduler(clock, reads_per_minute=3, writes_per_minute=1)
+    set_scheduler(scheduler)
+    sheets = FakeSheets({"S": [["order_id", "status"], ["1", "a"]]})
+
+    with patch("gsheet.main._get_sheets_service", return_value=sheets):
+        GSheetManager(sheet_range="S!A:B", spreadsheet_id="id")._ensure_metadata()  # 2 reads
+        manager = GSheetManager(sheet_range="S!A:B", spreadsheet_id="id")
+        manager._ensure_metadata()  # 2 more: waits for a slot
+        manager.upsert(pd.DataFrame([{"order_id": "1", "status": "b"}, {"order_id": "2", "status": "c"}]))
+
+    assert clock.sleeps == [60, 60]  # fourth read, then the append after the batchUpdate
+    assert sheets.rows("S") == [["order_id", "status"], ["1", "b"], ["2", "c"]]
+    assert [w["waits"] for w in scheduler.stats()["windows"]] == [1, 1]
+
+
+def test_upsert_survives_a_rate_limited_write(sheets_scheduler):
+    from gsheet.main import GSheetManager
+
+    sheets = MagicMock()
+    sheets.values().get().execute.side_effect = [{"values": [["order_id", "status"]]}, {"values": [["order_id"], ["1"]]}]
+    sheets.values().batchUpdate().execute.side_effect = [_http_error(429), {}]
+
+    with patch("gsheet.main._get_sheets_service", return_value=sheets), patch("common.ratelimit.time.sleep"):
+        manager = GSheetManager(sheet_range="S!A:B", spreadsheet_id="id")
+        manager.upsert(pd.DataFrame([{"order_id": "1", "status": "x"}]))
+
+    assert sheets.values().batchUpdate().execute.call_count == 2
+    assert sheets_scheduler.stats()["retries"] == 1
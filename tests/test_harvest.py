@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+from unittest.mock import patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_staffs(count):
+    return [
+        {"staffId": 1000 + i, "staffName": f"STAFF {i}", "staffCode": f"SC{i}", "orgName": "ORG"}
+        for i in range(count)
+    ]
+
+
+def _fake_order_list(staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+    return [{"orderId": f"{staffId}-{n}", "orderNbr": f"{staffId}-{n}"} for n in range(2)]
+
+
+def _fake_process_orders(staff, orders, cache=None):
+    return [{"order_id": order["orderId"], "staff_code": staff["staffCode"]} for order in orders]
+
+
+# --- iter_harvest / harvest_orders ---
+
+
+def test_harvest_orders_returns_rows_in_staff_order():
+    from tm.harvest import harvest_orders
+
+    staffs = _make_staffs(5)
+    with patch("tm.harvest.iter_order_list", side_effect=_fake_order_list), \
+         patch("tm.harvest.process_orders", side_effect=_fake_process_orders):
+        rows = harvest_orders(staffs, "Y", workers=3)
+
+    assert [r["order_id"] for r in rows] == [
+        f"{1000 + i}-{n}" for i in range(5) for n in range(2)
+    ]
+
+
+def test_iter_harvest_runs_staff_concurrently():
+    """With enough workers, every staff should be in flight at the same time."""
+    from tm.harvest import iter_harvest
+
+    staffs = _make_staffs(4)
+    barrier = threading.Barrier(4, timeout=5)
+
+    def order_list(*args, **kwargs):
+        barrier.wait()  # deadlocks (and times out) if staff are fetched serially
+        return _fake_order_list(*args, **kwargs)
+
+    with patch("tm.harvest.iter_order_list", side_effect=order_list), \
+         patch("tm.harvest.process_orders", side_effect=_fake_process_orders):
+        results = list(iter_harvest(staffs, "N", workers=4))
+
+    assert [staff["staffId"] for staff, _ in results] == [s["staffId"] for s in staffs]
+    assert all(len(rows) == 2 for _, rows in results)
+
+
+def test_iter_harvest_propagates_worker_errors():
+    from tm.harvest import harvest_orders
+
+    def order_list(staffId, *args, **kwargs):
+        if staffId == 1001:
+            raise RuntimeError("cookie expired")
+        return []
+
+    with patch("tm.harvest.iter_order_list", side_effect=order_list):
+        with pytest.raises(RuntimeError, match="cookie expired"):
+            harvest_orders(_make_staffs(3), "Y", workers=2)
+
+
+def test_harvest_orders_with_single_worker_matches_serial_path():
+    from tm.harvest import harvest_orders
+
+    staffs = _make_staffs(3)
+    with patch("tm.harvest.iter_order_list", side_effect=_fake_order_list), \
+         patch("tm.harvest.process_orders", side_effect=_fake_process_orders):
+        rows = harvest_orders(staffs, "Y", workers=1)
+
+    assert len(rows) == 6
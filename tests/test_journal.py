@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+from unittest.mock import patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_journal(tmp_path, name="download-ongoing-202506"):
+    from tm.journal import RunJournal
+    return RunJournal(name, directory=str(tmp_path / "journal"))
+
+
+def _make_staff(staff_id):
+    return {"staffId": staff_id, "staffName": f"STAFF {staff_id}", "staffCode": "SC", "orgName": "ORG"}
+
+
+# --- RunJournal ---
+
+
+def test_journal_round_trips_completed_staff(tmp_path):
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "A"}])
+    journal.record(_make_staff(2), [])
+
+    assert journal.completed() == {"1": [{"order_id": "A"}], "2": []}
+
+
+def test_journal_replays_fallback_rows_as_fallbacks(tmp_path):
+    from tm.flatten import FallbackRow
+
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "A"}, FallbackRow(order_id="B")])
+
+    rows = journal.completed()["1"]
+    assert rows == [{"order_id": "A"}, {"order_id": "B"}]
+    assert [type(row) for row in rows] == [dict, FallbackRow]
+
+
+def test_journal_ignores_partially_written_last_line(tmp_path):
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "A"}])
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"staff_id": "2", "rows": [{"order_')
+
+    assert list(journal.completed()) == ["1"]
+
+
+def test_journal_resume_drops_partial_line_before_appending(tmp_path):
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "A"}])
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"staff_id": "2", "rows": [{"order_')
+
+    assert list(journal.start(resume=True)) == ["1"]
+    journal.record(_make_staff(3), [{"order_id": "C"}])
+
+    assert journal.completed() == {"1": [{"order_id": "A"}], "3": [{"order_id": "C"}]}
+
+
+def test_journal_start_without_resume_discards_previous_run(tmp_path):
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [])
+
+    assert journal.start(resume=False) == {}
+    assert journal.completed() == {}
+
+
+def test_journal_start_with_resume_returns_completed(tmp_path):
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "A"}])
+
+    assert journal.start(resume=True) == {"1": [{"order_id": "A"}]}
+
+
+# --- resuming a harvest (main._harvest) ---
+
+
+def test_harvest_resume_skips_completed_staff_and_replays_rows(tmp_path):
+    from main import Engine, _harvest
+
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [{"order_id": "FROM_JOURNAL"}])
+    harvested = []
+
+    def fake_harvest_orders(staffs, *args, on_staff=None, **kwargs):
+        harvested.extend(s["staffId"] for s in staffs)
+        for staff in staffs:
+            on_staff(staff, [{"order_id": f"NEW_{staff['staffId']}"}])
+        return [{"order_id": f"NEW_{s['staffId']}"} for s in staffs]
+
+    with patch("tm.harvest.harvest_orders", side_effect=fake_harvest_orders):
+        rows = _harvest(
+            Engine.threads, [_make_staff(1), _make_staff(2)], "Y", None, None, 2,
+            journal=journal, resume=True,
+        )
+
+    assert harvested == [2]
+    assert rows == [{"order_id": "FROM_JOURNAL"}, {"order_id": "NEW_2"}]
+    assert set(journal.completed()) == {"1", "2"}
+
+
+def test_resumed_fallback_row_keeps_stored_details(tmp_path):
+    from main import Engine, _harvest, _store_rows
+    from tm.flatten import FallbackRow
+    from tm.store import OrderStore
+
+    stored = {"order_id": "A", "updated_date": "2026-01-01 00:00:00", "customer_name": "ALICE"}
+    journal = _make_journal(tmp_path)
+    journal.record(_make_staff(1), [FallbackRow(order_id="A", updated_date="2026-01-01 00:00:00")])
+
+    with OrderStore(str(tmp_path / "orders.sqlite3")) as store:
+        _store_rows(store, [stored])
+        rows = _harvest(Engine.threads, [_make_staff(1)], "Y", None, None, 2, journal=journal, resume=True)
+        df = _store_rows(store, rows)
+
+    assert df["customer_name"].tolist() == ["ALICE"]
+
+
+def test_harvest_orders_checkpoints_each_staff():
+    from tm.harvest import harvest_orders
+
+    finished = []
+    with patch("tm.harvest.iter_order_list", return_value=iter([])):
+        harvest_orders([_make_staff(1), _make_staff(2)], "Y", workers=2,
+                       on_staff=lambda staff, rows: finished.append(staff["staffId"]))
+
+    assert sorted(finished) == [1, 2]  # in completion order
+
+
+def test_harvest_checkpoints_staff_that_finish_after_a_failing_one():
+    from tm.harvest import harvest_orders
+
+    release = threading.Event()
+    finished = []
+
+    def order_list(staffId, *args, **kwargs):
+        if staffId == 1:
+            release.wait(timeout=5)  # the first staff is slow, then fails
+            raise RuntimeError("cookie expired")
+        return []
+
+    def on_staff(staff, rows):
+        finished.append(staff["staffId"])
+        if len(finished) == 2:
+            release.set()
+
+    with patch("tm.harvest.iter_order_list", side_effect=order_list):
+        with pytest.raises(RuntimeError, match="cookie expired"):
+            harvest_orders([_make_staff(1), _make_staff(2), _make_staff(3)], "Y", workers=3, on_staff=on_staff)
+
+    assert sorted(finished) == [2, 3]
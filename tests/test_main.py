@@ -0,0 +1,190 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_staff(staff_id=1000):
+    return {"staffId": staff_id, "staffName": f"STAFF {staff_id}", "staffCode": "SC", "orgName": "ORG"}
+
+
+def _row(order_id, updated_date, status="Pending"):
+    return {"order_id": order_id, "updated_date": updated_date, "status": status}
+
+
+# --- _store_rows ---
+
+
+def test_store_rows_returns_one_newest_row_per_order(tmp_path):
+    from main import _store_rows
+    from tm.store import OrderStore
+
+    with OrderStore(path=str(tmp_path / "orders.sqlite3")) as store:
+        df = _store_rows(store, [
+            _row("1", "2026-01-02 00:00:00", "new"),
+            _row("1", "2026-01-01 00:00:00", "old"),
+            _row("2", "2026-01-01 00:00:00"),
+        ])
+        _store_rows(store, [_row("3", "2026-01-01 00:00:00")])
+
+    assert df["order_id"].tolist() == ["1", "2"]
+    assert df.set_index("order_id").loc["1", "status"] == "new"
+
+
+def test_store_rows_dry_run_leaves_the_store_untouched(tmp_path):
+    from main import _store_rows
+    from tm.store import OrderStore
+
+    with OrderStore(path=str(tmp_path / "orders.sqlite3")) as store:
+        _store_rows(store, [_row("1", "2026-01-01 00:00:00", "stored")])
+        df = _store_rows(store, [_row("1", "2026-01-02 00:00:00", "new"), _row("2", "2026-01-01 00:00:00")], dry_run=True)
+
+        assert df.set_index("order_id")["status"].to_dict() == {"1": "new", "2": "Pending"}
+        assert store.orders_frame()[["order_id", "status"]].values.tolist() == [["1", "stored"]]
+
+
+# --- run_all ---
+
+
+def test_run_all_fetches_staff_once_and_upserts_once(tmp_path, monkeypatch):
+    """Six month/source harvests share one staff list, one manager and one deduplicated upsert."""
+    import main
+
+    monkeypatch.setenv("RUN_JOURNAL_DIR", str(tmp_path))
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    staffs = [_make_staff()]
+    harvested = []
+
+    def fake_harvest(engine, staff_list, on_way_flag, created_date_from, created_date_to, workers, **kwargs):
+        assert staff_list is staffs
+        harvested.append((on_way_flag, created_date_from[:6]))
+        # Every run sees order "1"; the ongoing run of the newest month has the latest state.
+        updated = "2026-03-02 00:00:00" if (on_way_flag, created_date_from[:6]) == ("Y", "202603") else "2026-01-01 00:00:00"
+        return [_row("1", updated, f"{on_way_flag}{created_date_from[:6]}"), _row(f"{on_way_flag}{created_date_from[:6]}", updated)]
+
+    manager = MagicMock()
+    with patch("tm.api.get_all_staff", return_value=staffs) as get_all_staff, \
+         patch("main._harvest", side_effect=fake_harvest), \
+         patch("gsheet.main.GSheetManager", return_value=manager) as manager_cls, \
+         patch("main._recent_months", return_value=[datetime(2026, 3, 1), datetime(2026, 2, 1), datetime(2026, 1, 1)]):
+        main.run_all(cache=False)
+
+    get_all_staff.assert_called_once()
+    manager_cls.assert_called_once()
+    manager.upsert.assert_called_once()
+    assert sorted(harvested) == sorted(
+        (flag, month) for flag in ("N", "Y") for month in ("202601", "202602", "202603")
+    )
+
+    df = manager.upsert.call_args[0][0]
+    assert len(df) == 7  # order "1" once, plus one unique order per run
+    assert df.set_index("order_id").loc["1", "status"] == "Y202603"
+    assert manager.upsert.call_args[1] == {"changed_only": True, "dry_run": False}
+
+
+def test_run_all_reports_metrics_when_it_fails(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    monkeypatch.setenv("METRICS_PATH", str(tmp_path / "metrics.json"))
+
+    with patch("tm.api.get_all_staff", side_effect=RuntimeError("cookie expired")):
+        with pytest.raises(RuntimeError, match="cookie expired"):
+            main.run_all(cache=False)
+
+    assert (tmp_path / "metrics.json").exists()
+
+
+# --- sync_cases ---
+
+
+def _case_sheet():
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Case ID": ["1", "2", "", "3", "4", "1", "5"],
+        "Status": ["Open", "Closed", "", "In Progress", "cancelled", "Open", ""],
+        "Troika ID": [""] * 7,
+    })
+
+
+def _case_manager():
+    manager = MagicMock()
+    manager.read.return_value = _case_sheet()
+    names = {"case id": "Case ID", "status": "Status", "troika id": "Troika ID"}
+    manager._get_column_name_case_insensitive.side_effect = names.get
+    return manager
+
+
+def test_sync_cases_skips_terminal_and_upserts_in_batches(tmp_path, monkeypatch):
+    import main
+    from tm.store import OrderStore
+
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    monkeypatch.setenv("CASE_TERMINAL_STATUSES", "Closed,Cancelled")
+    manager = _case_manager()
+    fetched = []
+
+    def fake_updates(case_ids, workers):
+        fetched.extend(case_ids)
+        for case_id in case_ids:
+            yield case_id, "Done", f"T{case_id}"
+
+    with patch("gsheet.main.GSheetManager", return_value=manager), \
+         patch("tm.cases.iter_case_updates", side_effect=fake_updates):
+        main.sync_cases(workers=2, batch_size=2, include_terminal=False)
+
+    assert fetched == ["1", "3", "5"]
+    batches = [c.args[0]["Case ID"].tolist() for c in manager.upsert.call_args_list]
+    assert batches == [["1", "3"], ["5"]]
+    assert all(c.kwargs == {"changed_only": True} for c in manager.upsert.call_args_list)
+    with OrderStore() as store:
+        assert sorted(store.cases_frame()["case_id"]) == ["1", "3", "5"]
+
+
+def test_sync_cases_include_terminal_fetches_everything(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    manager = _case_manager()
+    fetched = []
+
+    def fake_updates(case_ids, workers):
+        fetched.extend(case_ids)
+        return iter(())
+
+    with patch("gsheet.main.GSheetManager", return_value=manager), \
+         patch("tm.cases.iter_case_updates", side_effect=fake_updates):
+        main.sync_cases(workers=2, batch_size=2, include_terminal=True)
+
+    assert fetched == ["1", "2", "3", "4", "5"]
+    manager.upsert.assert_not_called()
+
+
+# --- export ---
+
+
+def test_export_writes_month_from_store(tmp_path, monkeypatch):
+    import pandas as pd
+    import main
+    from common.sinks import Format
+    from tm.store import OrderStore
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ORDER_STORE_PATH", str(tmp_path / "orders.sqlite3"))
+    with OrderStore() as store:
+        store.upsert_orders([
+            {"order_id": "1", "created_date": "2026-01-31 23:00:00", "updated_date": "2026-02-01 00:00:00"},
+            {"order_id": "2", "created_date": "2026-02-01 00:00:00", "updated_date": "2026-02-01 00:00:00"},
+        ])
+
+    with patch("tm.api.get_all_staff") as get_all_staff:
+        main.export(yearmonth="202601", output_format=Format.csv, gsheet=False, dry_run=False)
+
+    get_all_staff.assert_not_called()
+    assert pd.read_csv(tmp_path / "orders-202601.csv", dtype=str)["order_id"].tolist() == ["1"]
@@ -0,0 +1,149 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+@pytest.fixture
+def registry():
+    """The process-wide registry, emptied before and after the test."""
+    from common.metrics import metrics
+
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def _series(registry, name):
+    return next(row for row in registry.summary() if row["name"] == name)
+
+
+# --- Metrics ---
+
+
+def test_summary_has_percentiles_totals_and_bytes():
+    from common.metrics import Metrics
+
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.observe("tm.x", ms / 1000, nbytes=10)
+    metrics.observe("tm.x", 0.5, error=True)
+
+    row = _series(metrics, "tm.x")
+    assert row["calls"] == 101
+    assert row["errors"] == 1
+    assert row["bytes"] == 1000
+    assert row["p50"] == pytest.approx(0.051)
+    assert row["p95"] == pytest.approx(0.096)
+    assert row["seconds"] == pytest.approx(5.55)
+
+
+def test_samples_stay_bounded():
+    from common.metrics import MAX_SAMPLES, Series
+
+    series = Series("s")
+    for i in range(MAX_SAMPLES * 3):
+        series.add(float(i))
+
+    assert series.calls == MAX_SAMPLES * 3
+    assert len(series.samples) == MAX_SAMPLES
+    assert series.quantile(0.5) > MAX_SAMPLES  # later calls are represented in the sample
+
+
+def test_timer_counts_exceptions_as_errors():
+    from common.metrics import Metrics
+
+    metrics = Metrics()
+    with metrics.timer("op"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timer("op"):
+            raise ValueError
+
+    assert _series(metrics, "op")["calls"] == 2
+    assert _series(metrics, "op")["errors"] == 1
+
+
+def test_prometheus_and_json_export(tmp_path):
+    from common.metrics import Metrics
+
+    metrics = Metrics()
+    metrics.observe("sheets.append", 0.25, nbytes=3)
+
+    metrics.write(str(tmp_path / "run.prom"))
+    metrics.write(str(tmp_path / "run.json"))
+
+    text = (tmp_path / "run.prom").read_text()
+    assert 'tdcollector_seconds{name="sheets.append",quantile="0.95"} 0.25' in text
+    assert 'tdcollector_seconds_count{name="sheets.append"} 1' in text
+    assert 'tdcollector_bytes_total{name="sheets.append"} 3' in text
+    assert json.loads((tmp_path / "run.json").read_text())[0]["calls"] == 1
+    assert not (tmp_path / "run.prom.tmp").exists()
+
+
+def test_report_logs_table_and_writes_metrics_path(registry, tmp_path, monkeypatch, caplog):
+    from common.metrics import report
+
+    monkeypatch.setenv("METRICS_PATH", str(tmp_path / "out" / "metrics.json"))
+    registry.observe("tm.getCaseDetail", 0.1)
+
+    with caplog.at_level("INFO", logger="common.metrics"):
+        report()
+
+    assert "tm.getCaseDetail" in caplog.text
+    assert "p95 ms" in caplog.text
+    assert (tmp_path / "out" / "metrics.json").exists()
+
+
+# --- instrumentation points ---
+
+
+def test_rate_limit_and_retry_are_observed(registry):
+    from common.decorators import rate_limit, retry
+    from common.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=1000, name="bench", sleep=lambda seconds: None)
+    attempts = []
+
+    @retry(exceptions=OSError, tries=3, delay=2)
+    @rate_limit(limiter=bucket)
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError
+
+    with patch("common.decorators.time.sleep"):
+        flaky()
+
+    assert _series(registry, "ratelimit.bench")["calls"] == 3
+    assert _series(registry, "retry.flaky")["calls"] == 2
+    assert _series(registry, "retry.flaky")["seconds"] == 4
+
+
+def test_tm_client_observes_round_trips(registry):
+    from tm.api import TMClient
+
+    session = MagicMock()
+    session.post.return_value = MagicMock(status_code=500, content=b"12345")
+
+    TMClient(cookie="c", session=session).post("/cee/order/v2/getCeeOrderDetail", {"custOrderId": 1})
+
+    row = _series(registry, "tm.getCeeOrderDetail")
+    assert (row["calls"], row["errors"], row["bytes"]) == (1, 1, 5)
+
+
+def test_gsheet_calls_are_observed(registry):
+    from tests.fake_sheets import FakeSheets
+
+    sheets = FakeSheets({"S": [["order_id"], ["1"]]})
+    with patch("gsheet.main._get_sheets_service", return_value=sheets):
+        from gsheet.main import GSheetManager
+
+        GSheetManager(sheet_range="S!A:A", spreadsheet_id="id")._ensure_metadata()
+
+    assert _series(registry, "sheets.get")["calls"] == 2
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
+
+
+# --- helpers ---
+
+
+def _body(name):
+    return (DOCS_DIR / f"{name}.response.json").read_bytes()
+
+
+def _make_staff():
+    return {"staffName": "TEST STAFF", "staffCode": "TS123", "orgName": "TEST CHANNEL"}
+
+
+# --- decode ---
+
+
+def test_order_detail_flattens_like_the_full_json():
+    from tm.flatten import flatten_detail
+    from tm.models import OrderDetailResponse, decode
+
+    body = _body("getCeeOrderDetail")
+    detail = decode(OrderDetailResponse, body)["data"]
+
+    assert flatten_detail(_make_staff(), detail) == flatten_detail(_make_staff(), json.loads(body)["data"])
+    assert "orderItemList" in detail and "paymentList" not in detail
+
+
+def test_order_list_keeps_what_the_harvest_reads():
+    from tm.cache import OrderDetailCache
+    from tm.models import OrderListResponse, decode
+    from tm.utils import _build_fallback_datapoint, order_detail_request
+
+    body = _body("getCeeOrderList")
+    page = decode(OrderListResponse, body)
+    full = json.loads(body)
+
+    assert page["total"] == full["total"]
+    for order, full_order in zip(page["data"], full["data"], strict=True):
+        assert _build_fallback_datapoint(_make_staff(), order) == _build_fallback_datapoint(_make_staff(), full_order)
+        assert order_detail_request(order) == order_detail_request(full_order)
+        assert OrderDetailCache._key(order) == OrderDetailCache._key(full_order)
+
+
+def test_case_detail():
+    from tm.models import CaseDetailResponse, decode
+
+    case = decode(CaseDetailResponse, _body("getCaseDetail"))["data"]["caseDto"]
+
+    assert case == {"caseStateName": "Cancelled", "extMap": {"troikaId": "NJ-1-1000259735"}}
+
+
+def test_a_mismatched_body_is_decoded_in_full(caplog):
+    from tm.models import OrderListResponse, decode
+
+    body = json.dumps({"total": 1, "data": [{"orderId": "1", "orderItemList": [{"serviceType": "79"}]}]}).encode()
+
+    with caplog.at_level("WARNING", logger="tm.models"):
+        page = decode(OrderListResponse, body)
+
+    assert page == json.loads(body)
+    assert "OrderListResponse did not match" in caplog.text
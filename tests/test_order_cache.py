@@ -0,0 +1,161 @@
+import json
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_cache(tmp_path, **kwargs):
+    from tm.cache import OrderDetailCache
+    return OrderDetailCache(path=str(tmp_path / "cache" / "orders.sqlite3"), **kwargs)
+
+
+def _make_staff(name="TEST STAFF", code="TS123", org="TEST CHANNEL"):
+    return {"staffName": name, "staffCode": code, "orgName": org}
+
+
+def _make_order(order_id="12345", state_date="2026-05-30 10:00:00"):
+    return {"orderId": order_id, "orderNbr": order_id, "stateDate": state_date}
+
+
+def _make_row(order_id="12345", **overrides):
+    row = {"order_id": order_id, "status": "Completed", "staffName": "TEST STAFF",
+           "staff_code": "TS123", "channel_name": "TEST CHANNEL"}
+    row.update(overrides)
+    return row
+
+
+def _make_order_detail_response():
+    mock = MagicMock()
+    mock.content = json.dumps({
+        "data": {
+            "orderId": "12345",
+            "stateName": "COMPLETED",
+            "stateDate": "2026-05-30 10:00:00",
+            "orderItemList": [],
+            "installationInfoList": [],
+            "custInfo": {},
+        }
+    }).encode()
+    return mock
+
+
+# --- OrderDetailCache ---
+
+
+def test_cache_miss_then_hit(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        assert cache.get(_make_staff(), _make_order()) is None
+        cache.put(_make_order(), _make_row())
+
+        assert cache.get(_make_staff(), _make_order())["status"] == "Completed"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+
+def test_cache_misses_when_state_date_changes(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        cache.put(_make_order(state_date="2026-05-30 10:00:00"), _make_row())
+
+        assert cache.get(_make_staff(), _make_order(state_date="2026-06-01 09:00:00")) is None
+
+
+def test_cache_replaces_rows_for_older_states(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        cache.put(_make_order(state_date="2026-05-30 10:00:00"), _make_row(status="Pending"))
+        cache.put(_make_order(state_date="2026-06-01 09:00:00"), _make_row(status="Completed"))
+
+        assert len(cache) == 1
+
+
+def test_cache_skips_orders_without_state_date(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        cache.put(_make_order(state_date=None), _make_row())
+
+        assert len(cache) == 0
+        assert cache.get(_make_staff(), _make_order(state_date=None)) is None
+        assert cache.stats()["misses"] == 1
+
+
+def test_cache_overlays_current_staff_fields(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        cache.put(_make_order(), _make_row())
+        row = cache.get(_make_staff(name="RENAMED", code="NEW1", org="NEW ORG"), _make_order())
+
+    assert row["staffName"] == "RENAMED"
+    assert row["staff_code"] == "NEW1"
+    assert row["channel_name"] == "NEW ORG"
+
+
+def test_cache_persists_across_instances(tmp_path):
+    with _make_cache(tmp_path) as cache:
+        cache.put(_make_order(), _make_row())
+
+    with _make_cache(tmp_path) as cache:
+        assert cache.get(_make_staff(), _make_order()) is not None
+
+
+def test_cache_evicts_rows_past_max_age(tmp_path):
+    with _make_cache(tmp_path, max_age_days=1) as cache:
+        with patch("tm.cache.time.time", return_value=1_000_000.0):
+            cache.put(_make_order(), _make_row())
+        with patch("tm.cache.time.time", return_value=1_000_000.0 + 2 * 86400):
+            assert cache.evict() == 1
+
+        assert cache.get(_make_staff(), _make_order()) is None
+
+
+def test_cache_evicts_least_recently_used_beyond_max_entries(tmp_path):
+    with _make_cache(tmp_path, max_entries=2, max_age_days=0) as cache:
+        for i, now in enumerate([100.0, 200.0, 300.0]):
+            with patch("tm.cache.time.time", return_value=now):
+                cache.put(_make_order(order_id=str(i)), _make_row(order_id=str(i)))
+        with patch("tm.cache.time.time", return_value=400.0):
+            cache.get(_make_staff(), _make_order(order_id="0"))  # refresh order 0
+
+        cache.evict()
+
+        assert len(cache) == 2
+        assert cache.get(_make_staff(), _make_order(order_id="1")) is None
+        assert cache.get(_make_staff(), _make_order(order_id="0")) is not None
+
+
+def test_cache_logs_stats(tmp_path, caplog):
+    import logging
+
+    with _make_cache(tmp_path) as cache:
+        cache.get(_make_staff(), _make_order())
+        with caplog.at_level(logging.INFO):
+            cache.log_stats()
+
+    assert "0 hits, 1 misses" in caplog.text
+
+
+# --- process_order with cache ---
+
+
+def test_process_order_skips_detail_request_on_cache_hit(tmp_path):
+    from tm.utils import process_order
+
+    with _make_cache(tmp_path) as cache:
+        with patch("tm.utils.get_order_detail") as mock_get_detail:
+            mock_get_detail.return_value = _make_order_detail_response()
+            first = process_order(_make_staff(), _make_order(), cache=cache)
+            second = process_order(_make_staff(), _make_order(), cache=cache)
+
+    assert mock_get_detail.call_count == 1
+    assert first == second
+
+
+def test_process_order_does_not_cache_fallback_rows(tmp_path):
+    from tm.utils import process_order
+
+    with _make_cache(tmp_path) as cache:
+        with patch("tm.utils.get_order_detail", side_effect=RuntimeError("boom")):
+            process_order(_make_staff(), _make_order(), cache=cache)
+
+        assert len(cache) == 0
@@ -0,0 +1,217 @@
+import threading
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _make_bucket(clock, **kwargs):
+    from common.ratelimit import TokenBucket
+    return TokenBucket(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+# --- TokenBucket ---
+
+
+def test_bucket_allows_burst_without_waiting():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=2, burst=3)
+
+    waits = [bucket.acquire() for _ in range(3)]
+
+    assert waits == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_bucket_paces_calls_after_burst_is_spent():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=2, burst=2)
+
+    for _ in range(4):
+        bucket.acquire()
+
+    assert clock.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=1, burst=1)
+
+    bucket.acquire()
+    clock.now += 5  # idle time never accrues beyond the burst
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_charges_parent_budget():
+    clock = FakeClock()
+    host = _make_bucket(clock, rate=1, burst=1, name="host")
+    a = _make_bucket(clock, rate=10, burst=10, parent=host)
+    b = _make_bucket(clock, rate=10, burst=10, parent=host)
+
+    a.acquire()
+    waited = b.acquire()
+
+    assert waited == pytest.approx(1.0)
+    assert host.stats()["calls"] == 0  # parent is only charged, not recorded
+
+
+def test_bucket_stats_report_waits():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=4, burst=1, name="orders")
+
+    for _ in range(3):
+        bucket.acquire()
+
+    stats = bucket.stats()
+    assert stats["name"] == "orders"
+    assert stats["calls"] == 3
+    assert stats["waits"] == 2
+    assert stats["total_wait"] == pytest.approx(0.5)
+
+
+def test_bucket_queues_concurrent_reservations():
+    """Concurrent reservations must get distinct, increasing wait slots."""
+    from common.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=10, burst=1, clock=lambda: 1000.0)
+    waits = []
+    lock = threading.Lock()
+
+    def reserve():
+        wait = bucket.reserve()
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=reserve) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(waits) == [pytest.approx(i / 10) for i in range(10)]
+
+
+def test_bucket_set_rate_changes_pacing():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=1, burst=1)
+
+    bucket.acquire()
+    bucket.set_rate(4)
+
+    assert bucket.acquire() == pytest.approx(0.25)
+
+
+def test_bucket_rejects_invalid_configuration():
+    from common.ratelimit import TokenBucket
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0)
+
+
+# --- host_limiter ---
+
+
+def test_host_limiter_returns_same_bucket_per_host():
+    from common.ratelimit import host_limiter
+
+    first = host_limiter("example.test", rate=5)
+    again = host_limiter("example.test", rate=99)
+    other = host_limiter("other.test", rate=5)
+
+    assert first is again
+    assert first.rate == 5
+    assert other is not first
+
+
+def test_bucket_hold_delays_every_caller():
+    clock = FakeClock()
+    bucket = _make_bucket(clock, rate=10, burst=5)
+
+    bucket.hold(2)
+
+    assert bucket.acquire() == pytest.approx(2.0)
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+# --- AdaptiveRate ---
+
+
+def _adaptive(clock, rate=1.0, **kwargs):
+    from common.ratelimit import AdaptiveRate
+
+    bucket = _make_bucket(clock, rate=rate)
+    return bucket, AdaptiveRate(bucket, clock=clock, **kwargs)
+
+
+def test_adaptive_rate_probes_up_to_max_while_healthy():
+    clock = FakeClock()
+    bucket, adaptive = _adaptive(clock, rate=1, min_rate=0.5, max_rate=3, increase=1)
+
+    for _ in range(3):
+        adaptive.on_response(0.1)
+    assert 2 < bucket.rate < 3
+
+    for _ in range(100):
+        adaptive.on_response(0.1)
+    assert bucket.rate == 3
+
+
+def test_adaptive_rate_halves_on_throttle_once_per_cooldown():
+    clock = FakeClock()
+    bucket, adaptive = _adaptive(clock, rate=8, min_rate=1, cooldown=1.0)
+
+    adaptive.on_response(0.1, throttled=True)
+    adaptive.on_response(0.1, throttled=True)  # same burst of failures
+    adaptive.on_error()
+    assert bucket.rate == 4
+
+    clock.now += 1.5
+    adaptive.on_error()
+    assert bucket.rate == 2
+
+    for _ in range(5):
+        clock.now += 1.5
+        adaptive.on_error()
+    assert bucket.rate == 1
+    assert adaptive.decreases == 3
+
+
+def test_adaptive_rate_backs_off_on_latency_spike():
+    clock = FakeClock()
+    bucket, adaptive = _adaptive(clock, rate=4, min_rate=1, spike_factor=4)
+
+    for _ in range(10):
+        adaptive.on_response(0.1)
+    adaptive.on_response(0.3)
+    assert bucket.rate == 4
+    adaptive.on_response(1.0)
+    assert bucket.rate == 2
+
+
+def test_adaptive_rate_honours_retry_after():
+    clock = FakeClock()
+    bucket, adaptive = _adaptive(clock, rate=10, min_rate=1, cooldown=0)
+
+    adaptive.on_response(0.1, throttled=True, retry_after=3)
+
+    assert bucket.rate == 5
+    assert bucket.acquire() == pytest.approx(3.0)
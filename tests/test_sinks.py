@@ -0,0 +1,167 @@
+import csv
+import logging
+import time
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+
+# --- helpers ---
+
+
+def _row(i, **extra):
+    return {"staffName": f"STAFF {i % 7}", "order_id": str(i), "status": "Pending", "note": None, **extra}
+
+
+def _chunks(n, size):
+    rows = [_row(i) for i in range(n)]
+    return [rows[i:i + size] for i in range(0, n, size)]
+
+
+# --- sinks ---
+
+
+def test_csv_sink_streams_chunks_with_index_first(tmp_path):
+    from common.sinks import open_sink
+
+    with open_sink("csv", tmp_path / "out") as sink:
+        for chunk in _chunks(5, 2):
+            sink.write(chunk)
+        sink.write([])
+
+    with open(tmp_path / "out.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["order_id", "staffName", "status", "note"]
+    assert [r[0] for r in rows[1:]] == ["0", "1", "2", "3", "4"]
+    assert sink.rows_written == 5
+
+
+def test_sink_columns_are_fixed_by_first_chunk(tmp_path):
+    from common.sinks import CsvSink
+
+    with CsvSink(tmp_path / "out.csv") as sink:
+        sink.write([_row(1)])
+        sink.write([{"order_id": "2", "unexpected": "x"}])
+
+    frame = pd.read_csv(tmp_path / "out.csv", dtype=str, keep_default_na=False)
+    assert list(frame.columns) == ["order_id", "staffName", "status", "note"]
+    assert frame.iloc[1].tolist() == ["2", "", "", ""]
+
+
+def test_xlsx_sink_round_trips(tmp_path):
+    from common.sinks import open_sink
+
+    with open_sink("xlsx", tmp_path / "out") as sink:
+        for chunk in _chunks(10, 3):
+            sink.write(chunk)
+
+    frame = pd.read_excel(tmp_path / "out.xlsx", dtype=str)
+    assert list(frame.columns) == ["order_id", "staffName", "status", "note"]
+    assert frame["order_id"].tolist() == [str(i) for i in range(10)]
+
+
+def test_parquet_sink_round_trips(tmp_path):
+    pytest.importorskip("pyarrow")
+    from common.sinks import open_sink
+
+    with open_sink("parquet", tmp_path / "out") as sink:
+        for chunk in _chunks(10, 4):
+            sink.write(chunk)
+
+    frame = pd.read_parquet(tmp_path / "out.parquet")
+    assert frame["order_id"].tolist() == [str(i) for i in range(10)]
+    assert frame["note"].isna().all()
+
+
+def test_parquet_sink_explains_missing_pyarrow(tmp_path):
+    from common.sinks import ParquetSink
+
+    with patch.dict("sys.modules", {"pyarrow": None}):
+        with pytest.raises(ImportError, match="tdcollector\\[parquet\\]"):
+            ParquetSink(tmp_path / "out.parquet")
+
+
+def test_empty_sink_writes_no_file(tmp_path):
+    from common.sinks import open_sink
+
+    with open_sink("xlsx", tmp_path / "out") as sink:
+        pass
+
+    assert sink.rows_written == 0
+    assert not (tmp_path / "out.xlsx").exists()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_failed_run_leaves_the_previous_file(tmp_path, caplog, fmt):
+    from common.sinks import open_sink
+
+    (tmp_path / f"out.{fmt}").write_text("previous")
+    with caplog.at_level("INFO", logger="common.sinks"), pytest.raises(RuntimeError):
+        with open_sink(fmt, tmp_path / "out") as sink:
+            sink.write([{"order_id": "1"}])
+            raise RuntimeError("harvest failed")
+
+    assert (tmp_path / f"out.{fmt}").read_text() == "previous"
+    assert not (tmp_path / f"out.{fmt}.tmp").exists()
+    assert "Wrote" not in caplog.text
+
+
+# --- _stream_harvest (main) ---
+
+
+def test_stream_harvest_writes_each_staff_and_replays_journal(tmp_path):
+    from common.sinks import CsvSink
+    from main import Engine, _stream_harvest
+    from tm.journal import RunJournal
+
+    staffs = [{"staffId": i, "staffName": f"S{i}"} for i in range(3)]
+    journal = RunJournal("test", directory=str(tmp_path))
+    journal.record(staffs[0], [_row(0)])
+
+    def fake_iter_harvest(staff_list, *args, on_staff=None, **kwargs):
+        assert [s["staffId"] for s in staff_list] == [1, 2]
+        for staff in staff_list:
+            on_staff(staff, [_row(staff["staffId"])])
+            yield staff, [_row(staff["staffId"])]
+
+    with patch("tm.harvest.iter_harvest", side_effect=fake_iter_harvest), CsvSink(tmp_path / "out.csv") as sink:
+        _stream_harvest(Engine.threads, staffs, "Y", None, None, 2, sink, journal=journal, resume=True)
+
+    assert pd.read_csv(tmp_path / "out.csv", dtype=str)["order_id"].tolist() == ["0", "1", "2"]
+    assert set(journal.completed()) == {"0", "1", "2"}
+
+
+# --- benchmark: DataFrame.to_excel vs streaming sinks ---
+
+
+@pytest.mark.benchmark
+def test_benchmark_sinks_vs_to_excel(tmp_path):
+    from common.sinks import open_sink
+
+    chunks = _chunks(20_000, 500)
+
+    started = time.perf_counter()
+    pd.DataFrame([row for chunk in chunks for row in chunk]).set_index("order_id").to_excel(tmp_path / "legacy.xlsx")
+    timings = {"to_excel": time.perf_counter() - started}
+
+    formats = ["xlsx", "csv"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        pass
+    for fmt in formats:
+        started = time.perf_counter()
+        with open_sink(fmt, tmp_path / f"stream-{fmt}") as sink:
+            for chunk in chunks:
+                sink.write(chunk)
+        timings[fmt] = time.perf_counter() - started
+
+    logger.info("20k rows: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+    assert timings["csv"] < timings["to_excel"]
+    assert timings["xlsx"] < timings["to_excel"]
@@ -0,0 +1,31 @@
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+def _make_file(tmp_path):
+    from common.sqlite import SQLiteFile
+
+    db = SQLiteFile(str(tmp_path / "state" / "test.sqlite3"))
+    db._conn.execute("CREATE TABLE items (name TEXT PRIMARY KEY)")
+    return db
+
+
+def test_failed_transaction_is_rolled_back_and_the_connection_stays_usable(tmp_path):
+    with _make_file(tmp_path) as db:
+        with pytest.raises(RuntimeError):
+            with db.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('lost')")
+                raise RuntimeError("serialisation failed")
+
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('kept')")
+
+        assert db._conn.execute("SELECT name FROM items").fetchall() == [("kept",)]
+        assert not db._conn.in_transaction
+
+
+def test_creates_the_directory_and_uses_wal(tmp_path):
+    with _make_file(tmp_path) as db:
+        assert db._conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert (tmp_path / "state" / "test.sqlite3").exists()
@@ -0,0 +1,58 @@
+"""Start-up cost of the CLI.
+
+``main.py --help`` runs under ``python -X importtime``; the slowest imports
+are logged (``pytest tests/test_startup.py --log-cli-level=INFO``) and the
+imports on top of the bare interpreter must stay under 200 ms, which means
+none of pandas, the Google API client or the portal clients may load.
+"""
+import logging
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ("pandas", "numpy", "google", "googleapiclient", "requests", "httpx", "asyncio", "rich")
+HELP_IMPORT_BUDGET = 0.2  # seconds
+
+IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _importtime(*args):
+    """Runs ``python -X importtime *args``; returns cumulative seconds per top-level import, in order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and not match[2]:
+            imports[match[3]] = int(match[1]) / 1_000_000
+    return imports, result.stderr
+
+
+def test_help_imports_no_heavy_dependencies():
+    _, report = _importtime("main.py", "--help")
+
+    loaded = {match[3] for match in map(IMPORT_LINE.match, report.splitlines()) if match}
+    assert [name for name in loaded if name.split(".")[0] in HEAVY] == []
+
+
+def test_help_import_time_is_within_budget():
+    interpreter, _ = _importtime("-c", "pass")
+    imports, _ = _importtime("main.py", "--help")
+
+    cli = {name: seconds for name, seconds in imports.items() if name not in interpreter}
+    total = sum(cli.values())
+    slowest = sorted(cli.items(), key=lambda item: -item[1])[:10]
+    logger.info(
+        f"main.py --help imports: {total * 1000:.0f} ms ("
+        + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in slowest) + ")"
+    )
+    assert total < HELP_IMPORT_BUDGET
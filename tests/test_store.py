@@ -0,0 +1,147 @@
+import sqlite3
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_store(tmp_path):
+    from tm.store import OrderStore
+    return OrderStore(path=str(tmp_path / "store" / "orders.sqlite3"))
+
+
+def _row(order_id, updated_date="2026-01-01 00:00:00", created_date="2026-01-01 00:00:00",
+         status="Pending", staff_code="SC1", staff_name="STAFF 1"):
+    return {
+        "order_id": order_id,
+        "staffName": staff_name,
+        "staff_code": staff_code,
+        "status": status,
+        "created_date": created_date,
+        "updated_date": updated_date,
+    }
+
+
+# --- orders ---
+
+
+def test_upsert_orders_keeps_newest_row(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([_row("1", "2026-01-02 00:00:00", status="new")])
+        store.upsert_orders([_row("1", "2026-01-01 00:00:00", status="old")])
+        store.upsert_orders([_row("2")])
+
+        df = store.orders_frame()
+
+    assert df["order_id"].tolist() == ["1", "2"]
+    assert df.set_index("order_id").loc["1", "status"] == "new"
+
+
+def test_upsert_orders_ties_keep_last_written(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([_row("1", status="first"), _row("1", status="second")])
+
+        assert store.orders_frame()["status"].tolist() == ["second"]
+
+
+def test_fallback_row_does_not_blank_a_stored_row(tmp_path):
+    from tm.flatten import FallbackRow
+
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([_row("1") | {"customer_name": "ACME"}])
+        store.upsert_orders([FallbackRow(_row("1", status="Completed") | {"customer_name": None})])
+
+        row = store.orders_frame().iloc[0]
+
+    assert (row["customer_name"], row["status"]) == ("ACME", "Completed")
+
+
+def test_orders_frame_filters_by_ids_and_window(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([
+            _row("1", created_date="2026-01-15 10:00:00"),
+            _row("2", created_date="2026-02-01 00:00:00"),
+            _row("3", created_date="2026-01-31 23:59:59"),
+        ])
+
+        by_ids = store.orders_frame(order_ids=["3", "1", "404"])
+        by_window = store.orders_frame(created_from="2026-01-01 00:00:00", created_to="2026-01-31 23:59:59")
+
+    assert by_ids["order_id"].tolist() == ["1", "3"]
+    assert by_window["order_id"].tolist() == ["1", "3"]
+
+
+def test_orders_frame_handles_more_ids_than_sqlite_parameters(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([_row(str(i)) for i in range(40_000)])
+
+        assert len(store.orders_frame(order_ids=[str(i) for i in range(40_000)])) == 40_000
+
+
+def test_iter_orders_yields_chunks_of_row_dicts(tmp_path):
+    from tm.flatten import COLUMNS
+
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([_row(f"{i:02d}") for i in range(5)])
+
+        chunks = list(store.iter_orders(chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0][0]) == COLUMNS
+    assert chunks[0][0]["order_id"] == "00"
+
+
+def test_orders_per_staff_month(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.upsert_orders([
+            _row("1", created_date="2026-01-02 00:00:00"),
+            _row("2", created_date="2026-01-03 00:00:00"),
+            _row("3", created_date="2026-02-01 00:00:00"),
+            _row("4", created_date="2026-02-01 00:00:00", staff_code="SC2", staff_name="STAFF 2"),
+        ])
+
+        report = store.orders_per_staff_month()
+
+    assert report.values.tolist() == [
+        ["SC1", "STAFF 1", "2026-01", 2],
+        ["SC1", "STAFF 1", "2026-02", 1],
+        ["SC2", "STAFF 2", "2026-02", 1],
+    ]
+
+
+def test_store_has_lookup_indexes(tmp_path):
+    path = tmp_path / "orders.sqlite3"
+    from tm.store import OrderStore
+    OrderStore(path=str(path)).close()
+
+    with sqlite3.connect(path) as conn:
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_orders_staff_code", "idx_orders_updated_date"} <= indexes
+
+
+# --- cases ---
+
+
+def test_record_cases_adds_snapshot_only_on_change(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.record_cases([("1", "Open", "T1"), ("2", "Open", "")])
+        store.record_cases([("1", "Open", "T1"), ("2", "Closed", "T2")])
+
+        latest = store.cases_frame().set_index("case_id")
+        snapshots = store._conn.execute("SELECT COUNT(*) FROM case_snapshots").fetchone()[0]
+
+    assert latest.loc["2", "status"] == "Closed"
+    assert latest.loc["1", "troika_id"] == "T1"
+    assert snapshots == 3
+
+
+def test_failed_record_cases_is_rolled_back(tmp_path):
+    with _make_store(tmp_path) as store:
+        with pytest.raises(ValueError):
+            store.record_cases([("1", "Open", "T1"), ("2", "Open")])
+        store.record_cases([("3", "Open", "")])
+
+        assert store.cases_frame()["case_id"].tolist() == ["3"]
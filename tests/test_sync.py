@@ -0,0 +1,134 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+def _make_store(tmp_path):
+    from tm.sync import WatermarkStore
+    return WatermarkStore(path=str(tmp_path / "state" / "sync.sqlite3"))
+
+
+def _make_staff(staff_id=1000):
+    return {"staffId": staff_id, "staffName": f"STAFF {staff_id}", "staffCode": "SC", "orgName": "ORG"}
+
+
+# --- is_newer ---
+
+
+def test_is_newer_compares_state_dates():
+    from tm.sync import is_newer
+
+    assert is_newer({"stateDate": "2026-05-02 00:00:00"}, "2026-05-01 23:59:59")
+    assert is_newer({"stateDate": "2026-05-01 23:59:59"}, "2026-05-01 23:59:59")  # same second: resynced
+    assert not is_newer({"stateDate": "2026-05-01 23:59:58"}, "2026-05-01 23:59:59")
+    assert is_newer({"stateDate": "2026-01-01 00:00:00"}, None)
+    assert is_newer({}, "2026-05-01 23:59:59")  # unknown state is always synced
+
+
+# --- WatermarkStore ---
+
+
+def test_watermarks_only_move_forward(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.advance({("ongoing", "1"): "2026-05-02 00:00:00"})
+        store.advance({("ongoing", "1"): "2026-05-01 00:00:00"})
+
+        assert store.get_all("ongoing") == {"1": "2026-05-02 00:00:00"}
+
+
+def test_watermarks_are_kept_per_source(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.advance({
+            ("ongoing", "1"): "2026-05-02 00:00:00",
+            ("historical", "1"): "2026-04-02 00:00:00",
+        })
+
+        assert store.get_all("historical") == {"1": "2026-04-02 00:00:00"}
+        store.reset("historical")
+        assert store.get_all("historical") == {}
+        assert store.get_all("ongoing") == {"1": "2026-05-02 00:00:00"}
+
+
+def test_watermarks_persist(tmp_path):
+    with _make_store(tmp_path) as store:
+        store.advance({("ongoing", "1"): "2026-05-02 00:00:00"})
+    with _make_store(tmp_path) as store:
+        assert store.get_all("ongoing") == {"1": "2026-05-02 00:00:00"}
+
+
+# --- collect_marks ---
+
+
+def test_collect_marks_keeps_newest_updated_date():
+    from tm.sync import collect_marks
+
+    marks = collect_marks("ongoing", _make_staff(7), [
+        {"updated_date": "2026-05-01 10:00:00"},
+        {"updated_date": "2026-05-03 10:00:00"},
+        {"updated_date": None},
+    ], {})
+
+    assert marks == {("ongoing", "7"): "2026-05-03 10:00:00"}
+
+
+def test_collect_marks_stops_at_the_oldest_failed_order():
+    from tm.flatten import FallbackRow
+    from tm.sync import collect_marks
+
+    marks = collect_marks("ongoing", _make_staff(7), [
+        {"updated_date": "2026-05-01 10:00:00"},
+        FallbackRow(updated_date="2026-05-02 10:00:00"),
+        {"updated_date": "2026-05-03 10:00:00"},
+    ], {})
+
+    assert marks == {("ongoing", "7"): "2026-05-02 10:00:00"}
+
+
+# --- harvest with since ---
+
+
+def test_harvest_skips_orders_not_newer_than_mark():
+    from tm.harvest import harvest_orders
+
+    orders = [
+        {"orderId": "old", "stateDate": "2026-05-01 00:00:00"},
+        {"orderId": "new", "stateDate": "2026-05-05 00:00:00"},
+    ]
+
+    with patch("tm.harvest.iter_order_list", return_value=iter(orders)), \
+         patch("tm.harvest.process_orders", side_effect=lambda staff, orders, cache=None: [{"order_id": order["orderId"]} for order in orders]):
+        rows = harvest_orders([_make_staff(1000)], "Y", since={"1000": "2026-05-02 00:00:00"})
+
+    assert rows == [{"order_id": "new"}]
+
+
+# --- month window (main) ---
+
+
+def test_recent_months_walks_calendar_months():
+    from main import _recent_months
+
+    months = _recent_months(3, today=datetime(2026, 3, 31))
+
+    assert [m.strftime("%Y%m") for m in months] == ["202603", "202602", "202601"]
+
+
+def test_recent_months_crosses_year_boundary():
+    from main import _recent_months
+
+    months = _recent_months(2, today=datetime(2026, 1, 15))
+
+    assert [m.strftime("%Y%m") for m in months] == ["202601", "202512"]
+
+
+def test_created_date_range_covers_whole_months():
+    from main import _created_date_range
+
+    assert _created_date_range(datetime(2026, 1, 1), datetime(2026, 2, 1)) == (
+        "20260101000000", "20260228235959"
+    )
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import time
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+logger = logging.getLogger(__name__)
+
+
+# --- helpers ---
+
+
+def _make_staff(staff_id=1, name="TEST STAFF"):
+    return {"staffId": staff_id, "staffName": name, "staffCode": f"SC{staff_id}", "orgName": "ORG"}
+
+
+def _mock_client(handler):
+    """AsyncTMClient whose requests are answered by ``handler(path, payload)``."""
+    import httpx
+    from tm.aio import AsyncTMClient
+
+    def _respond(request):
+        path = request.url.path.removeprefix("/portal/esales/api")
+        status, body = handler(path, json.loads(request.content))
+        return httpx.Response(status, json=body)
+
+    return AsyncTMClient(cookie="c", transport=httpx.MockTransport(_respond))
+
+
+async def _no_sleep(seconds):
+    return None
+
+
+# --- AsyncTMClient ---
+
+
+def test_async_client_signs_requests(fast_limits):
+    from tm.api import generateSigncode
+    from tm.aio import get_staff
+
+    seen = {}
+
+    async def run():
+        import httpx
+        from tm.aio import AsyncTMClient
+
+        def _respond(request):
+            seen["headers"] = request.headers
+            seen["path"] = request.url.path
+            return httpx.Response(200, json={"data": []})
+
+        async with AsyncTMClient(cookie="COOKIE_VALUE", transport=httpx.MockTransport(_respond)) as client:
+            await get_staff(client, {"pageSize": 50, "pageNum": 1})
+
+    asyncio.run(run())
+
+    assert seen["path"] == "/portal/esales/api/saleschannel/qryStaffList"
+    assert seen["headers"]["cookie"] == "COOKIE_VALUE"
+    assert seen["headers"]["signcode"] == generateSigncode(
+        "post", "/saleschannel/qryStaffList", {"pageSize": 50, "pageNum": 1}
+    )
+
+
+# --- async pagination ---
+
+
+def test_get_all_staff_pages_until_short_page(fast_limits):
+    from tm.aio import get_all_staff
+
+    pages = {1: [{"staffId": i} for i in range(50)], 2: [{"staffId": 50}]}
+
+    def handler(path, payload):
+        return 200, {"data": pages[payload["pageNum"]]}
+
+    async def run():
+        async with _mock_client(handler) as client:
+            return await get_all_staff(client)
+
+    staffs = asyncio.run(run())
+    assert [s["staffId"] for s in staffs] == list(range(51))
+
+
+def test_iter_order_list_yields_orders_across_pages(fast_limits):
+    from tm.aio import iter_order_list
+
+    def handler(path, payload):
+        assert payload["partyCodes"] == 42
+        if payload["pageNum"] == 1:
+            return 200, {"data": [{"orderId": i} for i in range(50)]}
+        return 200, {"data": []}
+
+    async def run():
+        async with _mock_client(handler) as client:
+            return [order async for order in iter_order_list(client, 42, "Y")]
+
+    assert len(asyncio.run(run())) == 50
+
+
+# --- process_order / harvest ---
+
+
+def test_process_order_falls_back_when_detail_fails(fast_limits, monkeypatch):
+    from tm.aio import process_order
+
+    monkeypatch.setattr("asyncio.sleep", _no_sleep)
+
+    def handler(path, payload):
+        return 500, {"code": "500"}
+
+    order = {"orderId": "1", "orderNbr": "1", "stateName": "Pending", "mainOfferName": "BUNDLE"}
+
+    async def run():
+        async with _mock_client(handler) as client:
+            return await process_order(client, _make_staff(), order)
+
+    datapoint = asyncio.run(run())
+    assert datapoint["order_id"] == "1"
+    assert datapoint["bundle_name"] == "BUNDLE"
+
+
+def test_harvest_orders_against_stub_portal(fast_limits):
+    from tests.stub_portal import StubPortal
+    from tm.aio import AsyncTMClient, get_all_staff, harvest_orders
+
+    async def run(base_url):
+        async with AsyncTMClient(cookie="c", base_url=base_url) as client:
+            staffs = await get_all_staff(client)
+            return await harvest_orders(client, staffs, "Y", concurrency=20)
+
+    with StubPortal(staff_count=3, orders_per_staff=4) as portal:
+        rows = asyncio.run(run(portal.base_url))
+
+    assert len(rows) == 12
+    assert rows[0]["staffName"] == "STAFF 0"
+    assert rows[0]["customer_name"] == "BLUEWAY SDN. BHD."
+    assert portal.calls["/cee/order/v2/getCeeOrderDetail"] == 12
+
+
+# --- benchmark: async vs sync ---
+
+
+@pytest.mark.benchmark
+def test_benchmark_async_vs_sync_order_details(fast_limits):
+    """With 20ms portal latency, one event loop should beat the serial sync path."""
+    from tests.stub_portal import StubPortal
+    from tm import api
+    from tm.aio import AsyncTMClient, harvest_orders
+    from tm.api import TMClient
+    from tm.utils import process_order
+
+    staffs = [_make_staff(600000 + i, f"STAFF {i}") for i in range(2)]
+
+    with StubPortal(staff_count=2, orders_per_staff=15, latency=0.02) as portal:
+        previous = api._client
+        api.set_client(TMClient(cookie="c", base_url=portal.base_url))
+        try:
+            started = time.perf_counter()
+            sync_rows = [
+                process_order(staff=staff, order=order)
+                for staff in staffs
+                for order in api.get_all_order_list(staff["staffId"], "Y")
+            ]
+            sync_elapsed = time.perf_counter() - started
+        finally:
+            api.set_client(previous)
+
+        async def run():
+            async with AsyncTMClient(cookie="c", base_url=portal.base_url) as client:
+                return await harvest_orders(client, staffs, "Y", concurrency=50)
+
+        started = time.perf_counter()
+        async_rows = asyncio.run(run())
+        async_elapsed = time.perf_counter() - started
+
+    logger.info(
+        f"{len(sync_rows)} orders: sync {sync_elapsed:.3f}s "
+        f"({len(sync_rows) / sync_elapsed:.0f} orders/s), async {async_elapsed:.3f}s "
+        f"({len(async_rows) / async_elapsed:.0f} orders/s)"
+    )
+    assert async_rows == sync_rows
+    assert async_elapsed < sync_elapsed
+
+
+def test_iter_order_list_fetches_pages_from_total(fast_limits):
+    from tm.aio import iter_order_list
+
+    requested = []
+
+    def handler(path, payload):
+        n = payload["pageNum"]
+        requested.append(n)
+        return 200, {"total": 120, "data": [{"orderId": i} for i in range((n - 1) * 50, min(n * 50, 120))]}
+
+    async def run():
+        async with _mock_client(handler) as client:
+            return [order["orderId"] async for order in iter_order_list(client, 42, "Y")]
+
+    assert asyncio.run(run()) == list(range(120))
+    assert sorted(requested) == [1, 2, 3]
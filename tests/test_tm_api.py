@@ -0,0 +1,271 @@
+from json import dumps
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+pytestmark = pytest.mark.unit
+
+
+# --- helpers ---
+
+
+class FakeSession:
+    """Records posted requests and answers with canned JSON bodies."""
+
+    def __init__(self, bodies=None, status_code=200):
+        self.bodies = list(bodies or [{"code": "200", "data": []}])
+        self.status_code = status_code
+        self.calls = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.calls.append({"url": url, "headers": headers, "json": json, "timeout": timeout})
+        body = self.bodies.pop(0) if len(self.bodies) > 1 else self.bodies[0]
+        response = MagicMock()
+        response.status_code = self.status_code
+        response.json.return_value = body
+        response.content = dumps(body).encode()
+        if self.status_code >= 400:
+            import requests
+            response.raise_for_status.side_effect = requests.exceptions.HTTPError(str(self.status_code))
+        return response
+
+    def close(self):
+        pass
+
+
+def _make_client(session, **kwargs):
+    from tm.api import TMClient
+    return TMClient(cookie="COOKIE_VALUE", session=session, **kwargs)
+
+
+@pytest.fixture
+def fake_client():
+    """Installs a TMClient backed by a FakeSession as the process-wide client."""
+    from tm import api
+
+    session = FakeSession()
+    client = _make_client(session, timeout=5)
+    previous = api._client
+    api.set_client(client)
+    yield client
+    api.set_client(previous)
+
+
+# --- TMClient ---
+
+
+def test_client_posts_signed_request_with_cookie_and_timeout():
+    from tm.api import PORTAL_BASE_URL, generateSigncode
+
+    session = FakeSession()
+    client = _make_client(session, timeout=7)
+    data = {"pageSize": 50, "pageNum": 1}
+
+    client.post("/saleschannel/qryStaffList", data)
+
+    call = session.calls[0]
+    assert call["url"] == f"{PORTAL_BASE_URL}/saleschannel/qryStaffList"
+    assert call["headers"]["Cookie"] == "COOKIE_VALUE"
+    assert call["headers"]["signcode"] == generateSigncode("post", "/saleschannel/qryStaffList", data)
+    assert call["json"] == data
+    assert call["timeout"] == 7
+
+
+def test_client_builds_pooled_keep_alive_session():
+    from tm.api import TMClient
+
+    client = TMClient(cookie="c", pool_size=16)
+    adapter = client.session.get_adapter("https://dealer.unifi.com.my/")
+
+    assert adapter._pool_maxsize == 16
+    client.close()
+
+
+def test_client_falls_back_to_module_cookie():
+    from tm.api import TMClient
+
+    session = FakeSession()
+    with patch("tm.api.COOKIE", "FROM_ENV"):
+        TMClient(session=session).post("/x", {})
+
+    assert session.calls[0]["headers"]["Cookie"] == "FROM_ENV"
+
+
+# --- module functions go through the shared client ---
+
+
+def test_get_staff_uses_process_wide_client(fake_client):
+    from tm.api import get_staff
+
+    get_staff({"pageSize": 10, "pageNum": 1})
+
+    assert fake_client.session.calls[0]["url"].endswith("/saleschannel/qryStaffList")
+
+
+def test_get_case_detail_raises_for_status(fake_client):
+    import requests
+    from tm.api import get_case_detail
+
+    fake_client.session.status_code = 500
+    with patch("common.decorators.time.sleep"):
+        with pytest.raises(requests.exceptions.HTTPError):
+            get_case_detail({"caseId": "1"})
+
+    assert len(fake_client.session.calls) == 5  # retried by the decorator
+
+
+def test_get_order_detail_retries_dropped_and_timed_out_connections(fake_client):
+    import requests
+    from tm.api import get_order_detail
+
+    answer = fake_client.session.post
+    outcomes = [requests.exceptions.ConnectionError("reset"), requests.exceptions.Timeout("slow")]
+
+    def flaky_post(*args, **kwargs):
+        if outcomes:
+            raise outcomes.pop(0)
+        return answer(*args, **kwargs)
+
+    with patch.object(fake_client.session, "post", side_effect=flaky_post) as post, \
+         patch("common.decorators.time.sleep"):
+        assert get_order_detail({"custOrderId": "1"}).status_code == 200
+
+    assert post.call_count == 3
+
+
+def test_get_order_list_retries_http_errors(fake_client):
+    import requests
+    from tm.api import get_order_list
+
+    fake_client.session.status_code = 429
+    with patch("common.decorators.time.sleep"):
+        with pytest.raises(requests.exceptions.HTTPError):
+            get_order_list({"pageNum": 1})
+
+    assert len(fake_client.session.calls) == 5
+
+
+def test_get_client_reuses_one_instance():
+    from tm import api
+
+    previous = api._client
+    api.set_client(None)
+    try:
+        assert api.get_client() is api.get_client()
+    finally:
+        api.set_client(previous)
+
+
+# --- paginate ---
+
+
+def _make_pages(total, page_size=50):
+    items = list(range(total))
+    return {
+        n: {"total": total, "data": items[(n - 1) * page_size:n * page_size]}
+        for n in range(1, total // page_size + 2)
+    }
+
+
+def test_paginate_uses_total_to_skip_trailing_empty_page():
+    from tm.api import paginate
+
+    pages = _make_pages(100)
+    requested = []
+
+    def fetch_page(n):
+        requested.append(n)
+        return pages[n]
+
+    assert paginate(fetch_page, workers=2) == list(range(100))
+    assert sorted(requested) == [1, 2]  # exact multiple: no page 3 round trip
+
+
+def test_paginate_fetches_remaining_pages_concurrently_in_order():
+    import threading
+    from tm.api import paginate
+
+    pages = _make_pages(201)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch_page(n):
+        if n > 1 and n < 5:
+            barrier.wait()  # pages 2-4 must be in flight together
+        return pages[n]
+
+    assert paginate(fetch_page, workers=4) == list(range(201))
+
+
+def test_paginate_falls_back_to_short_page_without_total():
+    from tm.api import paginate
+
+    pages = {1: {"data": list(range(50))}, 2: {"data": list(range(50, 60))}}
+    requested = []
+
+    def fetch_page(n):
+        requested.append(n)
+        return pages[n]
+
+    assert paginate(fetch_page) == list(range(60))
+    assert requested == [1, 2]
+
+
+def test_paginate_single_page():
+    from tm.api import paginate
+
+    assert paginate(lambda n: {"total": 0, "data": []}) == []
+
+
+def test_get_all_order_list_reads_total_from_first_page(fake_client):
+    from tm.api import get_all_order_list
+
+    fake_client.session.bodies = [
+        {"total": 60, "data": [{"orderId": i} for i in range(50)]},
+        {"total": 60, "data": [{"orderId": i} for i in range(50, 60)]},
+    ]
+
+    orders = get_all_order_list(621394, "Y", "20250401000000", "20250430235959")
+
+    assert [o["orderId"] for o in orders] == list(range(60))
+    assert [c["json"]["pageNum"] for c in fake_client.session.calls] == [1, 2]
+
+
+def test_get_all_staff_raises_when_data_missing(fake_client):
+    from tm.api import get_all_staff
+
+    fake_client.session.bodies = [{"code": "401", "message": "Session expired"}]
+
+    with pytest.raises(Exception, match="Session expired"):
+        get_all_staff()
+
+
+def test_iter_pages_yields_first_page_while_later_pages_are_in_flight():
+    import threading
+    from tm.api import iter_pages
+
+    pages = _make_pages(120)
+    first_page_consumed = threading.Event()
+    page_two_started = threading.Event()
+
+    def fetch_page(n):
+        if n == 2:
+            page_two_started.set()
+            assert first_page_consumed.wait(timeout=5)
+        return pages[n]
+
+    stream = iter_pages(fetch_page, workers=2)
+    assert next(stream) == list(range(50))
+    assert page_two_started.wait(timeout=5)  # already requested before page 1 was handed out
+    first_page_consumed.set()
+
+    assert [item for page in stream for item in page] == list(range(50, 120))
+
+
+def test_iter_order_list_streams_orders(fake_client):
+    from tm.api import iter_order_list
+
+    fake_client.session.bodies = [{"total": 2, "data": [{"orderId": 1}, {"orderId": 2}]}]
+    stream = iter_order_list(621394, "N")
+
+    assert next(stream) == {"orderId": 1}
+    assert list(stream) == [{"orderId": 2}]
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -28,7 +30,7 @@ def _make_order(order_id="12345", order_nbr="ORD123", state="COMPLETED",
 def _make_order_detail_response():
     """Minimal mock get_order_detail response for process_order tests."""
     mock = MagicMock()
-    mock.json.return_value = {
+    mock.content = json.dumps({
         "data": {
             "orderId": "12345",
             "stateName": "COMPLETED",
@@ -39,7 +41,7 @@ def _make_order_detail_response():
             "custInfo": {},
             "eventTypeName": "NEW",
         }
-    }
+    }).encode()
     return mock
 
 
@@ -72,6 +74,45 @@ def test_process_order_carries_channel_name():
     assert datapoint["channel_name"] == "MY CHANNEL"
 
 
+def test_process_order_falls_back_when_detail_has_no_items():
+    from tm.utils import process_order
+
+    order = _make_order() | {"orderItemList": [{"serviceType": 79, "accNbr": "acc@unifi", "acctNbr": "123"}]}
+    response = MagicMock()
+    response.content = json.dumps({"data": {"orderId": "12345", "stateName": "COMPLETED"}}).encode()
+
+    with patch("tm.utils.get_order_detail", return_value=response):
+        datapoint = process_order(_make_staff(), order)
+
+    assert (datapoint["tm_account_id"], datapoint["account_nbr"]) == ("acc@unifi", "123")
+
+
+def test_process_orders_flattens_fetched_details_together_in_order(tmp_path):
+    import requests
+    from tm.cache import OrderDetailCache
+    from tm.flatten import FallbackRow, flatten_batch
+    from tm.utils import process_orders
+
+    orders = [_make_order(order_id=str(n), state_date=f"2026-05-3{n}") for n in range(3)]
+
+    def get_detail(data):
+        if data["custOrderId"] == "1":
+            raise requests.exceptions.HTTPError("500")
+        return _make_order_detail_response()
+
+    with OrderDetailCache(path=str(tmp_path / "orders.sqlite3")) as cache, \
+         patch("tm.utils.get_order_detail", side_effect=get_detail), \
+         patch("tm.utils.flatten_batch", wraps=flatten_batch) as batch:
+        rows = process_orders(_make_staff(), iter(orders), cache=cache)
+
+        assert len(cache) == 2
+
+    assert [type(row) for row in rows] == [dict, FallbackRow, dict]
+    assert rows[1]["order_id"] == "1"
+    assert batch.call_count == 1
+    assert len(batch.call_args[0][1]) == 2
+
+
 # --- _build_fallback_datapoint ---
 
 
@@ -0,0 +1,283 @@
+"""Asyncio variant of the TM portal API.
+
+Mirrors the blocking functions in ``tm.api`` as coroutines on top of an
+``httpx.AsyncClient``, so hundreds of order-detail requests can be in
+flight inside one event loop. Requests draw from the same token buckets
+as ``tm.api``, so sync and async callers share one portal budget.
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+
+from common import metrics, rate_limit, retry, retry_after_seconds
+from common.configurations import get_portal_pool_size, get_portal_timeout
+from tm import api
+from tm.api import (
+    PAGE_SIZE,
+    PORTAL_BASE_URL,
+    RETRY_POLICY,
+    case_detail_limiter,
+    endpoint_name,
+    generateSigncode,
+    order_detail_limiter,
+    order_list_limiter,
+    page_count,
+    record_response,
+    staff_limiter,
+)
+from tm.models import OrderDetailResponse, OrderListResponse, decode
+from tm.utils import _build_fallback_datapoint, check_detail, flatten_fetched, order_detail_request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 100
+
+# Async counterpart of ``tm.api.RETRY_ERRORS``.
+RETRY_ERRORS = (httpx.HTTPStatusError, httpx.NetworkError, httpx.TimeoutException)
+
+
+class AsyncTMClient:
+    """Async counterpart of ``tm.api.TMClient`` backed by ``httpx.AsyncClient``.
+
+    Args:
+        cookie: Portal session cookie (default: the ``COOKIE`` env value)
+        base_url: API root the endpoint paths are appended to
+        pool_size: Maximum number of pooled connections (default: TM_POOL_SIZE)
+        timeout: Request timeout in seconds (default: TM_TIMEOUT)
+        transport: Optional httpx transport, e.g. ``httpx.MockTransport`` in tests
+    """
+
+    def __init__(self, cookie=None, base_url=PORTAL_BASE_URL, pool_size=None, timeout=None, transport=None):
+        self.cookie = cookie
+        self.base_url = base_url
+        pool_size = pool_size or get_portal_pool_size()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout or get_portal_timeout(),
+            transport=transport,
+        )
+
+    async def post(self, path, data):
+        """Signs and posts ``data`` to ``path``, returning the raw response."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(
+                f"{self.base_url}{path}",
+                headers={
+                    "Cookie": self.cookie if self.cookie is not None else api.COOKIE,
+                    "signcode": generateSigncode("post", path, data),
+                },
+                json=data,
+            )
+        except Exception:
+            latency = time.perf_counter() - started
+            metrics.observe(f"tm.{endpoint_name(path)}", latency, error=True)
+            record_response(path, latency)
+            raise
+        latency = time.perf_counter() - started
+        metrics.observe(
+            f"tm.{endpoint_name(path)}", latency, nbytes=len(response.content), error=response.status_code >= 400,
+        )
+        record_response(path, latency, response.status_code, retry_after_seconds(response))
+        return response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+# --- Pagination ---
+
+
+async def paginate(fetch_page, page_size=PAGE_SIZE):
+    """Async counterpart of ``tm.api.paginate`` that yields items as pages arrive.
+
+    Pages after the first are requested together once ``total`` is known;
+    the endpoint's rate limiter paces them.
+    """
+    first = await fetch_page(1)
+    for item in first["data"]:
+        yield item
+    total = first.get("total")
+
+    if total is None:
+        page_number, data = 1, first["data"]
+        while len(data) == page_size:
+            page_number += 1
+            data = (await fetch_page(page_number))["data"]
+            for item in data:
+                yield item
+        return
+
+    tasks = [asyncio.ensure_future(fetch_page(n)) for n in range(2, page_count(total, page_size) + 1)]
+    try:
+        for task in tasks:
+            for item in (await task)["data"]:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# --- Staff Functions ---
+
+
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=staff_limiter)
+async def get_staff(client, data):
+    response = await client.post("/saleschannel/qryStaffList", data)
+    response.raise_for_status()
+    return response
+
+
+async def iter_all_staff(client):
+    """Async generator over every staff, page by page."""
+    async def fetch_page(page_number):
+        response = await get_staff(client, {"pageSize": PAGE_SIZE, "pageNum": page_number})
+        result_json = response.json()
+        if "data" not in result_json:
+            raise Exception(result_json)
+        return result_json
+
+    async for staff in paginate(fetch_page):
+        yield staff
+
+
+async def get_all_staff(client):
+    return [staff async for staff in iter_all_staff(client)]
+
+
+# --- Order Functions ---
+
+
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=order_list_limiter)
+async def get_order_list(client, data):
+    response = await client.post("/cee/order/v2/getCeeOrderList", data)
+    response.raise_for_status()
+    return response
+
+
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=order_detail_limiter)
+async def get_order_detail(client, data):
+    response = await client.post("/cee/order/v2/getCeeOrderDetail", data)
+    response.raise_for_status()
+    return response
+
+
+async def iter_order_list(client, staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+    """Async generator over every order of one staff, page by page."""
+    async def fetch_page(page_number):
+        data = {
+            "createdDateFrom": createdDateFrom,
+            "createdDateTo": createdDateTo,
+            "dPartyType": "E",
+            "extData": {"drmOrderOptimizeQuery": "Y"},
+            "onWayFlag": onWayFlag,
+            "pageNum": page_number,
+            "pageSize": PAGE_SIZE,
+            "partyCodes": staffId,
+        }
+        response = await get_order_list(client, data)
+        return decode(OrderListResponse, response.content)
+
+    async for order in paginate(fetch_page):
+        yield order
+
+
+async def get_all_order_list(client, staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+    return [
+        order
+        async for order in iter_order_list(client, staffId, onWayFlag, createdDateFrom, createdDateTo)
+    ]
+
+
+async def fetch_order(client, staff, order, cache=None):
+    """Async counterpart of ``tm.utils.fetch_order``."""
+    if cache is not None:
+        cached = cache.get(staff, order)
+        if cached is not None:
+            return cached, None
+    try:
+        response = await get_order_detail(client, order_detail_request(order))
+        order_detail = decode(OrderDetailResponse, response.content)["data"]
+        check_detail(staff, order_detail)
+        return None, order_detail
+    except Exception as e:
+        logger.warning(f"Failed to fetch detail for order {order.get('orderId')}: {e}")
+        return _build_fallback_datapoint(staff, order), None
+
+
+async def process_order(client, staff, order, cache=None):
+    """Async counterpart of ``tm.utils.process_order``."""
+    fetched = await fetch_order(client, staff, order, cache=cache)
+    return flatten_fetched(staff, [order], [fetched], cache=cache)[0]
+
+
+# --- Case Functions ---
+
+
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=case_detail_limiter)
+async def get_case_detail(client, data):
+    response = await client.post("/csc/getCaseDetail", data)
+    response.raise_for_status()
+    return response
+
+
+# --- Harvesting ---
+
+
+async def harvest_orders(client, staffs, on_way_flag, created_date_from=None, created_date_to=None, concurrency=DEFAULT_CONCURRENCY, cache=None, on_staff=None, collect=True):
+    """Fetches and flattens orders for every staff inside one event loop.
+
+    Order lists and order details for all staff are requested concurrently;
+    ``concurrency`` caps the number of requests in flight while the shared
+    token buckets keep the portal's rate limits. Rows come back in staff order.
+    ``on_staff(staff, rows)`` is called as each staff finishes; with
+    ``collect=False`` the rows are left to it and an empty list is returned.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    total = len(staffs)
+
+    async def _bounded(coro):
+        async with semaphore:
+            return await coro
+
+    async def _harvest_staff(idx, staff):
+        all_order = await _bounded(
+            get_all_order_list(client, staff["staffId"], on_way_flag, created_date_from, created_date_to)
+        )
+        logger.info(f"Progress {idx+1}/{total}: [{staff["staffId"]}] {staff["staffName"]} with order {len(all_order)} counts")
+        fetched = await asyncio.gather(
+            *(_bounded(fetch_order(client, staff, order, cache=cache)) for order in all_order)
+        )
+        rows = flatten_fetched(staff, all_order, fetched, cache=cache)
+        if on_staff is not None:
+            on_staff(staff, rows)
+        return rows if collect else []
+
+    results = await asyncio.gather(
+        *(_harvest_staff(idx, staff) for idx, staff in enumerate(staffs))
+    )
+    return [row for rows in results for row in rows]
+
+
+def run_harvest(staffs, on_way_flag, created_date_from=None, created_date_to=None, concurrency=DEFAULT_CONCURRENCY, cache=None, on_staff=None, collect=True):
+    """Blocking entry point that runs ``harvest_orders`` in a fresh event loop."""
+    async def _run():
+        async with AsyncTMClient() as client:
+            return await harvest_orders(
+                client, staffs, on_way_flag, created_date_from, created_date_to,
+                concurrency=concurrency, cache=cache, on_staff=on_staff, collect=collect,
+            )
+
+    return asyncio.run(_run())
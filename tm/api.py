@@ -5,16 +5,121 @@ from hashlib import sha256
 from urllib.parse import urlencode
 import re
 import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from common import rate_limit, retry
+from requests.adapters import HTTPAdapter
+from common import (
+    AdaptiveRate,
+    RetryBudget,
+    TokenBucket,
+    host_limiter,
+    metrics,
+    rate_limit,
+    retry,
+    retry_after_seconds,
+)
+from common.configurations import (
+    get_portal_host_rate_limit,
+    get_portal_page_workers,
+    get_portal_pool_size,
+    get_portal_rate_burst,
+    get_portal_rate_limit,
+    get_portal_rate_max,
+    get_portal_rate_min,
+    get_portal_retry_budget,
+    get_portal_retry_budget_period,
+    get_portal_timeout,
+)
+from tm.models import OrderListResponse, decode
 
 load_dotenv()
 
 COOKIE = os.getenv("COOKIE")
+PORTAL_HOST = "dealer.unifi.com.my"
+PORTAL_BASE_URL = f"https://{PORTAL_HOST}/portal/esales/api"
+PAGE_SIZE = 50
 
 logger = logging.getLogger(__name__)
 
 
+def _portal_host_limiter():
+    """Optional budget shared by every endpoint on the portal host."""
+    rate = get_portal_host_rate_limit()
+    if rate is None:
+        return None
+    return host_limiter(PORTAL_HOST, rate=rate, burst=get_portal_rate_burst())
+
+
+def _endpoint_limiter(name):
+    return TokenBucket(
+        rate=get_portal_rate_limit(),
+        burst=get_portal_rate_burst(),
+        parent=_portal_host_limiter(),
+        name=name,
+    )
+
+
+# Each endpoint keeps its own budget; staff list and detail share theirs.
+staff_limiter = _endpoint_limiter("saleschannel")
+order_list_limiter = _endpoint_limiter("getCeeOrderList")
+order_detail_limiter = _endpoint_limiter("getCeeOrderDetail")
+case_detail_limiter = _endpoint_limiter("getCaseDetail")
+
+
+# AIMD control of each endpoint's rate from the responses it gets (see AdaptiveRate).
+def _adaptive(limiter):
+    return AdaptiveRate(limiter, min_rate=get_portal_rate_min(), max_rate=get_portal_rate_max())
+
+
+_staff_rate = _adaptive(staff_limiter)
+adaptive_rates = {
+    "qryStaffList": _staff_rate,
+    "getStaffDetail": _staff_rate,
+    "getCeeOrderList": _adaptive(order_list_limiter),
+    "getCeeOrderDetail": _adaptive(order_detail_limiter),
+    "getCaseDetail": _adaptive(case_detail_limiter),
+}
+
+# Retries of the whole run, so nested and concurrent retries can't multiply.
+retry_budget = RetryBudget(get_portal_retry_budget(), period=get_portal_retry_budget_period())
+
+# Exponential back-off with jitter for portal requests: ~1s, 2s, 4s, 8s.
+RETRY_POLICY = {"tries": 5, "delay": 1, "backoff": 2, "max_delay": 30, "jitter": 0.5, "budget": retry_budget}
+
+# HTTP errors and dropped or timed-out connections are all worth another try.
+RETRY_ERRORS = (requests.exceptions.HTTPError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def record_response(path, latency, status=None, retry_after=None):
+    """Feeds a portal response (or, with no ``status``, a failed request) to its endpoint's AdaptiveRate."""
+    adaptive = adaptive_rates.get(endpoint_name(path))
+    if adaptive is None:
+        return
+    if status is None:
+        adaptive.on_error()
+    else:
+        adaptive.on_response(latency, throttled=status == 429 or status >= 500, retry_after=retry_after)
+
+
+def log_rate_limit_stats():
+    """Logs how long callers waited on each portal rate limit."""
+    for limiter in (staff_limiter, order_list_limiter, order_detail_limiter, case_detail_limiter):
+        stats = limiter.stats()
+        if stats["calls"]:
+            logger.info(
+                f"Rate limit [{stats['name']}]: {stats['calls']} calls, "
+                f"{stats['waits']} waited, {stats['total_wait']:.1f}s total wait"
+            )
+
+
+def endpoint_name(path):
+    """Metrics label of an API path, e.g. ``getCeeOrderDetail``."""
+    return path.rstrip("/").rsplit("/", 1)[-1]
+
+
 def generateSigncode(method: str, path: str, data: dict):
     def hash(content):
         return sha256(content.encode("utf-8")).hexdigest()
@@ -28,64 +133,192 @@ def generateSigncode(method: str, path: str, data: dict):
         return hash(path + jsonString + "32BytesString")
 
 
+class TMClient:
+    """Pooled HTTP client for the TM portal API.
+
+    Owns a keep-alive ``requests.Session`` so consecutive calls reuse the
+    same TLS connection instead of handshaking on every request. Tests (or
+    callers that want a different transport) can pass their own ``session``;
+    anything with a ``post(url, headers=..., json=..., timeout=...)`` method
+    works.
+
+    Args:
+        cookie: Portal session cookie (default: the ``COOKIE`` env value)
+        base_url: API root the endpoint paths are appended to
+        pool_size: Maximum number of pooled connections (default: TM_POOL_SIZE)
+        timeout: Request timeout in seconds (default: TM_TIMEOUT)
+        session: Pre-built session or fake transport to send requests through
+    """
+
+    def __init__(self, cookie=None, base_url=PORTAL_BASE_URL, pool_size=None, timeout=None, session=None):
+        self.cookie = cookie
+        self.base_url = base_url
+        self.pool_size = pool_size or get_portal_pool_size()
+        self.timeout = timeout or get_portal_timeout()
+        self.session = session if session is not None else self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _headers(self, path, data):
+        return {
+            "Cookie": self.cookie if self.cookie is not None else COOKIE,
+            "signcode": generateSigncode("post", path, data),
+        }
+
+    def post(self, path, data):
+        """Signs and posts ``data`` to ``path``, returning the raw response."""
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                headers=self._headers(path, data),
+                json=data,
+                timeout=self.timeout,
+            )
+        except Exception:
+            latency = time.perf_counter() - started
+            metrics.observe(f"tm.{endpoint_name(path)}", latency, error=True)
+            record_response(path, latency)
+            raise
+        latency = time.perf_counter() - started
+        metrics.observe(
+            f"tm.{endpoint_name(path)}", latency, nbytes=len(response.content), error=response.status_code >= 400,
+        )
+        record_response(path, latency, response.status_code, retry_after_seconds(response))
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide TMClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TMClient()
+        return _client
+
+
+def set_client(client):
+    """Replaces the process-wide TMClient (e.g. with a fake transport in tests)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+# --- Pagination ---
+
+
+def page_count(total, page_size):
+    return max(1, math.ceil(total / page_size))
+
+
+def iter_pages(fetch_page, page_size=PAGE_SIZE, workers=None):
+    """Yields the ``data`` of every page of a paginated list endpoint, in order.
+
+    Page 1 is fetched first; its ``total`` tells how many pages remain, and
+    those are requested concurrently (each fetch still goes through the
+    endpoint's rate limiter) before page 1 is handed to the caller, so the
+    caller can work on one page while the next ones are in flight. This
+    also skips the trailing empty page when ``total`` is an exact multiple
+    of the page size. Responses without ``total`` fall back to walking pages
+    one by one until a short page comes back.
+
+    Args:
+        fetch_page: Callable taking a 1-based page number and returning the decoded JSON body
+        page_size: Page size the requests were made with
+        workers: Maximum pages in flight at once (default: TM_PAGE_WORKERS)
+    """
+    first = fetch_page(1)
+    total = first.get("total")
+
+    if total is None:
+        page_number, data = 1, first["data"]
+        yield data
+        while len(data) == page_size:
+            page_number += 1
+            data = fetch_page(page_number)["data"]
+            yield data
+        return
+
+    pages = page_count(total, page_size)
+    if pages == 1:
+        yield first["data"]
+        return
+
+    workers = workers or get_portal_page_workers()
+    executor = ThreadPoolExecutor(max_workers=min(workers, pages - 1), thread_name_prefix="page")
+    try:
+        futures = [executor.submit(fetch_page, n) for n in range(2, pages + 1)]
+        yield first["data"]
+        for future in futures:
+            yield future.result()["data"]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def paginate(fetch_page, page_size=PAGE_SIZE, workers=None):
+    """Collects every item of a paginated list endpoint (see ``iter_pages``)."""
+    return [item for page in iter_pages(fetch_page, page_size, workers) for item in page]
+
+
 # --- Staff Functions ---
 
 
-@rate_limit(calls_per_second=1)
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=staff_limiter)
 def get_staff(data):
     path = "/saleschannel/qryStaffList"
-    signcode = generateSigncode("post", path, data)
-    response = requests.post(
-        f"https://dealer.unifi.com.my/portal/esales/api{path}",
-        headers={
-            "Cookie": COOKIE,
-            "signcode": signcode,
-        },
-        json=data,
-    )
+    response = get_client().post(path, data)
+    response.raise_for_status()
     return response
 
 
-@rate_limit(calls_per_second=1)
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=staff_limiter)
 def get_staff_detail(data):
     path = "/saleschannel/getStaffDetail"
-    signcode = generateSigncode("post", path, data)
-    response = requests.post(
-        f"https://dealer.unifi.com.my/portal/esales/api{path}",
-        headers={
-            "Cookie": COOKIE,
-            "signcode": signcode,
-        },
-        json=data,
-    )
+    response = get_client().post(path, data)
+    response.raise_for_status()
     return response
 
 
+def _fetch_staff_page(page_number):
+    data = {"pageSize": PAGE_SIZE, "pageNum": page_number}
+    response = get_staff(data)
+    result_json = response.json()
+    if "data" not in result_json:
+        raise Exception(result_json)
+    return result_json
+
+
+def iter_all_staff():
+    """Yields every staff, page by page."""
+    for page in iter_pages(_fetch_staff_page):
+        yield from page
+
+
 def get_all_staff():
-    page_number = 1
-    results = []
-
-    while True:
-        data = {"pageSize": 50, "pageNum": page_number}
-        response = get_staff(data)
-        result_json = response.json()
-        if "data" not in result_json:
-            raise Exception(response.json())
-        results = [*results, *result_json["data"]]
-        if len(result_json["data"]) != data["pageSize"]:
-            break
-        else:
-            page_number += 1
-    return results
+    return list(iter_all_staff())
 
 
 # --- Order Functions ---
 
 
-@rate_limit(calls_per_second=1)
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=order_list_limiter)
 def get_order_list(data):
     path = "/cee/order/v2/getCeeOrderList"
-    signcode = generateSigncode("post", path, data)
     # data = {
     #     "dPartyCode": 621564,
     #     "pageSize": 10,
@@ -94,44 +327,28 @@ def get_order_list(data):
     #     "dPartyType": "E",
     #     "extData": {"senario": "esales-monthly-order"},
     # }
-    response = requests.post(
-        f"https://dealer.unifi.com.my/portal/esales/api{path}",
-        headers={
-            "Cookie": COOKIE,
-            "signcode": signcode,
-        },
-        json=data,
-    )
+    response = get_client().post(path, data)
+    response.raise_for_status()
     return response
 
 
-@retry(exceptions=(requests.exceptions.HTTPError), tries=5, delay=10)
-@rate_limit(calls_per_second=1)
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=order_detail_limiter)
 def get_order_detail(data):
     path = "/cee/order/v2/getCeeOrderDetail"
-    signcode = generateSigncode("post", path, data)
     # data = {"custOrderId": "2502000060013514", "custOrderNbr": "2502000060013514"}
-    response = requests.post(
-        f"https://dealer.unifi.com.my/portal/esales/api{path}",
-        headers={
-            "Cookie": COOKIE,
-            "signcode": signcode,
-        },
-        json=data,
-    )
+    response = get_client().post(path, data)
     response.raise_for_status()
     return response
 
 
-def get_all_order_list(staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+def iter_order_list(staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+    """Yields every order of one staff as soon as its page arrives."""
     # staffId: 621394
     # onWayFlag: Y
     # createdDateFrom: 20250401000000
     # createdDateTo: 20250430235959
-    page_number = 1
-    results = []
-
-    while True:
+    def fetch_page(page_number):
         data = {
             "createdDateFrom": createdDateFrom,
             "createdDateTo": createdDateTo,
@@ -139,35 +356,27 @@ def get_all_order_list(staffId, onWayFlag, createdDateFrom=None, createdDateTo=N
             "extData": {"drmOrderOptimizeQuery": "Y"},
             "onWayFlag": onWayFlag, # Y/N
             "pageNum": page_number,
-            "pageSize": 50,
+            "pageSize": PAGE_SIZE,
             "partyCodes": staffId,
         }
-        response = get_order_list(data)
-        result_json = response.json()
-        results = [*results, *result_json["data"]]
-        if len(result_json["data"]) != data["pageSize"]:
-            break
-        else:
-            page_number += 1
-    return results
+        return decode(OrderListResponse, get_order_list(data).content)
+
+    for page in iter_pages(fetch_page):
+        yield from page
+
+
+def get_all_order_list(staffId, onWayFlag, createdDateFrom=None, createdDateTo=None):
+    return list(iter_order_list(staffId, onWayFlag, createdDateFrom, createdDateTo))
 
 
 # --- Case Functions ---
 
 
-@retry(exceptions=(requests.exceptions.HTTPError), tries=5, delay=10)
-@rate_limit(calls_per_second=1)
+@retry(exceptions=RETRY_ERRORS, **RETRY_POLICY)
+@rate_limit(limiter=case_detail_limiter)
 def get_case_detail(data):
     path = "/csc/getCaseDetail"
-    signcode = generateSigncode("post", path, data)
     # data = {"caseId": "103902998"}
-    response = requests.post(
-        f"https://dealer.unifi.com.my/portal/esales/api{path}",
-        headers={
-            "Cookie": COOKIE,
-            "signcode": signcode,
-        },
-        json=data,
-    )
+    response = get_client().post(path, data)
     response.raise_for_status()
     return response
@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+
+from common.configurations import (
+    get_order_cache_max_age_days,
+    get_order_cache_max_entries,
+    get_order_cache_path,
+)
+from common.sqlite import SQLiteFile
+
+logger = logging.getLogger(__name__)
+
+# Row fields that come from the staff list rather than the order detail.
+STAFF_FIELDS = {"staffName": "staffName", "staff_code": "staffCode", "channel_name": "orgName"}
+
+
+class OrderDetailCache(SQLiteFile):
+    """Persistent SQLite cache of flattened order rows.
+
+    Rows are keyed by ``orderId`` + ``stateDate``, so an order whose state
+    hasn't moved since the last run is served from disk and never hits
+    getCeeOrderDetail. Safe to share between harvest threads. Orders
+    without a ``stateDate`` can't tell a state change apart, so they are
+    never cached.
+
+    Entries older than ``max_age_days`` are dropped so details that change
+    without a state change (e.g. a rescheduled appointment) are refreshed
+    eventually; beyond ``max_entries`` the least recently used rows go first.
+
+    Args:
+        path: SQLite file (default: ORDER_CACHE_PATH)
+        max_entries: Maximum rows kept (default: ORDER_CACHE_MAX_ENTRIES)
+        max_age_days: Maximum age of a row in days (default: ORDER_CACHE_MAX_AGE_DAYS)
+    """
+
+    def __init__(self, path=None, max_entries=None, max_age_days=None):
+        super().__init__(path or get_order_cache_path())
+        self.max_entries = max_entries if max_entries is not None else get_order_cache_max_entries()
+        self.max_age_days = max_age_days if max_age_days is not None else get_order_cache_max_age_days()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS order_details (
+                order_id TEXT NOT NULL,
+                state_date TEXT NOT NULL,
+                row TEXT NOT NULL,
+                cached_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (order_id, state_date)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_order_details_used_at ON order_details (used_at)")
+        self.evict()
+
+    @staticmethod
+    def _key(order):
+        state_date = order.get("stateDate")
+        return str(order.get("orderId")), str(state_date) if state_date else None
+
+    def get(self, staff, order):
+        """Returns the cached row for ``order`` (with current staff fields), or None."""
+        order_id, state_date = self._key(order)
+        if state_date is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT row FROM order_details WHERE order_id = ? AND state_date = ?",
+                (order_id, state_date),
+            ).fetchone()
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE order_details SET used_at = ? WHERE order_id = ? AND state_date = ?",
+                (time.time(), order_id, state_date),
+            )
+        row = json.loads(found[0])
+        for field, staff_key in STAFF_FIELDS.items():
+            row[field] = staff.get(staff_key)
+        return row
+
+    def put(self, order, row):
+        """Stores ``row`` for ``order``, replacing rows cached for older states."""
+        order_id, state_date = self._key(order)
+        if state_date is None:
+            return
+        now = time.time()
+        text = json.dumps(row)
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM order_details WHERE order_id = ? AND state_date <> ?",
+                (order_id, state_date),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO order_details VALUES (?, ?, ?, ?, ?)",
+                (order_id, state_date, text, now, now),
+            )
+            self.writes += 1
+
+    def evict(self):
+        """Drops rows past the age limit, then the least recently used beyond the size limit."""
+        with self._lock:
+            evicted = 0
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                evicted += self._conn.execute(
+                    "DELETE FROM order_details WHERE cached_at < ?", (cutoff,)
+                ).rowcount
+            if self.max_entries:
+                evicted += self._conn.execute(
+                    """
+                    DELETE FROM order_details WHERE rowid IN (
+                        SELECT rowid FROM order_details ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                ).rowcount
+            self.evicted += evicted
+        return evicted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM order_details").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evicted": self.evicted,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Order detail cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['writes']} writes, {stats['evicted']} evicted"
+        )
+
+    def close(self):
+        self.evict()
+        super().close()
@@ -0,0 +1,52 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from common.configurations import DEFAULT_WORKERS, get_case_terminal_statuses
+from tm.api import get_case_detail
+from tm.models import CaseDetailResponse, decode
+
+logger = logging.getLogger(__name__)
+
+
+def is_terminal(status, terminal_statuses=None):
+    """True when a case's status can no longer change (e.g. Closed, Cancelled)."""
+    if terminal_statuses is None:
+        terminal_statuses = get_case_terminal_statuses()
+    return str(status or "").strip().lower() in terminal_statuses
+
+
+def fetch_case(case_id):
+    """Returns ``(status, troika_id)`` for one case."""
+    response = get_case_detail({"caseId": case_id})
+    case_data = decode(CaseDetailResponse, response.content).get("data", {}).get("caseDto", {})
+    return case_data.get("caseStateName", ""), case_data.get("extMap", {}).get("troikaId", "")
+
+
+def iter_case_updates(case_ids, workers=DEFAULT_WORKERS):
+    """Fetches many cases at once using a bounded worker pool.
+
+    Yields ``(case_id, status, troika_id)`` in the order of ``case_ids``.
+    Pacing is left to the rate limited ``get_case_detail``, shared by every
+    worker. A case that still fails after its retries is logged and skipped.
+    """
+    case_ids = list(case_ids)
+    total = len(case_ids)
+
+    def _work(idx, case_id):
+        try:
+            status, troika_id = fetch_case(case_id)
+        except Exception as e:
+            logger.error(f"Failed to sync case {case_id}: {e}")
+            return None
+        logger.info(f"Progress {idx+1}/{total}: case {case_id} is {status}")
+        return status, troika_id
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cases")
+    try:
+        futures = [executor.submit(_work, idx, case_id) for idx, case_id in enumerate(case_ids)]
+        for case_id, future in zip(case_ids, futures):
+            result = future.result()
+            if result is not None:
+                yield case_id, *result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,143 @@
+"""Declarative flattening of getCeeOrderDetail payloads into sheet rows.
+
+``FIELD_SPEC`` lists every output column with the function that extracts
+it from an ``OrderContext``. Each order's items are indexed by
+``serviceType`` once, so no column has to scan ``orderItemList`` again.
+``flatten_batch`` flattens a staff's details together, one column at a
+time, which is what the harvest uses.
+"""
+import re
+
+BUNDLE = 51
+INTERNET = 79
+RESIDENTIAL_VOICE = 80
+DMS = 924
+CLOUD_STORAGE = 888
+UNI5G = 15
+
+PREMIUM_VALUE_TV = re.compile(r"Premium Value .*TV")
+
+
+class FallbackRow(dict):
+    """A row built from the order list alone because the order detail couldn't be fetched.
+
+    Only the type marks it, so no extra column reaches sinks, the store or the sheet.
+    """
+
+
+def index_items(order_items):
+    """Maps each serviceType to its first item in a single pass."""
+    items = {}
+    for item in order_items or ():
+        items.setdefault(item.get("serviceType"), item)
+    return items
+
+
+class OrderContext:
+    """Everything a column extractor may read for one order, resolved once."""
+
+    __slots__ = ("staff", "detail", "items", "installation", "contact", "appointment", "customer")
+
+    def __init__(self, staff, detail):
+        self.staff = staff
+        self.detail = detail
+        self.items = index_items(detail.get("orderItemList"))
+        installations = detail.get("installationInfoList") or []
+        self.installation = installations[0] if installations else None
+        self.contact = (self.installation or {}).get("custContactDto") or {}
+        self.appointment = (self.installation or {}).get("appointmentInfo") or {}
+        self.customer = detail.get("custInfo") or {}
+
+
+def _item_field(service_type, field):
+    def extract(ctx):
+        item = ctx.items.get(service_type)
+        return item.get(field) if item else None
+    return extract
+
+
+def get_residential_voice_number(residential_voice_item):
+    if "prefix" in residential_voice_item and "accNbr" in residential_voice_item:
+        return residential_voice_item["prefix"] + residential_voice_item["accNbr"]
+    return None
+
+
+def _residential_number(ctx):
+    item = ctx.items.get(RESIDENTIAL_VOICE)
+    return get_residential_voice_number(item) if item else None
+
+
+def _dms_item(ctx):
+    item = ctx.items.get(DMS)
+    fees = item.get("feeList") if item else None
+    return fees[0].get("priceName") if fees else None
+
+
+def _cloud_storage_item(ctx):
+    item = ctx.items.get(CLOUD_STORAGE)
+    for offer in (item.get("offerInstList") or []) if item else ():
+        if offer.get("offerType") == "4":
+            return offer.get("offerName")
+    return None
+
+
+def _premium_value_tv(ctx):
+    item = ctx.items.get(INTERNET)
+    for agreement in (item.get("agreementList") or []) if item else ():
+        name = agreement.get("agreementName")
+        if name and PREMIUM_VALUE_TV.match(name):
+            return name
+    return None
+
+
+FIELD_SPEC = (
+    ("order_id", lambda ctx: str(ctx.detail.get("orderId"))),
+    ("staffName", lambda ctx: ctx.staff.get("staffName")),
+    ("staff_code", lambda ctx: ctx.staff.get("staffCode")),
+    ("channel_name", lambda ctx: ctx.staff.get("orgName")),
+    ("status", lambda ctx: ctx.detail.get("stateName")),
+    ("created_date", lambda ctx: ctx.detail.get("acceptDate")),
+    ("updated_date", lambda ctx: ctx.detail.get("stateDate")),
+    ("installation_contact_name", lambda ctx: ctx.contact.get("contactName")),
+    ("installation_contact_email", lambda ctx: ctx.contact.get("email")),
+    ("installation_contact_phone", lambda ctx: ctx.contact.get("contactNbr")),
+    ("installation_start_time", lambda ctx: ctx.appointment.get("appointmentStartTime")),
+    ("installation_end_time", lambda ctx: ctx.appointment.get("appointmentEndTime")),
+    ("installation_address", lambda ctx: ctx.installation.get("displayAddress") if ctx.installation else None),
+    ("customer_name", lambda ctx: ctx.customer.get("custName")),
+    ("customer_id_type", lambda ctx: ctx.customer.get("certTypeName")),
+    ("customer_id", lambda ctx: ctx.customer.get("certNbr")),
+    ("bundle_name", _item_field(BUNDLE, "mainOfferName")),
+    ("tm_account_id", _item_field(INTERNET, "accNbr")),
+    ("account_nbr", _item_field(INTERNET, "acctNbr")),
+    ("residential_number", _residential_number),
+    ("event_type_name", lambda ctx: ctx.detail.get("eventTypeName")),
+    ("dms_item", _dms_item),
+    ("cloud_storage_item", _cloud_storage_item),
+    ("uni5g_items", _item_field(UNI5G, "mainOfferName")),
+    ("premium_value_tv", _premium_value_tv),
+)
+
+COLUMNS = [name for name, _ in FIELD_SPEC]
+
+
+def flatten_detail(staff, detail):
+    """Flattens one order detail into a row dict."""
+    ctx = OrderContext(staff, detail)
+    return {name: extract(ctx) for name, extract in FIELD_SPEC}
+
+
+def flatten_columns(staff, details):
+    """Flattens a batch of one staff's order details column by column.
+
+    Every context is built once and each column is extracted for the whole
+    batch in one go; returns ``{column: values}`` in ``COLUMNS`` order.
+    """
+    contexts = [OrderContext(staff, detail) for detail in details]
+    return {name: [extract(ctx) for ctx in contexts] for name, extract in FIELD_SPEC}
+
+
+def flatten_batch(staff, details):
+    """Flattens a batch of one staff's order details into row dicts, in order."""
+    columns = flatten_columns(staff, details)
+    return [dict(zip(COLUMNS, values)) for values in zip(*columns.values())]
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+
+from common.configurations import get_journal_dir
+from tm.flatten import FallbackRow
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """Append-only JSONL checkpoint of the staff finished during a run.
+
+    Each line holds one staff id and the rows harvested for it, flushed to
+    disk as soon as the staff completes. A resumed run skips those staff
+    and replays their rows instead of fetching them again. The positions of
+    ``FallbackRow`` rows are saved alongside, so they replay as fallbacks.
+
+    Args:
+        name: Identifies the run, e.g. ``download-ongoing-202506``
+        directory: Folder holding the journals (default: RUN_JOURNAL_DIR)
+    """
+
+    def __init__(self, name, directory=None):
+        directory = directory or get_journal_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self._lock = threading.Lock()
+
+    def completed(self):
+        """Returns ``{staff_id: rows}`` for every staff checkpointed so far."""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves a partial last line; that staff is simply redone.
+                    logger.warning(f"Ignoring unreadable journal line {line_number} in {self.path}")
+                    continue
+                rows = entry["rows"]
+                for i in entry.get("fallback", ()):
+                    rows[i] = FallbackRow(rows[i])
+                done[str(entry["staff_id"])] = rows
+        return done
+
+    def record(self, staff, rows):
+        """Checkpoints one finished staff."""
+        entry = {"staff_id": str(staff["staffId"]), "rows": rows}
+        fallback = [i for i, row in enumerate(rows) if isinstance(row, FallbackRow)]
+        if fallback:
+            entry["fallback"] = fallback
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def start(self, resume=False):
+        """Returns the checkpointed staff when resuming, otherwise starts a fresh journal."""
+        if resume:
+            self._drop_partial_line()
+            done = self.completed()
+            logger.info(f"Resuming from {self.path}: {len(done)} staff already completed")
+            return done
+        self.clear()
+        return {}
+
+    def _drop_partial_line(self):
+        """Truncates a last line left unterminated by a crash, so new records don't append onto it."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "rb+") as f:
+                content = f.read()
+                end = content.rfind(b"\n") + 1
+                if end < len(content):
+                    logger.warning(f"Dropping a partially written last line from {self.path}")
+                    f.truncate(end)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
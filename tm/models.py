@@ -0,0 +1,145 @@
+"""Typed, selective decoding of TM portal responses.
+
+A getCeeOrderDetail body is ~50 KB of JSON, and order-list pages are
+larger still, yet the collector reads only a few dozen fields. The
+``TypedDict`` models below declare exactly those fields. ``decode`` hands
+``response.content`` to msgspec, which materialises the declared fields
+as plain dicts and lists and skips everything else without building it.
+The results are ordinary dicts, so ``tm.flatten``, the caches and the sync
+marks read them just as they read a full ``response.json()``.
+
+Declare a field here before reading it anywhere else. An undeclared field
+is simply absent, so ``.get`` returns None for it.
+"""
+import json
+import logging
+from functools import cache
+from typing import TypedDict
+
+import msgspec
+
+logger = logging.getLogger(__name__)
+
+
+# --- getCeeOrderDetail / getCeeOrderList ---
+
+
+class Fee(TypedDict, total=False):
+    priceName: str | None
+
+
+class OfferInst(TypedDict, total=False):
+    offerType: str | None
+    offerName: str | None
+
+
+class Agreement(TypedDict, total=False):
+    agreementName: str | None
+
+
+class OrderItem(TypedDict, total=False):
+    serviceType: int | None
+    accNbr: str | None
+    acctNbr: str | None
+    prefix: str | None
+    mainOfferName: str | None
+    feeList: list[Fee] | None
+    offerInstList: list[OfferInst] | None
+    agreementList: list[Agreement] | None
+
+
+class Contact(TypedDict, total=False):
+    contactName: str | None
+    email: str | None
+    contactNbr: str | None
+
+
+class Appointment(TypedDict, total=False):
+    appointmentStartTime: str | None
+    appointmentEndTime: str | None
+
+
+class Installation(TypedDict, total=False):
+    displayAddress: str | None
+    custContactDto: Contact | None
+    appointmentInfo: Appointment | None
+
+
+class Customer(TypedDict, total=False):
+    custName: str | None
+    certTypeName: str | None
+    certNbr: str | None
+
+
+class OrderDetail(TypedDict, total=False):
+    """The ``data`` of getCeeOrderDetail: every field ``tm.flatten`` reads."""
+
+    orderId: int | str | None
+    stateName: str | None
+    acceptDate: str | None
+    stateDate: str | None
+    eventTypeName: str | None
+    orderItemList: list[OrderItem] | None
+    installationInfoList: list[Installation] | None
+    custInfo: Customer | None
+
+
+class OrderDetailResponse(TypedDict, total=False):
+    data: OrderDetail | None
+
+
+class Order(TypedDict, total=False):
+    """One getCeeOrderList entry: the detail request, cache and sync keys and the fallback row."""
+
+    orderId: int | str | None
+    orderNbr: int | str | None
+    stateName: str | None
+    acceptDate: str | None
+    stateDate: str | None
+    mainOfferName: str | None
+    eventTypeName: str | None
+    orderItemList: list[OrderItem] | None
+
+
+class OrderListResponse(TypedDict, total=False):
+    total: int | None
+    data: list[Order] | None
+
+
+# --- getCaseDetail ---
+
+
+class CaseExtMap(TypedDict, total=False):
+    troikaId: str | None
+
+
+class Case(TypedDict, total=False):
+    caseStateName: str | None
+    extMap: CaseExtMap | None
+
+
+class CaseDetail(TypedDict, total=False):
+    caseDto: Case | None
+
+
+class CaseDetailResponse(TypedDict, total=False):
+    data: CaseDetail | None
+
+
+@cache
+def _decoder(model):
+    return msgspec.json.Decoder(model)
+
+
+def decode(model, content):
+    """Decodes a JSON body (bytes) into ``model``, keeping only its fields.
+
+    A body that doesn't match the model's types (the portal changed a field)
+    is logged and decoded in full instead, so a schema drift costs speed,
+    not rows.
+    """
+    try:
+        return _decoder(model).decode(content)
+    except msgspec.ValidationError as e:
+        logger.warning(f"{model.__name__} did not match the response ({e}); decoding it in full")
+        return json.loads(content)
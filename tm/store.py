@@ -0,0 +1,156 @@
+import logging
+import sqlite3
+import time
+
+import pandas as pd
+
+from common.configurations import get_order_store_path
+from common.sqlite import SQLiteFile
+from tm.flatten import COLUMNS, FallbackRow
+
+logger = logging.getLogger(__name__)
+
+CASE_COLUMNS = ["case_id", "status", "troika_id", "fetched_at"]
+
+
+class OrderStore(SQLiteFile):
+    """Local SQLite mirror of every harvested order row and case snapshot.
+
+    Commands write here first; sheets and files are exports of it, and
+    ad-hoc questions (orders per staff per month, …) are a query away
+    instead of another portal crawl. An order keeps its newest row by
+    ``updated_date``. A case snapshot is added whenever its status or
+    troika id changes, so the case history is kept too.
+
+    Args:
+        path: SQLite file (default: ORDER_STORE_PATH)
+    """
+
+    def __init__(self, path=None):
+        super().__init__(path or get_order_store_path())
+        columns = ", ".join(f'"{c}" TEXT' for c in COLUMNS if c != "order_id")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS orders (order_id TEXT PRIMARY KEY, {columns}, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_staff_code ON orders (staff_code)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_updated_date ON orders (updated_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_date ON orders (created_date)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS case_snapshots (
+                case_id TEXT NOT NULL,
+                status TEXT,
+                troika_id TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_case_snapshots_case_id ON case_snapshots (case_id, fetched_at)"
+        )
+
+    def upsert_orders(self, rows):
+        """Stores ``rows``; an order's row is replaced unless the stored one is newer.
+
+        A ``FallbackRow`` (its detail fetch failed) only fills in what it has,
+        so it never blanks the detail fields of a row already stored.
+        """
+        if not rows:
+            return
+        names = ", ".join(f'"{c}"' for c in COLUMNS)
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        now = time.time()
+        batches = {False: [], True: []}
+        for row in rows:
+            batches[isinstance(row, FallbackRow)].append(
+                [None if row.get(c) is None else str(row.get(c)) for c in COLUMNS] + [now]
+            )
+        with self.transaction() as conn:
+            for fallback, values in batches.items():
+                if not values:
+                    continue
+                if fallback:
+                    updates = ", ".join(f'"{c}" = COALESCE(excluded."{c}", orders."{c}")' for c in COLUMNS if c != "order_id")
+                else:
+                    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in COLUMNS if c != "order_id")
+                conn.executemany(
+                    f"""
+                    INSERT INTO orders ({names}, stored_at) VALUES ({placeholders}, ?)
+                    ON CONFLICT (order_id) DO UPDATE SET {updates}, stored_at = excluded.stored_at
+                    WHERE orders.updated_date IS NULL OR excluded.updated_date >= orders.updated_date
+                    """,
+                    values,
+                )
+
+    def _select(self, conn, order_ids=None, created_from=None, created_to=None):
+        clauses, params = [], []
+        if created_from is not None:
+            clauses.append("created_date >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            clauses.append("created_date <= ?")
+            params.append(created_to)
+        source = "orders"
+        if order_ids is not None:
+            # A temp table join avoids SQLite's bound-parameter limit for large id lists.
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (order_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM wanted")
+            conn.executemany(
+                "INSERT OR IGNORE INTO wanted VALUES (?)", [(str(order_id),) for order_id in order_ids]
+            )
+            source = "orders JOIN wanted USING (order_id)"
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        names = ", ".join(f'"{c}"' for c in COLUMNS)
+        return conn.execute(f"SELECT {names} FROM {source}{where} ORDER BY order_id", params)
+
+    def orders_frame(self, order_ids=None, created_from=None, created_to=None):
+        """Stored order rows as a DataFrame, optionally limited to ids or a created_date window."""
+        with self._lock:
+            rows = self._select(self._conn, order_ids, created_from, created_to).fetchall()
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def iter_orders(self, created_from=None, created_to=None, chunk_size=1000):
+        """Yields stored order rows as lists of dicts, ``chunk_size`` at a time."""
+        # A reader connection of its own lets writers carry on while this is consumed (WAL).
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = self._select(conn, created_from=created_from, created_to=created_to)
+            while chunk := cursor.fetchmany(chunk_size):
+                yield [dict(zip(COLUMNS, row)) for row in chunk]
+        finally:
+            conn.close()
+
+    def orders_per_staff_month(self):
+        """Order counts per staff and created month, e.g. for a quick report."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT staff_code, staffName, substr(created_date, 1, 7) AS month, COUNT(*) AS orders
+                FROM orders GROUP BY staff_code, staffName, month ORDER BY month, staff_code
+                """
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["staff_code", "staffName", "month", "orders"])
+
+    def record_cases(self, updates):
+        """Adds a snapshot for every ``(case_id, status, troika_id)`` that differs from the latest one."""
+        now = time.time()
+        with self.transaction() as conn:
+            for case_id, status, troika_id in updates:
+                latest = conn.execute(
+                    "SELECT status, troika_id FROM case_snapshots WHERE case_id = ? ORDER BY fetched_at DESC LIMIT 1",
+                    (str(case_id),),
+                ).fetchone()
+                if latest != (status, troika_id):
+                    conn.execute(
+                        "INSERT INTO case_snapshots VALUES (?, ?, ?, ?)", (str(case_id), status, troika_id, now)
+                    )
+
+    def cases_frame(self):
+        """Latest snapshot of every case."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT case_id, status, troika_id, MAX(fetched_at) FROM case_snapshots GROUP BY case_id
+                """
+            ).fetchall()
+        return pd.DataFrame(rows, columns=CASE_COLUMNS)
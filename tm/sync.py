@@ -0,0 +1,91 @@
+import logging
+
+from common.configurations import get_sync_state_path
+from common.sqlite import SQLiteFile
+from tm.flatten import FallbackRow
+
+logger = logging.getLogger(__name__)
+
+
+def is_newer(order, since):
+    """True when ``order`` changed at or after the ``since`` stateDate (or has no mark yet).
+
+    ``stateDate`` only has whole seconds, so orders stamped with the mark's
+    own second are synced again; the detail cache keeps that cheap.
+    """
+    state_date = order.get("stateDate")
+    return since is None or state_date is None or str(state_date) >= since
+
+
+class WatermarkStore(SQLiteFile):
+    """Per-source, per-staff high-water marks of the last ``stateDate`` synced.
+
+    ``stateDate`` values (``YYYY-MM-DD HH:MM:SS``) sort lexicographically, so
+    marks are kept as plain strings and only ever move forward.
+
+    Args:
+        path: SQLite file (default: SYNC_STATE_PATH)
+    """
+
+    def __init__(self, path=None):
+        super().__init__(path or get_sync_state_path())
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                source TEXT NOT NULL,
+                staff_id TEXT NOT NULL,
+                state_date TEXT NOT NULL,
+                PRIMARY KEY (source, staff_id)
+            )
+            """
+        )
+
+    def get_all(self, source):
+        """Returns ``{staff_id: state_date}`` for ``source``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT staff_id, state_date FROM watermarks WHERE source = ?", (source,)
+            ).fetchall()
+        return {staff_id: state_date for staff_id, state_date in rows}
+
+    def advance(self, marks):
+        """Moves marks forward in one transaction.
+
+        Args:
+            marks: ``{(source, staff_id): state_date}``; older values are ignored
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO watermarks (source, staff_id, state_date) VALUES (?, ?, ?)
+                ON CONFLICT (source, staff_id) DO UPDATE SET state_date = excluded.state_date
+                WHERE excluded.state_date > watermarks.state_date
+                """,
+                [(source, str(staff_id), state_date) for (source, staff_id), state_date in marks.items()],
+            )
+
+    def reset(self, source=None):
+        with self._lock:
+            if source is None:
+                self._conn.execute("DELETE FROM watermarks")
+            else:
+                self._conn.execute("DELETE FROM watermarks WHERE source = ?", (source,))
+
+
+def collect_marks(source, staff, rows, marks):
+    """Records the newest ``updated_date`` among ``rows`` as the staff's pending mark.
+
+    Fallback rows (their detail fetch failed) cap the mark at the oldest of
+    them, so those orders are fetched again by the next sync.
+    """
+    dates, failed = [], []
+    for row in rows:
+        if row.get("updated_date"):
+            (failed if isinstance(row, FallbackRow) else dates).append(str(row["updated_date"]))
+    if dates or failed:
+        key = (source, str(staff["staffId"]))
+        mark = max([marks.get(key, ""), *dates])
+        if failed:
+            mark = min(mark, *failed) if mark else min(failed)
+        marks[key] = mark
+    return marks
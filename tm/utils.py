@@ -1,23 +1,28 @@
 
-from common.decorators import retry
+from common import metrics
 from tm.api import get_order_detail
+from tm.flatten import (
+    INTERNET,
+    FallbackRow,
+    RESIDENTIAL_VOICE,
+    UNI5G,
+    flatten_batch,
+    flatten_detail,
+    get_residential_voice_number,
+    index_items,
+)
+from tm.models import OrderDetailResponse, decode
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
-def get_residential_voice_number(residential_voice_item):
-    if "prefix" in residential_voice_item and "accNbr" in residential_voice_item:
-        return residential_voice_item["prefix"] + residential_voice_item["accNbr"]
-    return None
-
 def _build_fallback_datapoint(staff, order):
-    order_items = order.get("orderItemList", [])
-    internet_items = next((x for x in order_items if x.get("serviceType") == 79), None)
-    residential_voice_items = next((x for x in order_items if x.get("serviceType") == 80), None)
-    uni5g_items = next((x for x in order_items if x.get("serviceType") == 15), None)
+    items = index_items(order.get("orderItemList"))
+    internet_items = items.get(INTERNET)
+    residential_voice_items = items.get(RESIDENTIAL_VOICE)
+    uni5g_items = items.get(UNI5G)
 
-    return {
+    return FallbackRow({
         "order_id": str(order.get("orderId")),
         "staffName": staff.get("staffName"),
         "status": order.get("stateName"),
@@ -43,115 +48,90 @@ def _build_fallback_datapoint(staff, order):
         "premium_value_tv": None,
         "staff_code": staff.get("staffCode"),
         "channel_name": staff.get("orgName"),
+    })
+
+def order_detail_request(order):
+    """Builds the getCeeOrderDetail payload for an order list entry."""
+    return {
+        "custOrderId": order["orderId"],
+        "custOrderNbr": order["orderNbr"],
     }
 
-@retry(exceptions=Exception, tries=5, delay=10)
-def process_order(staff, order):
-    try:
-        get_order_detail_data = {
-            "custOrderId": order["orderId"],
-            "custOrderNbr": order["orderNbr"],
-        }
-        get_order_detail_response = get_order_detail(get_order_detail_data)
-        order_detail = get_order_detail_response.json()["data"]
-        order_items = order_detail["orderItemList"]
-        installation_info_list = order_detail["installationInfoList"]
-        
-        if len(installation_info_list) != 1:
-            logger.info(
-                f"WARNING: NO INSTALLATION POSSIBLE for {staff['staffName']} - {order_detail.get('orderId')}"
-            )
-
-        installation_info = (
-            installation_info_list[0] if len(installation_info_list) > 0 else None
+def check_detail(staff, order_detail):
+    """Raises on a getCeeOrderDetail ``data`` payload that can't be flattened.
+
+    A detail without ``orderItemList`` raises, so ``process_order`` falls
+    back to the order list, which still carries the bundle and account items.
+    """
+    if order_detail.get("orderItemList") is None:
+        raise ValueError("order detail has no orderItemList")
+    if len(order_detail.get("installationInfoList") or []) != 1:
+        logger.info(
+            f"WARNING: NO INSTALLATION POSSIBLE for {staff['staffName']} - {order_detail.get('orderId')}"
         )
-        # bundle_items = next((x for x in order_items if x["serviceType"] == 51), None)
-        bundle_items = next((x for x in order_items if x["serviceType"] == 51), None)
-        internet_items = next((x for x in order_items if x["serviceType"] == 79), None)
-        residential_voice_items = next((x for x in order_items if x["serviceType"] == 80), None)
-        dms_items = next((x for x in order_items if x["serviceType"] == 924), None)
-        cloud_storage_item = next((x for x in order_items if x["serviceType"] == 888), None)
-        uni5g_items = next((x for x in order_items if x["serviceType"] == 15), None)
-
-        datapoint = {
-            "order_id": str(order_detail.get("orderId")),
-            "staffName": staff.get("staffName"),
-            "staff_code": staff.get("staffCode"),
-            "channel_name": staff.get("orgName"),
-            "status": order_detail.get("stateName"),
-            "created_date": order_detail.get("acceptDate"),  # created date
-            "updated_date": order_detail.get("stateDate"),  # update date
-            "installation_contact_name": (
-                installation_info.get("custContactDto", {}).get("contactName")
-                if installation_info
-                else None
-            ),
-            "installation_contact_email": (
-                installation_info.get("custContactDto", {}).get("email")
-                if installation_info
-                else None
-            ),
-            "installation_contact_phone": (
-                installation_info.get("custContactDto", {}).get("contactNbr")
-                if installation_info
-                else None
-            ),
-            "installation_start_time": (
-                installation_info.get("appointmentInfo", {}).get("appointmentStartTime")
-                if installation_info
-                else None
-            ),
-            "installation_end_time": (
-                installation_info.get("appointmentInfo", {}).get("appointmentEndTime")
-                if installation_info
-                else None
-            ),
-            "installation_address": (
-                installation_info.get("displayAddress") if installation_info else None
-            ),
-            "customer_name": order_detail.get("custInfo", {}).get("custName"),
-            "customer_id_type": order_detail.get("custInfo", {}).get("certTypeName"),
-            "customer_id": order_detail.get("custInfo", {}).get("certNbr"),
-            "bundle_name": (
-                bundle_items.get("mainOfferName") if bundle_items else None
-            ),
-            "tm_account_id": (
-                internet_items.get("accNbr") if internet_items else None
-            ),
-            "account_nbr": (
-                internet_items.get("acctNbr") if internet_items else None
-            ),
-            "residential_number": (
-                get_residential_voice_number(residential_voice_items)
-                if residential_voice_items
-                else None
-            ),
-            "event_type_name": order_detail.get("eventTypeName"),
-            "dms_item": (
-                dms_items.get("feeList")[0].get("priceName")
-                if dms_items
-                else None
-            ),
-            "cloud_storage_item": (
-                next((x for x in cloud_storage_item.get("offerInstList") if x["offerType"] == "4"), {}).get("offerName")
-                if cloud_storage_item and cloud_storage_item.get("offerInstList")
-                else None
-            ),
-            "uni5g_items": uni5g_items.get("mainOfferName") if uni5g_items else None,
-            "premium_value_tv": next(
-                (
-                    agreement.get("agreementName")
-                    for agreement in (internet_items.get("agreementList") or [])
-                    if agreement.get("agreementName")
-                    and re.match(r"Premium Value .*TV", agreement.get("agreementName"))
-                ),
-                None,
-            )
-            if internet_items
-            else None,
-        }
-        return datapoint
+
+def fetch_order(staff, order, cache=None):
+    """Returns ``(row, None)`` for a cached or fallback row, or ``(None, order_detail)`` still to flatten.
+
+    When an ``OrderDetailCache`` is given, orders whose ``stateDate`` hasn't
+    changed since they were cached skip the detail request entirely. An
+    order whose detail fails falls back to the order list.
+    """
+    if cache is not None:
+        cached = cache.get(staff, order)
+        if cached is not None:
+            return cached, None
+    try:
+        response = get_order_detail(order_detail_request(order))
+        order_detail = decode(OrderDetailResponse, response.content)["data"]
+        check_detail(staff, order_detail)
+        return None, order_detail
     except Exception as e:
         logger.warning(f"Failed to fetch detail for order {order.get('orderId')}: {e}")
+        return _build_fallback_datapoint(staff, order), None
+
+def flatten_fetched(staff, orders, fetched, cache=None):
+    """Turns the ``fetch_order`` results of one staff's ``orders`` into rows, in order.
+
+    Every fetched detail is flattened in one ``flatten_batch`` and cached;
+    if the batch fails, each detail is flattened on its own, falling back
+    to the order list where that fails too.
+    """
+    pending = [(n, order_detail) for n, (_, order_detail) in enumerate(fetched) if order_detail is not None]
+    try:
+        with metrics.timer("parse.flatten_batch"):
+            flattened = flatten_batch(staff, [order_detail for _, order_detail in pending])
+    except Exception as e:
+        logger.warning(f"Failed to flatten {len(pending)} order details together ({e}); flattening them one by one")
+        flattened = [_flatten_or_fall_back(staff, orders[n], order_detail) for n, order_detail in pending]
+
+    rows = [row for row, _ in fetched]
+    for (n, _), row in zip(pending, flattened):
+        rows[n] = row
+        if cache is not None and not isinstance(row, FallbackRow):
+            cache.put(orders[n], row)
+    return rows
+
+def _flatten_or_fall_back(staff, order, order_detail):
+    try:
+        return flatten_detail(staff, order_detail)
+    except Exception as e:
+        logger.warning(f"Failed to flatten detail for order {order.get('orderId')}: {e}")
         return _build_fallback_datapoint(staff, order)
 
+def process_orders(staff, orders, cache=None):
+    """Fetches the details of one staff's ``orders`` and flattens them together into rows, in order.
+
+    Details are fetched as ``orders`` is consumed, so a streamed order list
+    keeps its later pages in flight, and are flattened in one batch at the
+    end (see ``fetch_order`` and ``flatten_fetched``).
+    """
+    seen, fetched = [], []
+    for order in orders:
+        seen.append(order)
+        fetched.append(fetch_order(staff, order, cache=cache))
+    return flatten_fetched(staff, seen, fetched, cache=cache)
+
+def process_order(staff, order, cache=None):
+    """Fetches an order's detail and flattens it into a row (see ``process_orders``)."""
+    return process_orders(staff, [order], cache=cache)[0]